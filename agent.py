@@ -1,171 +1,59 @@
-from langchain_ollama import ChatOllama
 from langchain_core.tools import tool
-from langgraph.prebuilt import create_react_agent
 from dotenv import load_dotenv
-import cv2
 import os
-from pose_detection import detect_pose_and_face
-from geometry_utils import calculate_head_dimensions, compute_face_turn_angle
-from render_steps import *
-from drawing_instructor_agent import generate_drawing_instructions
-
-from qdrant_setup import init_qdrant
-from embedding_utils import geometry_to_vector
-from memory_store import store_in_qdrant
-from memory_retriever import retrieve_similar
-
+import threading
+import time
+from command_router import router
+from landmark_cache import landmark_cache
+from loomis_pipeline import run_tool
+from batch import format_summary, run_batch, summarize
+from memory_prototypes import compaction_stats, run_compaction
+from memory_store import writer_metrics
+from qdrant_setup import get_qdrant_client
+from response_cache import response_cache
+from session import Session
+from tracing import format_metrics, span
 
 load_dotenv()
 
-qdrant_client = init_qdrant()
+# State shared by every command in this conversation (CLI commands and ReAct
+# tool calls alike), so chained requests on one image reuse its analysis
+session = Session()
 
 
 @tool
 def detect_face(image_path: str) -> str:
     """Detect face landmarks and analyze head geometry from an image."""
-    if not os.path.exists(image_path):
-        return f"Error: Image not found at {image_path}"
-    
-    data = detect_pose_and_face(image_path, display=False)
-    if not data['face']:
-        return "No face detected in image"
-    
-    radius, center, _ = calculate_head_dimensions(data['face'])
-    direction = compute_face_turn_angle(data['face'])
-    
-    return f"Face detected!\nCenter: {center}\nRadius: {radius}px\nDirection: {direction}"
+    return run_tool("detect_face", {"image_path": image_path}, session=session)
 
 @tool
 def apply_loomis(image_path: str, output_path: str) -> str:
-    """Apply Loomis method construction lines to an image and save the result."""
-    if not os.path.exists(image_path):
-        return f"Error: Image not found at {image_path}"
-    
-    data = detect_pose_and_face(image_path, display=False)
-    if not data['face']:
-        return "No face detected in image"
-    
-    radius, center, _ = calculate_head_dimensions(data['face'])
-    direction = compute_face_turn_angle(data['face'])
-
-    geometry = {
-    "radius": radius,
-    "center_x": center[0],
-    "center_y": center[1],
-    "direction": 1 if direction == "left" else -1
-    }
-
-    vector = geometry_to_vector(geometry)
-
-    store_in_qdrant(
-        qdrant_client,
-        vector,
-        payload={
-            "type": "reference",
-            "image_path": image_path
-        }
-    )
-
-    
-    img = cv2.imread(image_path)
-    img = construct_loomis_sphere(img, center, radius, direction, data["face"])
-    img = construct_vertical_line(img, data["face"])
-    img = construct_brow_line(img, data["face"])
-    img = construct_nose_line(img, data["face"])
-    img = construct_chin_line(img, data["face"])
-    img = construct_ellipse_vertical_line(img, center, radius, direction, data["face"])
-    img = construct_jaw_line(img, data["face"])
-    img = construct_outer_face_line(img, data["face"], direction)
-    
-    cv2.imwrite(output_path, img)
-    return f"Loomis construction saved to {output_path}"
+    """Apply Loomis method construction lines to an image and save the result. An output_path ending in .svg or .json saves the guidelines as vector data instead."""
+    return run_tool("apply_loomis", {"image_path": image_path, "output_path": output_path}, session=session)
 
 @tool
 def analyze_proportions(image_path: str) -> str:
     """Analyze facial proportions and provide measurements."""
-    if not os.path.exists(image_path):
-        return f"Error: Image not found at {image_path}"
-    
-    data = detect_pose_and_face(image_path, display=False)
-    if not data['face']:
-        return "No face detected in image"
-    
-    radius, center, _ = calculate_head_dimensions(data['face'])
-    direction = compute_face_turn_angle(data['face'])
-    
-    xs = [p[0] for p in data['face']]
-    ys = [p[1] for p in data['face']]
-    width = max(xs) - min(xs)
-    height = max(ys) - min(ys)
-    
-    return f"""Facial Proportions:
-Head radius: {radius}px
-Center: {center}
-Face: {width:.0f}x{height:.0f}px
-Ratio: {width/height:.2f}
-Direction: {direction}"""
+    return run_tool("analyze_proportions", {"image_path": image_path}, session=session)
 
 @tool
 def explain_loomis_guidelines(image_path: str) -> str:
     """Generate a step-by-step Loomis drawing tutorial based on detected guidelines."""
-    
-    if not os.path.exists(image_path):
-        return "Error: Image not found."
-
-    data = detect_pose_and_face(image_path, display=False)
-    if not data["face"]:
-        return "No face detected."
-
-    radius, center, _ = calculate_head_dimensions(data["face"])
-    direction = compute_face_turn_angle(data["face"])
-
-    geometry = {
-    "radius": radius,
-    "center_x": center[0],
-    "center_y": center[1],
-    "direction": 1 if direction == "left" else -1
-    }
-
-    vector = geometry_to_vector(geometry)
-
-    store_in_qdrant(
-        qdrant_client,
-        vector,
-        payload={
-            "type": "user_drawing",
-            "image_path": image_path
-        }
-    )
-
+    return run_tool("explain_loomis_guidelines", {"image_path": image_path}, session=session)
 
-    xs = [p[0] for p in data["face"]]
-    ys = [p[1] for p in data["face"]]
-    proportions = {
-        "width": max(xs) - min(xs),
-        "height": max(ys) - min(ys),
-        "ratio": (max(xs) - min(xs)) / (max(ys) - min(ys)),
-    }
-
-    similar_examples = retrieve_similar(qdrant_client, vector)
-
-
-    tutorial = generate_drawing_instructions(
-        direction=str(direction),
-        radius=radius,
-        center=center,
-        proportions=proportions,
-        notes=f"""
-Based on {len(similar_examples)} similar past Loomis constructions
-retrieved from visual memory with similar head orientation and proportions.
-"""
-
-
-    )
+@tool
+def apply_loomis_batch(source: str, output_dir: str) -> str:
+    """Apply Loomis construction to every image in a directory or glob and save results to output_dir."""
+    start = time.perf_counter()
+    with span("tool.apply_loomis_batch"):
+        results = list(run_batch(source, output_dir))
+    if not results:
+        return f"Error: No images found at {source}"
 
-    return tutorial
+    return format_summary(summarize(results, time.perf_counter() - start))
 
 # Create tools list
-TOOLS = [detect_face, apply_loomis, analyze_proportions, explain_loomis_guidelines]
+TOOLS = [detect_face, apply_loomis, analyze_proportions, explain_loomis_guidelines, apply_loomis_batch]
 
 # System message
 SYSTEM_MESSAGE = """You're a Loomis method drawing assistant. Help users apply geometric construction to draw heads accurately." \
@@ -181,81 +69,117 @@ You are not allowed to answer on your own.
 
 Your job is to choose the correct tool and call it."""
 
-# Create agent
-llm = ChatOllama(model="qwen2.5:1.5b", temperature=0)
-agent = create_react_agent(llm, TOOLS, prompt=SYSTEM_MESSAGE)
+# The ReAct agent (and its Ollama client) is only built when a request
+# actually falls through to the LLM.
+_agent_lock = threading.Lock()
+_agent = None
 
-def run_agent(user_input: str) -> str:
-    
-    """
-    Hybrid tool-or-LLM routing.
-    - If the message matches a known tool pattern → call tool directly.
-    - Otherwise → send to LLM via REACT.
-    """
 
-    text = user_input.lower().strip()
+def get_agent():
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                from langchain_ollama import ChatOllama
+                from langgraph.prebuilt import create_react_agent
 
-    # -------------------------------
-    # 1. EXPLAIN GUIDELINES
-    # -------------------------------
-    if text.startswith("explain guidelines for"):
-        try:
-            path = user_input.split("for", 1)[1].strip()
-            return explain_loomis_guidelines.run({"image_path": path})
-        except Exception as e:
-            return f"Error running explain_guidelines: {str(e)}"
+                llm = ChatOllama(model="qwen2.5:1.5b", temperature=0)
+                _agent = create_react_agent(llm, TOOLS, prompt=SYSTEM_MESSAGE)
+    return _agent
 
+def _stats_text(stats):
+    return "\n".join(f"{k}: {v}" for k, v in stats.items())
 
-    # -------------------------------
-    # 2. APPLY LOOMIS METHOD
-    # -------------------------------
-    if text.startswith("apply loomis to"):
-        try:
-            # Example:
-            # "Apply Loomis to A and save to B"
-            parts = user_input.split("to", 1)[1].strip()
-            img_path, out_path = parts.split("and save to")
-            img_path = img_path.strip()
-            out_path = out_path.replace("save to", "").strip()
-
-            return apply_loomis.run({
-                "image_path": img_path,
-                "output_path": out_path
-            })
-        except Exception as e:
-            return f"Error running apply_loomis: {str(e)}"
 
+def _run_for_paths(tool_name, paths, on_token=None, **arguments):
+    """Run a pipeline tool on each path; several results are labelled by path."""
+    if len(paths) == 1:
+        return run_tool(tool_name, {"image_path": paths[0], **arguments}, on_token=on_token, session=session)
+    return "\n\n".join(
+        f"{path}:\n{run_tool(tool_name, {'image_path': path, **arguments}, session=session)}" for path in paths
+    )
 
-    # -------------------------------
-    # 3. DETECT FACE
-    # -------------------------------
-    if text.startswith("detect face in"):
-        try:
-            path = user_input.split("in", 1)[1].strip()
-            return detect_face.run({"image_path": path})
-        except Exception as e:
-            return f"Error running detect_face: {str(e)}"
+
+def _apply_loomis(paths, output_path):
+    if len(paths) == 1:
+        return apply_loomis.run({"image_path": paths[0], "output_path": output_path})
+    # Several inputs: output_path is a directory
+    os.makedirs(output_path, exist_ok=True)
+    return "\n".join(
+        apply_loomis.run({"image_path": path, "output_path": os.path.join(output_path, os.path.basename(path))})
+        for path in paths
+    )
 
 
-    # -------------------------------
-    # 4. ANALYZE PROPORTIONS
-    # -------------------------------
-    if text.startswith("analyze proportions in"):
+def dispatch(route, on_token=None):
+    """Execute a Route from command_router without involving the LLM."""
+    args = route.args
+    intent = route.intent
+
+    if intent in ("detect_face", "analyze_proportions"):
+        return _run_for_paths(intent, args["paths"])
+    if intent == "explain_loomis_guidelines":
+        return _run_for_paths(intent, args["paths"], on_token=on_token)
+    if intent == "loomis_guidelines":
+        return _run_for_paths(intent, args["paths"], format=args.get("format", "json"))
+    if intent == "apply_loomis":
+        return _apply_loomis(args["paths"], args["output_path"])
+    if intent == "apply_loomis_batch":
+        return apply_loomis_batch.run(args)
+
+    if intent == "cache_stats":
+        lines = ["landmarks:"] + [f"  {k}: {v}" for k, v in landmark_cache.stats().items()]
+        lines += ["instructor:"] + [f"  {k}: {v}" for k, v in response_cache.stats().items()]
+        return "\n".join(lines)
+    if intent == "memory_stats":
+        sections = [_stats_text(m) for m in writer_metrics()]
+        compaction = compaction_stats()
+        if compaction:
+            sections.append("compaction:\n" + _stats_text(compaction))
+        return "\n\n".join(sections) if sections else "No memory writes yet"
+    if intent == "compact_memory":
+        summary = run_compaction(get_qdrant_client())
+        if summary is None:
+            return "Memory compaction failed; see the log"
+        return _stats_text(summary)
+    if intent == "metrics":
+        return format_metrics(args.get("format", "text"))
+    if intent == "router_stats":
+        return _stats_text(router.stats())
+    if intent == "session_stats":
+        return _stats_text(session.stats())
+    if intent == "clear_session":
+        session.clear()
+        return "Session cleared"
+
+    raise ValueError(f"Unknown intent: {intent}")
+
+
+def run_agent(user_input: str, on_token=None) -> str:
+    
+    """
+    Hybrid tool-or-LLM routing.
+    - If command_router matches the message → call the tool directly.
+    - Otherwise → send to LLM via REACT.
+
+    on_token, if given, receives the tutorial of "explain guidelines" chunk
+    by chunk as it is generated; the full text is still returned.
+    """
+
+    route = router.route(user_input)
+    if route is not None:
         try:
-            path = user_input.split("in", 1)[1].strip()
-            return analyze_proportions.run({"image_path": path})
+            return dispatch(route, on_token)
         except Exception as e:
-            return f"Error running analyze_proportions: {str(e)}"
-
+            return f"Error running {route.intent}: {str(e)}"
 
-    # -------------------------------
-    # 5. OTHERWISE → NORMAL LLM (REACT)
-    # -------------------------------
     try:
-        result = agent.invoke(
-            {"messages": [{"role": "user", "content": user_input}]},
-            config={"recursion_limit": 50}
-        )
+        agent = get_agent()
+        with span("agent.react"):
+            result = agent.invoke(
+                {"messages": [{"role": "user", "content": user_input}]},
+                config={"recursion_limit": 50}
+            )
         return result["messages"][-1].content
 
     except Exception as e:
@@ -271,6 +195,12 @@ def main():
     print("  - Apply Loomis to <image_path> and save to <output_path>")
     print("  - Analyze proportions in <image_path>")
     print("  - Explain guidelines for <image_path>")
+    print("  - Cache stats")
+    print("  - Memory stats")
+    print("  - Metrics [json|prometheus]")
+    print("  - Router stats")
+    print("  - Session stats / Clear session")
+    print("  (quote paths that contain spaces; list several paths with commas or 'and')")
     print("  - Type 'exit' or 'quit' to stop")
     print("=" * 50)
     
@@ -283,8 +213,22 @@ def main():
         if not user_input:
             continue
             
-        response = run_agent(user_input)
-        print(f"\nAssistant: {response}")
+        streamed = []
+
+        def on_token(text):
+            if not streamed:
+                print("\nAssistant: ", end="", flush=True)
+            streamed.append(text)
+            print(text, end="", flush=True)
+
+        response = run_agent(user_input, on_token=on_token)
+        if not streamed:
+            print(f"\nAssistant: {response}")
+        elif response != "".join(streamed):
+            # Failed after the stream started (e.g. an error from the LLM)
+            print(f"\n{response}")
+        else:
+            print()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,148 @@
+"""
+Apply Loomis construction to a whole directory (or glob) of references.
+
+Usage:
+    python batch.py <directory|glob> <output_dir> [--workers N]
+"""
+
+import argparse
+import glob
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from loomis_pipeline import LoomisRequest, run_pipeline
+from pose_detection import get_face_mesh
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff")
+
+
+def _glob_root(pattern):
+    """The static directory prefix of a glob, before its first wildcard."""
+    root = pattern
+    while glob.has_magic(root):
+        root = os.path.dirname(root)
+    return root
+
+
+def collect_images(source):
+    """
+    Return (input_path, relative_output_name) pairs for a directory or glob.
+
+    Output names keep each image's path relative to the directory, or to the
+    glob's static prefix, so same-named files in different folders stay apart.
+    """
+    if os.path.isdir(source):
+        pairs = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    pairs.append((path, os.path.relpath(path, source)))
+        return pairs
+
+    root = _glob_root(source) or "."
+    return [
+        (path, os.path.relpath(path, root))
+        for path in sorted(glob.glob(source, recursive=True))
+        if path.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def _init_worker():
+    # Each worker process builds its own FaceMesh graph up front.
+    get_face_mesh()
+
+
+def process_image(image_path, output_path):
+    start = time.perf_counter()
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    result = run_pipeline(LoomisRequest(image_path, output_path=output_path))
+    if not result.ok:
+        raise ValueError(result.error)
+
+    return time.perf_counter() - start
+
+
+def _process_safely(image_path, output_path):
+    try:
+        seconds = process_image(image_path, output_path)
+        return {"image_path": image_path, "output_path": output_path,
+                "ok": True, "error": None, "seconds": seconds}
+    except Exception as e:
+        return {"image_path": image_path, "output_path": output_path,
+                "ok": False, "error": str(e), "seconds": None}
+
+
+def run_batch(source, output_dir, workers=None):
+    """
+    Yield one result dict per image as soon as it finishes.
+
+    A failing image is reported in its result and never stops the batch.
+    Workers are spawned rather than forked so no MediaPipe graph is shared
+    with the parent process.
+    """
+    pairs = collect_images(source)
+    if not pairs:
+        return
+
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(_process_safely, path, os.path.join(output_dir, name))
+            for path, name in pairs
+        ]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def summarize(results, elapsed):
+    failures = [r for r in results if not r["ok"]]
+    processed = len(results)
+    return {
+        "processed": processed,
+        "succeeded": processed - len(failures),
+        "failed": len(failures),
+        "seconds": elapsed,
+        "images_per_sec": processed / elapsed if elapsed > 0 else 0.0,
+        "failures": [{"image_path": r["image_path"], "error": r["error"]} for r in failures],
+    }
+
+
+def format_summary(summary):
+    lines = [
+        f"Processed {summary['processed']} images in {summary['seconds']:.1f}s "
+        f"({summary['images_per_sec']:.2f} images/sec)",
+        f"Succeeded: {summary['succeeded']}  Failed: {summary['failed']}",
+    ]
+    for failure in summary["failures"]:
+        lines.append(f"  ✗ {failure['image_path']}: {failure['error']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply Loomis construction to many images.")
+    parser.add_argument("source", help="directory of images or a glob pattern")
+    parser.add_argument("output_dir", help="directory for the annotated images")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    results = []
+    for result in run_batch(args.source, args.output_dir, workers=args.workers):
+        results.append(result)
+        if result["ok"]:
+            print(f"✓ {result['image_path']} → {result['output_path']} ({result['seconds']:.2f}s)")
+        else:
+            print(f"✗ {result['image_path']}: {result['error']}")
+
+    print(format_summary(summarize(results, time.perf_counter() - start)))
+
+
+if __name__ == "__main__":
+    main()
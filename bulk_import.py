@@ -0,0 +1,127 @@
+"""
+Backfill visual memory from a directory (or glob) of reference images.
+
+Usage:
+    python bulk_import.py <directory|glob> [--type reference] [--batch-size 512] [--workers N]
+
+Detection runs in a process pool; one point per detected face is written to
+Qdrant through a BufferedWriter with a large batch size.
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from batch import collect_images
+from embedding_utils import EMBEDDING_VERSION, landmarks_to_embedding
+from head_pose import estimate_head_pose_batch
+from landmark_cache import get_landmarks_from_bytes
+from memory_store import BufferedWriter, make_point, memory_point_id
+from pose_detection import get_face_mesh
+from qdrant_setup import get_qdrant_client
+
+
+def _init_worker():
+    get_face_mesh()
+
+
+def embed_image(image_path):
+    """
+    (digest, [embedding per face]) for one image. The file is read once; its
+    bytes give both the content hash and the landmarks.
+    """
+    with open(image_path, "rb") as f:
+        image_bytes = f.read()
+
+    data = get_landmarks_from_bytes(image_bytes)
+    faces = data["faces"]
+    if not faces:
+        raise ValueError("No face detected in image")
+    # Same pose fit as the pipeline's geometry stage
+    poses = estimate_head_pose_batch(faces, image_width=data["image_size"][1])
+    return data["digest"], [landmarks_to_embedding(face, pose=pose) for face, pose in zip(faces, poses)]
+
+
+def _embed_safely(image_path):
+    try:
+        return (image_path, *embed_image(image_path), None)
+    except Exception as e:
+        return image_path, None, None, str(e)
+
+
+def bulk_import(source, point_type="reference", batch_size=512, workers=None, client=None):
+    """Embed every image under source and write it to memory. Returns a summary dict."""
+    pairs = collect_images(source)
+    client = client or get_qdrant_client()
+    writer = BufferedWriter(client, batch_size=batch_size, flush_interval=5.0)
+
+    start = time.perf_counter()
+    imported = 0
+    points = 0
+    failures = []
+
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=_init_worker) as pool:
+            futures = [pool.submit(_embed_safely, path) for path, _ in pairs]
+            for future in as_completed(futures):
+                image_path, digest, vectors, error = future.result()
+                if error:
+                    failures.append({"image_path": image_path, "error": error})
+                    continue
+                # One point per face at the pipeline's content-derived ids, so
+                # re-importing (or later analysing) an image updates them in place
+                for i, vector in enumerate(vectors):
+                    writer.add(make_point(
+                        memory_point_id(digest, point_type, i), vector,
+                        {"type": point_type, "image_path": image_path, "face_index": i,
+                         "content_hash": digest, "embedding_version": EMBEDDING_VERSION,
+                         "created_at": time.time()},
+                    ))
+                imported += 1
+                points += len(vectors)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "images": len(pairs),
+        "imported": imported,
+        "points": points,
+        "failed": len(failures),
+        "failures": failures,
+        "seconds": elapsed,
+        "images_per_sec": len(pairs) / elapsed if elapsed > 0 else 0.0,
+        "writer": writer.metrics(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill Loomis visual memory from reference images.")
+    parser.add_argument("source", help="directory of images or a glob pattern")
+    parser.add_argument("--type", default="reference", help="payload type for the stored points")
+    parser.add_argument("--batch-size", type=int, default=512, help="points per Qdrant upsert")
+    parser.add_argument("--workers", type=int, default=None, help="detection processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    summary = bulk_import(args.source, point_type=args.type,
+                          batch_size=args.batch_size, workers=args.workers)
+
+    print(f"Imported {summary['imported']}/{summary['images']} images ({summary['points']} faces) "
+          f"in {summary['seconds']:.1f}s ({summary['images_per_sec']:.2f} images/sec)")
+    for failure in summary["failures"]:
+        print(f"  ✗ {failure['image_path']}: {failure['error']}")
+
+    writer = summary["writer"]
+    print(f"Qdrant: {writer['flushes']} batches, avg {writer['avg_batch_size']:.0f} points, "
+          f"avg flush {writer['avg_flush_ms']:.1f}ms, max {writer['max_flush_ms']:.1f}ms, "
+          f"{writer['points_failed']} points failed")
+
+
+if __name__ == "__main__":
+    main()
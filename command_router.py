@@ -0,0 +1,164 @@
+"""
+Deterministic routing of CLI requests to tools, without an LLM round trip.
+
+    route("Detect the face in 'my photos/ref.jpg'")
+    → Route("detect_face", {"paths": ["my photos/ref.jpg"]})
+
+Every tool intent has a compiled pattern that accepts common synonyms
+("find/locate/spot the face", "measure proportions"), quoted paths (needed
+when a path contains spaces) and lists of paths ("a.jpg, b.jpg and c.jpg").
+Keywords are only recognised around paths, never inside them, so paths
+containing "to" or "in" parse correctly. Anything that does not match
+returns None and goes to the ReAct agent; stats() reports how often that
+still happens.
+"""
+
+import glob
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+
+from tracing import span
+
+# One path: double-quoted, single-quoted, or a bare run without spaces/commas
+_PATH = r"""(?:"[^"]+"|'[^']+'|[^\s,"']+)"""
+# Several paths separated by commas and/or "and"
+_PATHS = rf"{_PATH}(?:\s*,\s*(?:and\s+)?{_PATH}|\s+and\s+{_PATH})*"
+
+_POLITE = r"(?:(?:please|can\s+you|could\s+you|would\s+you|kindly)\s+)?"
+_END = r"(?:\s+please)?\s*[.!?]?"
+
+_PATH_TOKEN = re.compile(_PATH)
+
+
+@dataclass
+class Route:
+    intent: str
+    args: dict = field(default_factory=dict)
+
+
+def _pattern(body):
+    return re.compile(rf"^\s*{_POLITE}{body}{_END}\s*$", re.IGNORECASE)
+
+
+# (intent, pattern) in priority order; the first match wins
+_ROUTES = [
+    ("explain_loomis_guidelines", _pattern(
+        rf"(?:explain|describe|walk\s+me\s+through|teach\s+me)\s+(?:the\s+)?(?:loomis\s+)?"
+        rf"(?:guidelines?|guides?|construction|steps?|lines?)\s+(?:for|of|in|on)\s+(?P<paths>{_PATHS})"
+    )),
+    ("explain_loomis_guidelines", _pattern(
+        rf"(?:give\s+me\s+|write\s+|make\s+)?(?:an?\s+)?(?:loomis\s+)?(?:drawing\s+)?(?:tutorial|lesson)\s+"
+        rf"(?:for|of|on)\s+(?P<paths>{_PATHS})"
+    )),
+    ("loomis_guidelines", _pattern(
+        rf"(?:(?:get|export|give\s+me|return|show(?:\s+me)?)\s+)?(?:the\s+)?(?:loomis\s+)?guidelines?\s+"
+        rf"(?:for|of|in)\s+(?P<paths>{_PATHS})(?:\s+(?:as|in)\s+(?P<format>json|svg))?"
+    )),
+    ("apply_loomis", _pattern(
+        rf"(?:apply|draw|add|overlay|put)\s+(?:the\s+)?loomis(?:\s+(?:method|construction|lines|guidelines|guides))?\s+"
+        rf"(?:to|on|onto|over|for)\s+(?P<paths>{_PATHS})\s*,?\s+(?:and\s+)?(?:then\s+)?"
+        rf"(?:save|write|output|store|export)(?:\s+(?:it|them|the\s+results?))?\s+(?:to|as|at|in|into)\s+(?P<output>{_PATH})"
+    )),
+    ("detect_face", _pattern(
+        rf"(?:detect|find|locate|spot|look\s+for)\s+(?:the\s+|a\s+|all\s+(?:the\s+)?)?(?:faces?|heads?)\s+"
+        rf"(?:in|on|from|of|at)\s+(?P<paths>{_PATHS})"
+    )),
+    ("analyze_proportions", _pattern(
+        rf"(?:analy[sz]e|measure|check|compute|get|show(?:\s+me)?)\s+(?:the\s+)?(?:facial\s+|face\s+|head\s+)?"
+        rf"proportions?\s+(?:in|of|for|on|from)\s+(?P<paths>{_PATHS})"
+    )),
+    ("cache_stats", _pattern(r"(?:show\s+)?(?:the\s+)?cache\s+stat(?:s|istics)")),
+    ("memory_stats", _pattern(r"(?:show\s+)?(?:the\s+)?memory\s+stat(?:s|istics)")),
+    ("router_stats", _pattern(r"(?:show\s+)?(?:the\s+)?rout(?:er|ing)\s+stat(?:s|istics)")),
+    ("session_stats", _pattern(r"(?:show\s+)?(?:the\s+)?session\s+(?:stat(?:s|istics)|state)")),
+    ("clear_session", _pattern(r"(?:clear|reset|forget)\s+(?:the\s+)?session")),
+    ("compact_memory", _pattern(r"(?:compact|cluster|prune)\s+(?:the\s+)?(?:visual\s+)?memory")),
+    ("metrics", _pattern(
+        r"(?:show\s+)?(?:the\s+)?(?:latency\s+)?metrics(?:\s+(?:as\s+|in\s+)?(?P<format>text|json|prometheus))?"
+    )),
+]
+
+
+def _unquote(token):
+    if len(token) >= 2 and token[0] == token[-1] and token[0] in "\"'":
+        return token[1:-1]
+    # A bare path at the end of a sentence may carry its punctuation
+    if token not in (".", ".."):
+        token = token.rstrip("?!")
+        if token.endswith(".") and not token.endswith(".."):
+            token = token[:-1]
+    return token
+
+
+def split_paths(text):
+    """Paths in a matched path list, unquoted, without the "and" separators."""
+    return [_unquote(token) for token in _PATH_TOKEN.findall(text) if token.lower() != "and"]
+
+
+def is_batch_source(path):
+    """True for a directory or glob, which apply_loomis_batch handles."""
+    return os.path.isdir(path) or glob.has_magic(path)
+
+
+class CommandRouter:
+    """Matches requests against the compiled routes and counts the outcomes."""
+
+    def __init__(self, routes=_ROUTES):
+        self.routes = routes
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.fallbacks = 0
+        self.by_intent = {}
+
+    def route(self, text):
+        """Return a Route for text, or None when only the LLM can handle it."""
+        with span("agent.route"):
+            found = self._match(text)
+
+        with self._lock:
+            self.requests += 1
+            if found is None:
+                self.fallbacks += 1
+            else:
+                self.by_intent[found.intent] = self.by_intent.get(found.intent, 0) + 1
+        return found
+
+    def _match(self, text):
+        for intent, pattern in self.routes:
+            m = pattern.match(text)
+            if m is None:
+                continue
+
+            groups = m.groupdict()
+            args = {}
+            if groups.get("paths"):
+                args["paths"] = split_paths(groups["paths"])
+            if groups.get("output"):
+                args["output_path"] = _unquote(groups["output"])
+            if groups.get("format"):
+                args["format"] = groups["format"].lower()
+
+            if intent == "apply_loomis" and len(args["paths"]) == 1 and is_batch_source(args["paths"][0]):
+                return Route("apply_loomis_batch", {"source": args["paths"][0], "output_dir": args["output_path"]})
+            return Route(intent, args)
+        return None
+
+    def stats(self):
+        with self._lock:
+            routed = self.requests - self.fallbacks
+            return {
+                "requests": self.requests,
+                "routed": routed,
+                "llm_fallbacks": self.fallbacks,
+                "hit_rate": routed / self.requests if self.requests else 0.0,
+                "by_intent": dict(sorted(self.by_intent.items())),
+            }
+
+
+router = CommandRouter()
+
+
+def route(text):
+    return router.route(text)
@@ -0,0 +1,174 @@
+"""
+Collapse duplicate points in Loomis visual memory.
+
+Usage:
+    python compact_memory.py [--collection loomis_memory_v2] [--batch-size 256] [--dry-run]
+                             [--ttl SECONDS] [--max-per-type N] [--prototypes K]
+
+Before point ids were derived from image content, every apply_loomis or
+explain_loomis_guidelines call stored a new point, so re-analysed images
+left identical copies behind. Points are grouped by (image content, type,
+face index); each group keeps one point, moved to its content-derived id
+(see memory_store.memory_point_id), and the rest are deleted. The content
+hash comes from the payload or, for older points, from the file at
+image_path. Points whose image is gone are grouped by image_path, type,
+face index and vector instead and keep their current id.
+
+--ttl and --max-per-type then apply the retention policy, and --prototypes
+rebuilds the pose prototype collection (see memory_prototypes.py).
+"""
+
+import argparse
+import hashlib
+
+import numpy as np
+
+from landmark_cache import hash_image_bytes
+from memory_prototypes import DEFAULT_MAX_PER_TYPE, DEFAULT_TTL, apply_retention, build_prototypes
+from memory_store import make_point, memory_point_id
+from qdrant_setup import COLLECTION_NAME, get_qdrant_client
+
+
+def _content_hash(payload, digests):
+    if payload.get("content_hash"):
+        return payload["content_hash"]
+
+    image_path = payload.get("image_path")
+    if not image_path:
+        return None
+    if image_path not in digests:
+        try:
+            with open(image_path, "rb") as f:
+                digests[image_path] = hash_image_bytes(f.read())
+        except OSError:
+            digests[image_path] = None
+    return digests[image_path]
+
+
+def _vector_digest(vector):
+    # Re-analysing the same file yields the same embedding up to float noise
+    return hashlib.sha1(np.round(np.asarray(vector, dtype=np.float32), 5).tobytes()).hexdigest()
+
+
+def find_duplicates(client, collection=COLLECTION_NAME, batch_size=256):
+    """
+    Group every point in collection. Returns {key: group}, where group holds
+    "target" (the content-derived id, or None), "keep" (the record to keep)
+    and "ids" (all point ids in the group).
+    """
+    groups = {}
+    digests = {}
+    offset = None
+
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+
+        for record in records:
+            payload = dict(record.payload or {})
+            point_type = payload.get("type")
+            face_index = payload.get("face_index", 0)
+            content_hash = _content_hash(payload, digests)
+
+            if content_hash:
+                target = memory_point_id(content_hash, point_type, face_index)
+                key = target
+            else:
+                target = None
+                key = ("unhashed", payload.get("image_path"), point_type, face_index,
+                       _vector_digest(record.vector))
+
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = {"target": target, "keep": record, "ids": [], "content_hash": content_hash}
+            elif target is not None and str(record.id) == target:
+                # A point already at its content id wins over older copies
+                group["keep"] = record
+            group["ids"].append(str(record.id))
+
+        if offset is None:
+            break
+
+    return groups
+
+
+def compact(client, collection=COLLECTION_NAME, batch_size=256, dry_run=False):
+    """Keep one point per group from find_duplicates(). Returns a summary dict."""
+    from qdrant_client.models import PointIdsList
+
+    groups = find_duplicates(client, collection, batch_size)
+
+    rekeyed = []
+    deleted = []
+    for group in groups.values():
+        keep = group["keep"]
+        keep_id = str(keep.id)
+
+        if group["target"] is not None and keep_id != group["target"]:
+            payload = dict(keep.payload or {})
+            payload["content_hash"] = group["content_hash"]
+            payload.setdefault("face_index", 0)
+            rekeyed.append(make_point(group["target"], keep.vector, payload))
+            keep_id = group["target"]
+
+        deleted.extend(point_id for point_id in group["ids"] if point_id != keep_id)
+
+    summary = {
+        "scanned": sum(len(group["ids"]) for group in groups.values()),
+        "kept": len(groups),
+        "rekeyed": len(rekeyed),
+        "deleted": len(deleted),
+        "unhashed": sum(1 for group in groups.values() if group["target"] is None),
+    }
+    if dry_run:
+        return summary
+
+    # Write the surviving copies before removing anything
+    for i in range(0, len(rekeyed), batch_size):
+        client.upsert(collection_name=collection, points=rekeyed[i:i + batch_size])
+    for i in range(0, len(deleted), batch_size):
+        client.delete(collection_name=collection, points_selector=PointIdsList(points=deleted[i:i + batch_size]))
+
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collapse duplicate points in Loomis visual memory.")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    parser.add_argument("--ttl", type=float, default=DEFAULT_TTL,
+                        help="delete points stored more than this many seconds ago (0 keeps all)")
+    parser.add_argument("--max-per-type", type=int, default=DEFAULT_MAX_PER_TYPE,
+                        help="keep only the newest N points of each type (0 keeps all)")
+    parser.add_argument("--prototypes", type=int, default=0,
+                        help="rebuild up to K pose prototypes per type afterwards (0 skips)")
+    args = parser.parse_args(argv)
+
+    client = get_qdrant_client()
+    summary = compact(client, args.collection, args.batch_size, args.dry_run)
+
+    verb = "Would keep" if args.dry_run else "Kept"
+    print(f"{verb} {summary['kept']} of {summary['scanned']} points in '{args.collection}': "
+          f"{summary['deleted']} duplicates removed, {summary['rekeyed']} moved to content ids")
+    if summary["unhashed"]:
+        print(f"{summary['unhashed']} groups have no readable image and were matched by vector instead")
+    if args.dry_run:
+        return
+
+    retention = apply_retention(client, args.collection, args.ttl, args.max_per_type)
+    if args.ttl or args.max_per_type:
+        print(f"Retention: {retention['expired']} expired, {retention['trimmed']} over the per-type cap")
+    if args.prototypes:
+        built = build_prototypes(client, args.collection, args.prototypes)
+        print(f"Built {built['prototypes']} prototypes over {built['points']} points "
+              f"({built['stale_prototypes_removed']} stale removed)")
+
+
+if __name__ == "__main__":
+    main()
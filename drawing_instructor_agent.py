@@ -1,20 +1,72 @@
-from langchain_ollama import ChatOllama
+import os
+import threading
+import time
+from types import SimpleNamespace
 
-instructor_llm = ChatOllama(
-    model = "qwen2.5:1.5b",
-    temperature=0.5
-)
+from response_cache import response_cache
+from tracing import record, span
 
-def generate_drawing_instructions(
-    direction: str,
-    radius: float,
-    center: tuple,
-    proportions: dict,
-    notes: str = ""
-) -> str:
-    cx, cy = center
+# "ollama" (default) or "fake": a local stand-in that needs no model server
+INSTRUCTOR_LLM = os.getenv("LOOMIS_INSTRUCTOR_LLM", "ollama")
+INSTRUCTOR_MODEL = "qwen2.5:1.5b"
+# Seconds the fake LLM waits before each token, to mimic generation speed
+FAKE_TOKEN_DELAY = float(os.getenv("LOOMIS_FAKE_LLM_DELAY", "0"))
+
+# Bump when the prompt changes so cached tutorials from the old one are ignored
+PROMPT_VERSION = 1
+# Geometry is bucketed so near-identical heads share one cached tutorial
+RADIUS_BUCKET = 25
+RATIO_BUCKET = 0.05
+
+_llm_lock = threading.Lock()
+_instructor_llm = None
+
+
+class FakeInstructorLLM:
+    """
+    Deterministic stand-in for ChatOllama with the same invoke/stream
+    interface. Echoes the detected geometry back as a short tutorial, one
+    word per chunk.
+    """
 
-    prompt = f"""
+    model = "fake"
+
+    def __init__(self, token_delay=FAKE_TOKEN_DELAY):
+        self.token_delay = token_delay
+
+    def _text(self, prompt):
+        facts = [line.strip("- ").strip() for line in prompt.splitlines() if line.startswith("- ")]
+        steps = "\n".join(f"{i}. Draw the guideline for: {fact}." for i, fact in enumerate(facts, start=1))
+        return f"Loomis tutorial (fake instructor)\n{steps}\n"
+
+    def stream(self, prompt):
+        for word in self._text(prompt).split(" "):
+            if self.token_delay:
+                time.sleep(self.token_delay)
+            yield SimpleNamespace(content=word + " ")
+
+    def invoke(self, prompt):
+        return SimpleNamespace(content="".join(chunk.content for chunk in self.stream(prompt)))
+
+
+def get_instructor_llm():
+    global _instructor_llm
+    if _instructor_llm is None:
+        with _llm_lock:
+            if _instructor_llm is None:
+                if INSTRUCTOR_LLM == "fake":
+                    _instructor_llm = FakeInstructorLLM()
+                else:
+                    from langchain_ollama import ChatOllama
+                    _instructor_llm = ChatOllama(
+                        model = INSTRUCTOR_MODEL,
+                        temperature=0.5
+                    )
+    return _instructor_llm
+
+
+def build_prompt(direction, radius, center, proportions, notes=""):
+    return f"""
 You are a professional art teacher trained in the Loomis head construction method.
 
 The system has already detected:
@@ -39,6 +91,68 @@ The following Loomis guidelines were auto-generated:
 Write a detailed but simple drawing tutorial for a beginner artist.
 ...
 """
-    response = instructor_llm.invoke(prompt)
-    return response.content
 
+
+def response_key(direction, radius, proportions, model=INSTRUCTOR_MODEL):
+    """
+    Cache key for a tutorial: prompt version, model, direction, radius bucket
+    and face ratio bucket. Center and the memory notes are left out, as they
+    change between requests without changing what the tutorial teaches.
+    """
+    ratio = proportions.get("ratio") or 0.0
+    return (
+        f"v{PROMPT_VERSION}|{model}|{direction}"
+        f"|r{int(radius // RADIUS_BUCKET)}|q{round(ratio / RATIO_BUCKET)}"
+    )
+
+
+def stream_drawing_instructions(
+    direction: str,
+    radius: float,
+    center: tuple,
+    proportions: dict,
+    notes: str = "",
+    cache=None,
+):
+    """
+    Yield the tutorial as text chunks as the LLM produces them.
+
+    A cached tutorial for the same geometry bucket is yielded as one chunk
+    without calling the LLM. A freshly generated one is cached only once the
+    stream completes, so a stream closed early never caches partial text.
+    """
+    cache = cache or response_cache
+    llm = get_instructor_llm()
+    key = response_key(direction, radius, proportions, getattr(llm, "model", INSTRUCTOR_MODEL))
+
+    with span("llm.cache_lookup"):
+        cached = cache.get(key)
+    if cached is not None:
+        yield cached
+        return
+
+    prompt = build_prompt(direction, radius, center, proportions, notes)
+    parts = []
+    with span("llm.instructor"):
+        start = time.perf_counter()
+        for chunk in llm.stream(prompt):
+            if not chunk.content:
+                continue
+            if not parts:
+                record("llm.first_token", time.perf_counter() - start)
+            parts.append(chunk.content)
+            yield chunk.content
+
+    if parts:
+        cache.put(key, "".join(parts))
+
+
+def generate_drawing_instructions(
+    direction: str,
+    radius: float,
+    center: tuple,
+    proportions: dict,
+    notes: str = "",
+    cache=None,
+) -> str:
+    return "".join(stream_drawing_instructions(direction, radius, center, proportions, notes, cache))
@@ -1,7 +1,59 @@
-def geometry_to_vector(g):
-    return [
-        g["radius"],
-        g["center_x"],
-        g["center_y"],
-        g["direction"]
-    ]
+import math
+
+import numpy as np
+
+from head_pose import estimate_head_pose
+from landmarks import as_face_landmarks
+
+# 3: pose from head_pose's fitted rotation instead of a 2D nose heuristic
+EMBEDDING_VERSION = 3
+
+# FaceMesh face-oval contour followed by brows, eye corners, nose and mouth
+SHAPE_LANDMARKS = [
+    10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288,
+    397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136,
+    172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109,
+    105, 334, 33, 133, 362, 263, 1, 98, 327, 61, 291, 13, 14,
+]
+
+# Weight of each pose angle relative to the unit-norm shape part
+POSE_WEIGHT = 1.0
+
+EMBEDDING_DIM = 2 * len(SHAPE_LANDMARKS) + 6
+
+
+def landmarks_to_embedding(face_landmarks, pose=None, image_width=None):
+    """
+    Scale-, translation- and roll-invariant shape descriptor plus head pose.
+
+    pose is (yaw, pitch, roll) in radians from head_pose; pass the one the
+    side plane was drawn from so the two always agree. Without it the pose
+    is fitted here, in 3D when image_width is given.
+
+    The SHAPE_LANDMARKS subset is centred on its centroid, scaled to unit RMS
+    radius and rotated by -roll so the head is upright (a Procrustes alignment
+    against a level, unit-size frame). The flattened coordinates are
+    normalised to unit length and followed by (sin, cos) of yaw, pitch and
+    roll, each pair weighted by POSE_WEIGHT. Every embedding therefore has the
+    same norm, so cosine similarity ranks neighbours exactly like Euclidean
+    distance would.
+    """
+    face_landmarks = as_face_landmarks(face_landmarks)
+    if len(face_landmarks) < 468:
+        raise ValueError("Face landmark data is incomplete")
+
+    yaw, pitch, roll = estimate_head_pose(face_landmarks, image_width) if pose is None else pose
+
+    shape = face_landmarks.points[SHAPE_LANDMARKS, :2].astype(np.float64)
+    shape -= shape.mean(axis=0)
+    scale = np.sqrt((shape ** 2).sum(axis=1).mean()) or 1.0
+    shape /= scale
+
+    c, s = math.cos(-roll), math.sin(-roll)
+    shape = shape @ np.array([[c, s], [-s, c]])
+    shape = shape.ravel() / math.sqrt(len(SHAPE_LANDMARKS))
+
+    angles = np.array([yaw, pitch, roll])
+    pose_part = POSE_WEIGHT * np.stack([np.sin(angles), np.cos(angles)], axis=1).ravel()
+
+    return np.concatenate([shape, pose_part]).astype(np.float32).tolist()
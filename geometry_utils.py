@@ -1,20 +1,20 @@
 import math
 
+import numpy as np
+
+from head_pose import direction_from_yaw, estimate_head_pose
+from landmarks import CHIN, NOSE, as_face_batch, as_face_landmarks
+
 def calculate_head_dimensions(face_landmarks):
 
     if face_landmarks is None or len(face_landmarks) < 468:
         raise ValueError("Face landmark data is incomplete")
 
-    xs = [p[0] for p in face_landmarks]
-    ys = [p[1] for p in face_landmarks]
+    face_landmarks = as_face_landmarks(face_landmarks)
 
-    left   = min(xs)
-    right  = max(xs)
-    top    = min(ys)
-    bottom = max(ys)
+    left, top, right, bottom = face_landmarks.bbox
 
-    face_width  = right - left
-    face_height = bottom - top
+    face_height = face_landmarks.height
 
     radius = int(face_height * 0.55)
 
@@ -27,36 +27,50 @@ def calculate_head_dimensions(face_landmarks):
     return radius, center, skull_top
 
 
-def compute_face_turn_angle(face_landmarks):
-
-    nose = face_landmarks[1]
-
-    # compute center of all face landmarks
-    xs = [p[0] for p in face_landmarks]
-    center_x = sum(xs) / len(xs)
-
-    if nose[0] < center_x:
-        return "right"   # nose moved right → head turns right
-    else:
-        return "left"
+def compute_face_turn_angle(face_landmarks, image_width=None):
+    """
+    "left" or "right" from the sign of the head_pose yaw, so it always agrees
+    with the side plane drawn for the same face and image_width.
+    """
+    yaw, _, _ = estimate_head_pose(face_landmarks, image_width)
+    return direction_from_yaw([yaw])[0]
 
 def compute_centerline(face_landmarks):
     if face_landmarks is None or len(face_landmarks) < 468:
         raise ValueError("Face landmark data is incomplete")
-    
-    nose = face_landmarks[1]
-    chin = face_landmarks[152]
+
+    face_landmarks = as_face_landmarks(face_landmarks)
+
+    nose = face_landmarks.point(NOSE)
+    chin = face_landmarks.point(CHIN)
 
     dx = chin[0] - nose[0]
     dy = chin[1] - nose[1]
 
-    
+
     angle = math.degrees(math.atan2(dy, dx))
 
-    
+
     angle = angle + 90
 
-    return angle, (nose[0], nose[1]), (chin[0], chin[1])
+    return angle, nose, chin
+
+
+def calculate_head_dimensions_batch(faces):
+    """
+    calculate_head_dimensions for every face at once. Takes a
+    FaceLandmarksBatch (or (F, N, 3) array) and returns int arrays radii (F,),
+    centers (F, 2) and skull_tops (F, 2), matching the per-face results.
+    """
+    faces = as_face_batch(faces)
+    if faces and faces.num_landmarks < 468:
+        raise ValueError("Face landmark data is incomplete")
+
+    left, top, right, bottom = faces.bbox.T
 
+    radii = (faces.height * 0.55).astype(int)
+    centers = np.stack([((left + right) / 2).astype(int), ((top + bottom) / 2).astype(int)], axis=1)
+    skull_tops = centers - np.stack([np.zeros_like(radii), radii], axis=1)
 
+    return radii, centers, skull_tops
 
@@ -0,0 +1,131 @@
+"""
+Continuous head pose (yaw, pitch, roll) from FaceMesh landmarks.
+
+A rigid canonical face model is fitted to every face at once: the stable
+keypoints below are gathered from a stacked (F, N, 3) landmark array, a
+least-squares linear map from the model onto them is one matrix product
+with the model's precomputed pseudo-inverse, and the nearest rotation comes
+from one batched SVD. There is no Python loop over faces, so a batch job or
+a run of video frames costs one call.
+
+Angles are in radians, in image axes (x right, y down, z away from the
+camera). A pose's rotation is R = Rz(roll)·Rx(pitch)·Ry(yaw), applied to a
+head looking straight at the camera: positive yaw turns the nose towards
+image right, positive pitch tilts it down and positive roll turns the eye
+line clockwise. rotation_matrix builds R and rotation_to_angles inverts it.
+"""
+
+import math
+
+import numpy as np
+
+from landmarks import (
+    CHIN, LEFT_BROW, LEFT_EYE_OUTER, LEFT_JAW, LEFT_NOSTRIL, NOSE,
+    RIGHT_BROW, RIGHT_EYE_OUTER, RIGHT_JAW, RIGHT_NOSTRIL, as_face_batch, as_face_landmarks,
+)
+
+# Canonical 3D positions of the fitted keypoints for a face looking straight
+# at the camera: x right, y down, z away from the camera, in head half-widths
+CANONICAL_KEYPOINTS = {
+    NOSE: (0.0, 0.05, -1.0),
+    CHIN: (0.0, 0.75, -0.65),
+    LEFT_BROW: (-0.35, -0.4, -0.8),
+    RIGHT_BROW: (0.35, -0.4, -0.8),
+    LEFT_EYE_OUTER: (-0.55, -0.2, -0.6),
+    RIGHT_EYE_OUTER: (0.55, -0.2, -0.6),
+    133: (-0.2, -0.2, -0.75),   # inner eye corners
+    362: (0.2, -0.2, -0.75),
+    LEFT_NOSTRIL: (-0.15, 0.15, -0.85),
+    RIGHT_NOSTRIL: (0.15, 0.15, -0.85),
+    61: (-0.3, 0.4, -0.75),     # mouth corners
+    291: (0.3, 0.4, -0.75),
+    13: (0.0, 0.35, -0.8),      # lips
+    14: (0.0, 0.45, -0.8),
+    LEFT_JAW: (-0.6, 0.5, -0.4),
+    RIGHT_JAW: (0.6, 0.5, -0.4),
+    10: (0.0, -0.9, -0.5),      # forehead top
+}
+
+_INDICES = np.array(list(CANONICAL_KEYPOINTS))
+_MODEL = np.array(list(CANONICAL_KEYPOINTS.values()))
+_MODEL -= _MODEL.mean(axis=0)
+# points ≈ _MODEL @ A.T is solved for every face by A = points.T @ _MODEL_PINV.T
+_MODEL_PINV = np.linalg.pinv(_MODEL)
+
+
+def rotation_matrix(yaw, pitch, roll):
+    """(3, 3) rotation Rz(roll)·Rx(pitch)·Ry(yaw) for angles in radians."""
+    cy, sy = math.cos(yaw), math.sin(yaw)
+    cp, sp = math.cos(pitch), math.sin(pitch)
+    cr, sr = math.cos(roll), math.sin(roll)
+
+    ry = np.array([[cy, 0, -sy], [0, 1, 0], [sy, 0, cy]])
+    rx = np.array([[1, 0, 0], [0, cp, -sp], [0, sp, cp]])
+    rz = np.array([[cr, -sr, 0], [sr, cr, 0], [0, 0, 1]])
+    return rz @ rx @ ry
+
+
+def fit_rotation_batch(faces, image_width=None):
+    """
+    (F, 3, 3) rotations taking the canonical model onto each face.
+
+    FaceLandmarks store z as FaceMesh reports it, normalised by image width,
+    so with image_width the fit uses all three coordinates. Without it only
+    x and y are fitted (scaled orthographic) and the depth row is their cross
+    product.
+    """
+    faces = as_face_batch(faces)
+    if not faces:
+        return np.zeros((0, 3, 3))
+    if faces.num_landmarks < 468:
+        raise ValueError("Face landmark data is incomplete")
+
+    points = faces.points[:, _INDICES].astype(np.float64)
+    if image_width is None:
+        points = points[:, :, :2]
+    else:
+        points[:, :, 2] *= image_width
+    points -= points.mean(axis=1, keepdims=True)
+
+    # Least-squares linear map, then its nearest orthonormal rows (polar factor)
+    linear = points.transpose(0, 2, 1) @ _MODEL_PINV.T
+    u, _, vt = np.linalg.svd(linear, full_matrices=False)
+
+    if image_width is None:
+        rows = u @ vt
+        # Cross product of the two rows; np.cross costs more than the fit for small F
+        (x1, y1, z1), (x2, y2, z2) = rows[:, 0].T, rows[:, 1].T
+        depth = np.stack([y1 * z2 - z1 * y2, z1 * x2 - x1 * z2, x1 * y2 - y1 * x2], axis=1)
+        return np.concatenate([rows, depth[:, None]], axis=1)
+
+    # Undo reflections so every result is a proper rotation
+    u[:, :, 2] *= np.sign(np.linalg.det(u @ vt))[:, None]
+    return u @ vt
+
+
+def rotation_to_angles(rotations):
+    """(F, 3) yaw, pitch, roll in radians for (F, 3, 3) rotations; see rotation_matrix."""
+    rotations = np.asarray(rotations, dtype=np.float64).reshape(-1, 3, 3)
+    yaw = np.arctan2(rotations[:, 2, 0], rotations[:, 2, 2])
+    pitch = np.arcsin(np.clip(rotations[:, 2, 1], -1.0, 1.0))
+    roll = np.arctan2(-rotations[:, 0, 1], rotations[:, 1, 1])
+    return np.stack([yaw, pitch, roll], axis=1)
+
+
+def estimate_head_pose_batch(faces, image_width=None):
+    """(F, 3) float64 yaw, pitch, roll in radians for every face; see fit_rotation_batch."""
+    return rotation_to_angles(fit_rotation_batch(faces, image_width))
+
+
+def estimate_head_pose(face_landmarks, image_width=None):
+    """(yaw, pitch, roll) in radians for one face."""
+    yaw, pitch, roll = estimate_head_pose_batch(as_face_landmarks(face_landmarks), image_width)[0]
+    return float(yaw), float(pitch), float(roll)
+
+
+def direction_from_yaw(yaws):
+    """
+    "left"/"right" per yaw, in compute_face_turn_angle's terms: the nose
+    towards image left (negative yaw) is a turn to the "right".
+    """
+    return np.where(np.asarray(yaws, dtype=np.float64) < 0, "right", "left").tolist()
@@ -0,0 +1,155 @@
+"""
+Decoding helpers for the detection stage.
+
+MediaPipe resizes its input to a few hundred pixels internally, so running it
+on a 24-megapixel reference only costs memory and time.
+decode_for_detection() decodes straight to a reduced size where the codec
+allows it (JPEG DCT scaling through cv2.IMREAD_REDUCED_*) and then
+fit_max_side() shrinks anything still larger than max_side. Landmarks stay
+correct because MediaPipe returns normalised coordinates, which callers scale
+by the original (height, width).
+"""
+
+import binascii
+import io
+import os
+
+import cv2
+import numpy as np
+
+# Longest side, in pixels, that detection runs at; 0 disables downscaling
+DEFAULT_MAX_SIDE = int(os.getenv("LOOMIS_DETECT_MAX_SIDE", "1280"))
+
+_REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+# EXIF orientations that swap width and height (OpenCV applies them on decode)
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+# Bytes handed to PIL to read the header; EXIF and SOF sit well inside this
+_HEADER_BYTES = 256 * 1024
+
+IMAGE_MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg", "jpg": "image/jpeg", "webp": "image/webp"}
+
+
+def is_jpeg(image_bytes):
+    return bytes(image_bytes[:2]) == b"\xff\xd8"
+
+
+def _read_header(data):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        width, height = img.size
+        orientation = img.getexif().get(0x0112)
+    return width, height, orientation
+
+
+def image_header_size(image_bytes):
+    """
+    (height, width) as OpenCV will decode it, read from the file header
+    without decoding pixels. Returns None when the header cannot be parsed.
+    """
+    view = memoryview(image_bytes)
+    try:
+        try:
+            # Only the head of the file is copied into PIL's buffer
+            width, height, orientation = _read_header(view[:_HEADER_BYTES])
+        except Exception:
+            if len(view) <= _HEADER_BYTES:
+                raise
+            width, height, orientation = _read_header(view)
+    except Exception:
+        return None
+
+    if orientation in _TRANSPOSED_ORIENTATIONS:
+        width, height = height, width
+    return height, width
+
+
+def reduction_factor(size, max_side):
+    """Largest JPEG reduction (2, 4 or 8) that keeps the long side >= max_side."""
+    if not max_side:
+        return 1
+    long_side = max(size)
+    for factor, _ in _REDUCED_FLAGS:
+        if long_side // factor >= max_side:
+            return factor
+    return 1
+
+
+def fit_max_side(image, max_side):
+    """Downscale image so its longest side is at most max_side (no copy otherwise)."""
+    if not max_side:
+        return image
+
+    height, width = image.shape[:2]
+    long_side = max(height, width)
+    if long_side <= max_side:
+        return image
+
+    scale = max_side / long_side
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def decode_image(image_bytes):
+    """
+    Decode image bytes (bytes, bytearray or memoryview) to a full-resolution
+    BGR array, or None if undecodable. The buffer is wrapped, not copied.
+    """
+    return cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def decode_base64_image(data):
+    """Encoded image bytes from base64 text; a data: URL prefix is accepted."""
+    if data.startswith("data:"):
+        data = data.partition(",")[2]
+    try:
+        return binascii.a2b_base64(data)
+    except binascii.Error as e:
+        raise ValueError(f"Invalid base64 image data: {e}")
+
+
+def encode_image(image, image_format="png"):
+    """
+    Encode a BGR array as "png", "jpeg" or "webp". Returns a memoryview of
+    OpenCV's output buffer, so no copy is made until the caller needs one.
+    """
+    if image_format not in IMAGE_MIME_TYPES:
+        raise ValueError(f"Unsupported image format: {image_format}")
+    ok, buffer = cv2.imencode(f".{image_format}", image)
+    if not ok:
+        raise ValueError(f"Could not encode image as {image_format}")
+    return memoryview(buffer).cast("B")
+
+
+def decode_for_detection(image_bytes, max_side=DEFAULT_MAX_SIDE):
+    """
+    Decode image bytes for inference. Returns (image, original_size): image is
+    at most max_side on its longest side, decoded reduced when the codec
+    allows it, and original_size is the full-resolution (height, width) that
+    landmarks map back to. Returns (None, None) when undecodable.
+    """
+    size = image_header_size(image_bytes) if max_side and is_jpeg(image_bytes) else None
+    factor = reduction_factor(size, max_side) if size else 1
+
+    if factor > 1:
+        image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), dict(_REDUCED_FLAGS)[factor])
+    else:
+        image = decode_image(image_bytes)
+        size = image.shape[:2] if image is not None else None
+
+    if image is None:
+        return None, None
+
+    return fit_max_side(image, max_side), tuple(size)
+
+
+def read_for_detection(image_path, max_side=DEFAULT_MAX_SIDE):
+    """decode_for_detection() for a file path; a missing file gives (None, None)."""
+    try:
+        with open(image_path, "rb") as f:
+            image_bytes = f.read()
+    except OSError:
+        return None, None
+    return decode_for_detection(image_bytes, max_side)
@@ -0,0 +1,140 @@
+import hashlib
+import os
+
+import numpy as np
+
+from image_io import DEFAULT_MAX_SIDE, decode_for_detection, decode_image
+from landmarks import FaceLandmarks, FaceLandmarksBatch
+from pose_detection import MAX_NUM_FACES, detect_landmarks
+from tiered_cache import TieredCache
+from tracing import span
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("LANDMARK_CACHE_SIZE", "128"))
+DEFAULT_MAX_DISK_ENTRIES = int(os.getenv("LANDMARK_CACHE_DISK_SIZE", "4096"))
+# Leave LANDMARK_CACHE_DIR unset to keep the cache purely in memory
+DEFAULT_CACHE_DIR = os.getenv("LANDMARK_CACHE_DIR") or None
+
+# Entries written before multi-face support have no "faces" and read as misses
+ENTRY_FIELDS = ("faces", "pose", "image_size")
+
+
+def hash_image_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def cache_key(digest, landmark_sets, max_side=DEFAULT_MAX_SIDE, max_faces=MAX_NUM_FACES):
+    # Landmarks inferred at different resolutions differ slightly
+    return f"{digest}-{'+'.join(sorted(landmark_sets))}-{max_side or 'full'}-f{max_faces}"
+
+
+def landmarks_to_array(points):
+    return np.asarray(points, dtype=np.float32).reshape(-1, 3)
+
+
+def array_to_landmarks(arr):
+    return [(int(x), int(y), float(z)) for x, y, z in arr.tolist()]
+
+
+class LandmarkCache(TieredCache):
+    """
+    Landmark cache keyed by a hash of the encoded image bytes.
+
+    A TieredCache whose on-disk tier holds .npz files with the float32
+    (F, N, 3) face landmarks, the (N, 3) pose landmarks and the
+    (height, width) of the decoded image.
+    """
+
+    suffix = ".npz"
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=DEFAULT_CACHE_DIR,
+                 max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        super().__init__(max_entries, cache_dir, max_disk_entries)
+
+    def put(self, key, entry):
+        image_size = np.asarray(entry["image_size"], dtype=np.int32)
+        return super().put(key, {
+            "faces": FaceLandmarksBatch(entry.get("faces", [])).points,
+            "pose": landmarks_to_array(entry.get("pose", [])),
+            "image_size": image_size,
+        })
+
+    def _read_file(self, path, key):
+        with np.load(path) as archive:
+            return {name: archive[name] for name in ENTRY_FIELDS}, None
+
+    def _write_file(self, path, key, entry, created_at):
+        with open(path, "wb") as f:
+            np.savez(f, **entry)
+
+
+landmark_cache = LandmarkCache()
+
+
+def get_landmarks(image_path, landmark_sets=("face",), cache=None, with_image=False,
+                  max_side=DEFAULT_MAX_SIDE):
+    """
+    Return the requested landmark sets for image_path, running detection only
+    on a cache miss. Sets that were not requested come back empty. "faces"
+    holds every detected face and "face" the first one; "digest" is the
+    sha256 of the encoded image.
+
+    Inference runs at most max_side pixels on the longest side; landmarks and
+    "image_size" ((height, width)) always refer to the full-resolution image.
+    With with_image=True the full-resolution BGR image is returned under
+    "image" and, on a miss, inference runs on a downscaled view of that same
+    decode. Otherwise a JPEG is decoded straight at reduced size and the
+    full-resolution pixels are never materialised.
+    """
+    with span("landmarks.read"):
+        with open(image_path, "rb") as f:
+            image_bytes = f.read()
+
+    return get_landmarks_from_bytes(image_bytes, landmark_sets, cache, with_image, max_side)
+
+
+def get_landmarks_from_bytes(image_bytes, landmark_sets=("face",), cache=None, with_image=False,
+                             max_side=DEFAULT_MAX_SIDE):
+    """
+    get_landmarks() for an encoded image already in memory (bytes, bytearray
+    or memoryview), e.g. one sent inline by an MCP client. The buffer is
+    hashed and decoded in place, never copied.
+    """
+    cache = cache or landmark_cache
+
+    with span("landmarks.cache_lookup"):
+        digest = hash_image_bytes(image_bytes)
+        key = cache_key(digest, landmark_sets, max_side)
+        entry = cache.get(key)
+
+    image = None
+    if entry is None:
+        with span("landmarks.decode"):
+            if with_image:
+                image = decode_image(image_bytes)
+                detect_input, image_size = image, image.shape[:2] if image is not None else None
+            else:
+                detect_input, image_size = decode_for_detection(image_bytes, max_side)
+        if detect_input is None:
+            raise ValueError("Image not found or unable to read.")
+        data = detect_landmarks(detect_input, landmark_sets=landmark_sets, display=False,
+                                max_side=max_side, image_size=image_size)
+        entry = cache.put(key, data)
+
+    faces = FaceLandmarksBatch(entry["faces"])
+    result = {
+        "face": faces[0] if faces else FaceLandmarks([]),
+        "faces": faces,
+        "pose": array_to_landmarks(entry["pose"]),
+        "image_size": tuple(int(v) for v in entry["image_size"]),
+        "digest": digest,
+    }
+
+    if with_image:
+        if image is None:
+            with span("landmarks.decode"):
+                image = decode_image(image_bytes)
+            if image is None:
+                raise ValueError("Image not found or unable to read.")
+        result["image"] = image
+
+    return result
@@ -0,0 +1,205 @@
+from functools import cached_property
+
+import numpy as np
+
+# FaceMesh landmark indices used by the Loomis construction
+NOSE = 1
+CHIN = 152
+LEFT_BROW = 105
+RIGHT_BROW = 334
+LEFT_NOSTRIL = 98
+RIGHT_NOSTRIL = 327
+LEFT_JAW = 172
+RIGHT_JAW = 397
+LEFT_EYE_OUTER = 33
+RIGHT_EYE_OUTER = 263
+
+
+class FaceLandmarks:
+    """
+    Face landmarks backed by a single (N, 3) float32 array of pixel x, pixel y
+    and FaceMesh z.
+
+    Indexing returns the row for one landmark, so code written against the old
+    list of (x, y, z) tuples keeps working. Aggregates (bounding box, centroid,
+    extents) are computed once per instance and memoized.
+    """
+
+    def __init__(self, points):
+        self.points = np.asarray(points, dtype=np.float32).reshape(-1, 3)
+
+    def __len__(self):
+        return len(self.points)
+
+    def __bool__(self):
+        return len(self.points) > 0
+
+    def __getitem__(self, index):
+        return self.points[index]
+
+    def __iter__(self):
+        return iter(self.points)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.points
+        return self.points.astype(dtype)
+
+    def point(self, index):
+        x, y = self.points[index, :2]
+        return int(x), int(y)
+
+    @property
+    def nose(self):
+        return self.points[NOSE]
+
+    @property
+    def chin(self):
+        return self.points[CHIN]
+
+    @property
+    def left_brow(self):
+        return self.points[LEFT_BROW]
+
+    @property
+    def right_brow(self):
+        return self.points[RIGHT_BROW]
+
+    @property
+    def left_nostril(self):
+        return self.points[LEFT_NOSTRIL]
+
+    @property
+    def right_nostril(self):
+        return self.points[RIGHT_NOSTRIL]
+
+    @property
+    def left_jaw(self):
+        return self.points[LEFT_JAW]
+
+    @property
+    def right_jaw(self):
+        return self.points[RIGHT_JAW]
+
+    @cached_property
+    def bbox(self):
+        """(left, top, right, bottom) in pixels."""
+        left, top = self.points[:, :2].min(axis=0)
+        right, bottom = self.points[:, :2].max(axis=0)
+        return float(left), float(top), float(right), float(bottom)
+
+    @cached_property
+    def centroid(self):
+        """Mean (x, y) over all landmarks."""
+        cx, cy = self.points[:, :2].mean(axis=0, dtype=np.float64)
+        return float(cx), float(cy)
+
+    @cached_property
+    def width(self):
+        left, _, right, _ = self.bbox
+        return right - left
+
+    @cached_property
+    def height(self):
+        _, top, _, bottom = self.bbox
+        return bottom - top
+
+    @property
+    def ratio(self):
+        return self.width / self.height
+
+
+def as_face_landmarks(face_landmarks):
+    if isinstance(face_landmarks, FaceLandmarks):
+        return face_landmarks
+    return FaceLandmarks(face_landmarks)
+
+
+class FaceLandmarksBatch:
+    """
+    Landmarks for every face in an image as one (F, N, 3) float32 array.
+
+    Aggregates are vectorized across faces and memoized; indexing returns a
+    FaceLandmarks view of one face, so per-face code keeps working.
+    """
+
+    def __init__(self, points):
+        points = np.asarray(points, dtype=np.float32)
+        if points.size == 0:
+            points = points.reshape(0, 0, 3)
+        elif points.ndim == 2:
+            points = points[None]
+        self.points = points
+
+    @classmethod
+    def from_faces(cls, faces):
+        faces = [np.asarray(face, dtype=np.float32) for face in faces if len(face)]
+        return cls(np.stack(faces) if faces else [])
+
+    def __len__(self):
+        return len(self.points)
+
+    def __bool__(self):
+        return len(self.points) > 0
+
+    def __getitem__(self, index):
+        return FaceLandmarks(self.points[index])
+
+    def __iter__(self):
+        return (FaceLandmarks(points) for points in self.points)
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.points
+        return self.points.astype(dtype)
+
+    @property
+    def num_landmarks(self):
+        return self.points.shape[1]
+
+    def landmark(self, index):
+        """(F, 3) array of one landmark across all faces."""
+        return self.points[:, index]
+
+    @cached_property
+    def planes(self):
+        """
+        Contiguous (F, 2, N) copy of the x and y coordinates. NumPy reduces
+        along a contiguous last axis many times faster than across the
+        middle axis of (F, N, 3), so the aggregates below reduce over this.
+        """
+        return np.ascontiguousarray(self.points[:, :, :2].transpose(0, 2, 1))
+
+    @cached_property
+    def bbox(self):
+        """(F, 4) float64 array of (left, top, right, bottom)."""
+        if not len(self.points):
+            return np.zeros((0, 4))
+        return np.concatenate([self.planes.min(axis=2), self.planes.max(axis=2)], axis=1).astype(np.float64)
+
+    @cached_property
+    def centroid(self):
+        """(F, 2) float64 mean (x, y) per face."""
+        if not len(self.points):
+            return np.zeros((0, 2))
+        return self.planes.mean(axis=2, dtype=np.float64)
+
+    @cached_property
+    def width(self):
+        return self.bbox[:, 2] - self.bbox[:, 0]
+
+    @cached_property
+    def height(self):
+        return self.bbox[:, 3] - self.bbox[:, 1]
+
+    @property
+    def ratio(self):
+        return self.width / self.height
+
+
+def as_face_batch(faces):
+    if isinstance(faces, FaceLandmarksBatch):
+        return faces
+    if isinstance(faces, FaceLandmarks):
+        return FaceLandmarksBatch(faces.points)
+    return FaceLandmarksBatch(faces)
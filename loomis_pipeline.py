@@ -0,0 +1,446 @@
+"""
+The detection → geometry → render → memory pipeline shared by agent.py,
+mcp_server.py and batch.py.
+
+Front ends describe what they need with a LoomisRequest (or build one from
+tool arguments with build_request) and format the LoomisResult with
+format_result, so every optimisation lands in one place.
+"""
+
+import json
+import os
+import time
+from contextlib import closing, contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+from drawing_instructor_agent import stream_drawing_instructions
+from embedding_utils import EMBEDDING_VERSION, landmarks_to_embedding
+from geometry_utils import calculate_head_dimensions_batch
+from head_pose import direction_from_yaw, estimate_head_pose_batch
+from image_io import decode_base64_image, encode_image
+from landmark_cache import get_landmarks, get_landmarks_from_bytes
+from landmarks import FaceLandmarks, FaceLandmarksBatch
+from memory_retriever import retrieve_similar
+from memory_store import memory_point_id, store_in_qdrant
+from qdrant_setup import get_qdrant_client
+from render_steps import (
+    build_display_list_batch, display_list_to_json, display_list_to_svg,
+    is_vector_output, rasterize_display_list, write_display_list,
+)
+from tracing import profiled, span
+
+
+class PipelineCancelled(Exception):
+    pass
+
+
+@dataclass
+class LoomisRequest:
+    # With image_bytes set this is only a label (stored in memory payloads)
+    image_path: Optional[str]
+    # Encoded image held by the caller; used instead of reading image_path
+    image_bytes: Optional[bytes] = field(default=None, repr=False)
+    # Save the construction here (.svg/.json paths get vector guidelines)
+    output_path: Optional[str] = None
+    # Return the annotated image encoded as "png", "jpeg" or "webp"
+    image_format: Optional[str] = None
+    # Return the guidelines inline as "json" or "svg"
+    guidelines_format: Optional[str] = None
+    # Store a memory point with this payload type ("reference", "user_drawing")
+    memory_type: Optional[str] = None
+    retrieve_similar: bool = False
+    # Only retrieve memories of this payload type; None searches all of them
+    similar_type: Optional[str] = None
+    # Generate the step-by-step tutorial with the instructor LLM
+    explain: bool = False
+
+
+@dataclass
+class HeadGeometry:
+    radius: int
+    center: tuple
+    direction: str
+    width: float
+    height: float
+    # Head pose in degrees (see head_pose.py)
+    yaw: float = 0.0
+    pitch: float = 0.0
+    roll: float = 0.0
+
+    @property
+    def ratio(self):
+        return self.width / self.height
+
+
+@dataclass
+class LoomisResult:
+    request: LoomisRequest
+    error: Optional[str] = None
+    # The first detected face; geometries/faces/memory_ids cover all of them
+    geometry: Optional[HeadGeometry] = None
+    face: Optional[FaceLandmarks] = field(default=None, repr=False)
+    geometries: list = field(default_factory=list)
+    faces: Optional[FaceLandmarksBatch] = field(default=None, repr=False)
+    image_size: Optional[tuple] = None
+    output_path: Optional[str] = None
+    # Encoded annotated image (bytes-like) when request.image_format is set
+    annotated_image: Optional[memoryview] = field(default=None, repr=False)
+    guidelines: Optional[str] = field(default=None, repr=False)
+    memory_id: Optional[str] = None
+    memory_ids: list = field(default_factory=list)
+    similar: list = field(default_factory=list, repr=False)
+    tutorial: Optional[str] = field(default=None, repr=False)
+    # Problems that did not fail the request, e.g. visual memory being down
+    warnings: list = field(default_factory=list)
+    # Stage name → milliseconds
+    timings: dict = field(default_factory=dict)
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+@contextmanager
+def _span(result, stage):
+    # Feeds both the per-request timings and the process-wide histograms
+    s = span(f"pipeline.{stage}")
+    try:
+        with s:
+            yield
+    finally:
+        result.timings[stage] = result.timings.get(stage, 0.0) + s.elapsed_ms
+
+
+def _detect(request, cache, with_image, entry, session):
+    """get_landmarks(), answered from the session entry when it has enough."""
+    if request.image_bytes is not None:
+        return get_landmarks_from_bytes(request.image_bytes, cache=cache, with_image=with_image)
+
+    if entry is not None and entry.landmarks is not None and (entry.image is not None or not with_image):
+        data = dict(entry.landmarks)
+        if with_image:
+            # The render stage draws on its image, so never hand out the session's
+            data["image"] = entry.image.copy()
+        return data
+
+    data = get_landmarks(request.image_path, cache=cache, with_image=with_image)
+    if entry is not None:
+        entry.landmarks = {k: v for k, v in data.items() if k != "image"}
+        if with_image:
+            entry.image = data["image"]
+            data["image"] = entry.image.copy()
+        session.update(entry)
+    return data
+
+
+def _geometry(faces, image_size, entry):
+    """(radii, centers, directions, poses, [HeadGeometry]) for every face; poses is (F, 3) radians."""
+    if entry is not None and entry.geometry is not None:
+        return entry.geometry
+
+    radii, centers, _ = calculate_head_dimensions_batch(faces)
+    poses = estimate_head_pose_batch(faces, image_width=image_size[1])
+    directions = direction_from_yaw(poses[:, 0])
+    geometries = [
+        HeadGeometry(int(r), (int(cx), int(cy)), d, float(w), float(h), *pose)
+        for r, (cx, cy), d, w, h, pose in zip(radii, centers, directions, faces.width, faces.height,
+                                              np.degrees(poses).tolist())
+    ]
+    geometry = radii, centers, directions, poses, geometries
+    if entry is not None:
+        entry.geometry = geometry
+    return geometry
+
+
+def _embeddings(faces, poses, count, entry):
+    """Embeddings of the first count faces, reusing the session's."""
+    vectors = []
+    for i in range(count):
+        vector = entry.vectors.get(i) if entry is not None else None
+        if vector is None:
+            # The geometry stage's pose, so memory and the side plane agree
+            vector = landmarks_to_embedding(faces[i], pose=poses[i])
+            if entry is not None:
+                entry.vectors[i] = vector
+        vectors.append(vector)
+    return vectors
+
+
+def run_pipeline(request: LoomisRequest, cache=None,
+                 should_cancel: Optional[Callable[[], bool]] = None,
+                 on_token: Optional[Callable[[str], None]] = None,
+                 session=None) -> LoomisResult:
+    """
+    Run one request end to end.
+
+    cache overrides the shared landmark cache. should_cancel is polled between
+    stages (and between tutorial chunks); when it returns True the pipeline
+    stops with PipelineCancelled before writing any output or memory.
+    on_token is called with each tutorial chunk as the instructor LLM streams
+    it; result.tutorial still holds the full text.
+
+    With a session.Session, landmarks, the decoded image, geometry,
+    embeddings and stored memory ids are taken from (and added to) its entry
+    for image_path, so follow-up requests on the same file skip that work
+    and do not store the same memory twice.
+    """
+    result = LoomisResult(request=request)
+
+    def checkpoint():
+        if should_cancel is not None and should_cancel():
+            raise PipelineCancelled()
+
+    with _span(result, "total"):
+        image_path = request.image_path
+        inline = request.image_bytes is not None
+        if not inline and not os.path.exists(image_path):
+            result.error = f"Error: Image not found at {image_path}"
+            return result
+
+        raster_file = bool(request.output_path) and not is_vector_output(request.output_path)
+        raster_output = raster_file or bool(request.image_format)
+
+        entry = session.entry(image_path) if session is not None and not inline else None
+
+        with _span(result, "detect"):
+            data = _detect(request, cache, raster_output, entry, session)
+        checkpoint()
+
+        if not data["face"]:
+            result.error = "No face detected in image"
+            return result
+
+        faces = result.faces = data["faces"]
+        result.face = data["face"]
+        result.image_size = data["image_size"]
+
+        with _span(result, "geometry"):
+            radii, centers, directions, poses, result.geometries = _geometry(faces, result.image_size, entry)
+            result.geometry = result.geometries[0]
+
+        if request.output_path or request.guidelines_format or request.image_format:
+            with _span(result, "render"):
+                display_list = build_display_list_batch(radii, centers, directions, faces, yaws=poses[:, 0])
+                height, width = result.image_size
+
+                if request.guidelines_format == "svg":
+                    result.guidelines = display_list_to_svg(display_list, width, height)
+                elif request.guidelines_format:
+                    result.guidelines = display_list_to_json(display_list, width, height)
+
+                if raster_output:
+                    img = rasterize_display_list(data["image"], display_list)
+
+            if request.output_path:
+                checkpoint()
+                with _span(result, "write"):
+                    if raster_file:
+                        cv2.imwrite(request.output_path, img)
+                    else:
+                        write_display_list(request.output_path, display_list, width, height)
+                result.output_path = request.output_path
+
+            if request.image_format:
+                with _span(result, "encode"):
+                    result.annotated_image = encode_image(img, request.image_format)
+
+        if request.memory_type or request.retrieve_similar or request.explain:
+            with _span(result, "embed"):
+                # Only stored memories need every face; search uses the first
+                vectors = _embeddings(faces, poses, len(faces) if request.memory_type else 1, entry)
+            # Visual memory is an extra: when it is down the output is still
+            # written and returned, with a warning instead of an error
+            try:
+                client = get_qdrant_client()
+            except Exception as e:
+                client = None
+                result.warnings.append(f"Visual memory unavailable: {e}")
+
+            stored = entry.memory_ids.get(request.memory_type) if entry is not None else None
+            if stored:
+                result.memory_ids = list(stored)
+                result.memory_id = stored[0]
+            elif request.memory_type and client is not None:
+                checkpoint()
+                try:
+                    with _span(result, "memory_store"):
+                        # Ids derive from the image content, so storing the same
+                        # image again updates its points instead of adding more
+                        result.memory_ids = [
+                            store_in_qdrant(
+                                client,
+                                vector,
+                                payload={
+                                    "type": request.memory_type,
+                                    "image_path": image_path,
+                                    "face_index": i,
+                                    "content_hash": data["digest"],
+                                    "embedding_version": EMBEDDING_VERSION,
+                                    "created_at": time.time(),
+                                },
+                                point_id=memory_point_id(data["digest"], request.memory_type, i),
+                            )
+                            for i, vector in enumerate(vectors)
+                        ]
+                        result.memory_id = result.memory_ids[0]
+                except Exception as e:
+                    result.memory_ids, result.memory_id = [], None
+                    result.warnings.append(f"Memory not stored: {e}")
+                else:
+                    if entry is not None:
+                        entry.memory_ids[request.memory_type] = list(result.memory_ids)
+
+            if (request.retrieve_similar or request.explain) and client is not None:
+                try:
+                    with _span(result, "memory_search"):
+                        result.similar = retrieve_similar(client, vectors[0], memory_type=request.similar_type)
+                except Exception as e:
+                    result.warnings.append(f"Similar memories not retrieved: {e}")
+
+        if request.explain:
+            checkpoint()
+            g = result.geometry
+            stream = stream_drawing_instructions(
+                direction=str(g.direction),
+                radius=g.radius,
+                center=g.center,
+                proportions={
+                    "width": g.width,
+                    "height": g.height,
+                    "ratio": g.ratio,
+                },
+                notes=f"""
+Based on {len(result.similar)} similar past Loomis constructions
+retrieved from visual memory with similar head orientation and proportions.
+"""
+            )
+            chunks = []
+            with _span(result, "llm"), closing(stream):
+                for text in stream:
+                    chunks.append(text)
+                    if on_token is not None:
+                        on_token(text)
+                    checkpoint()
+            result.tutorial = "".join(chunks)
+
+    return result
+
+
+def build_request(tool_name: str, arguments: dict) -> LoomisRequest:
+    """
+    Map a tool call (agent or MCP) onto a pipeline request.
+
+    The image comes from "image_path" or, inline, from "image_base64"
+    (decoded once here; image_path is then just a label). apply_loomis
+    without an "output_path" returns the annotated image instead, encoded as
+    "image_format" (default png).
+    """
+    image_path = arguments.get("image_path")
+    image_bytes = None
+    if arguments.get("image_base64"):
+        image_bytes = decode_base64_image(arguments["image_base64"])
+    elif image_path is None:
+        raise ValueError("Either image_path or image_base64 is required")
+
+    if tool_name in ("detect_face", "analyze_proportions"):
+        return LoomisRequest(image_path, image_bytes)
+    if tool_name == "apply_loomis":
+        output_path = arguments.get("output_path")
+        image_format = arguments.get("image_format") or (None if output_path else "png")
+        return LoomisRequest(image_path, image_bytes, output_path=output_path, image_format=image_format,
+                             memory_type="reference")
+    if tool_name == "loomis_guidelines":
+        return LoomisRequest(image_path, image_bytes, guidelines_format=arguments.get("format", "json"))
+    if tool_name == "explain_loomis_guidelines":
+        # Ground the tutorial in reference photos rather than the drawing just stored
+        return LoomisRequest(image_path, image_bytes, memory_type="user_drawing", explain=True,
+                             similar_type="reference")
+
+    raise ValueError(f"Unknown tool: {tool_name}")
+
+
+def landmarks_json(result: LoomisResult, decimals=2) -> str:
+    """The detected face landmarks as JSON: image size plus (F, N, 3) points."""
+    height, width = result.image_size
+    return json.dumps({
+        "width": width,
+        "height": height,
+        "faces": result.faces.points.round(decimals).tolist(),
+    })
+
+
+def format_result(tool_name: str, result: LoomisResult) -> str:
+    if not result.ok:
+        return result.error
+
+    text = _format_text(tool_name, result)
+    if result.warnings and tool_name != "loomis_guidelines":
+        # Guidelines are SVG/JSON data, which a trailing line would corrupt
+        text += "".join(f"\nWarning: {w}" for w in result.warnings)
+    return text
+
+
+def _format_text(tool_name: str, result: LoomisResult) -> str:
+
+    g = result.geometry
+    extra = result.geometries[1:]
+
+    if tool_name == "detect_face":
+        if extra:
+            lines = [f"{len(result.geometries)} faces detected!"]
+            lines += [
+                f"Face {i + 1}: center {f.center}, radius {f.radius}px, direction {f.direction}"
+                for i, f in enumerate(result.geometries)
+            ]
+            return "\n".join(lines)
+        return f"Face detected!\nCenter: {g.center}\nRadius: {g.radius}px\nDirection: {g.direction}"
+
+    if tool_name == "analyze_proportions":
+        text = f"""Facial Proportions:
+Head radius: {g.radius}px
+Center: {g.center}
+Face: {g.width:.0f}x{g.height:.0f}px
+Ratio: {g.ratio:.2f}
+Direction: {g.direction}
+Pose: yaw {g.yaw:.0f}°, pitch {g.pitch:.0f}°, roll {g.roll:.0f}°"""
+        for i, f in enumerate(extra, start=2):
+            text += (f"\nFace {i}: radius {f.radius}px, center {f.center}, "
+                     f"{f.width:.0f}x{f.height:.0f}px, ratio {f.ratio:.2f}, {f.direction}")
+        return text
+
+    if tool_name == "apply_loomis":
+        target = f"saved to {result.output_path}"
+        if result.output_path is None:
+            target = f"returned inline as {result.request.image_format} ({len(result.annotated_image)} bytes)"
+        if extra:
+            return f"Loomis construction for {len(result.geometries)} faces {target}"
+        return f"Loomis construction {target}"
+
+    if tool_name == "loomis_guidelines":
+        return result.guidelines
+
+    if tool_name == "explain_loomis_guidelines":
+        return result.tutorial
+
+    raise ValueError(f"Unknown tool: {tool_name}")
+
+
+def run_tool_result(tool_name: str, arguments: dict, profile: Optional[str] = None, **kwargs):
+    """
+    build_request → run_pipeline → format_result in one call, traced as
+    "tool.<tool_name>". Returns (text, LoomisResult) for callers that also
+    send inline data (annotated image, landmarks). profile ("cprofile" or
+    "sample") profiles this call only; see tracing.profiled.
+    """
+    with profiled(tool_name, profile), span(f"tool.{tool_name}"):
+        result = run_pipeline(build_request(tool_name, arguments), **kwargs)
+        return format_result(tool_name, result), result
+
+
+def run_tool(tool_name: str, arguments: dict, profile: Optional[str] = None, **kwargs) -> str:
+    """run_tool_result() without the LoomisResult."""
+    return run_tool_result(tool_name, arguments, profile, **kwargs)[0]
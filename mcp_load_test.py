@@ -0,0 +1,127 @@
+"""
+Load test for the MCP server.
+
+Runs N concurrent clients, each issuing the same tool call R times, and
+reports p50/p99 latency and throughput.
+
+Usage:
+    python mcp_load_test.py <image_path> [--clients 8] [--requests 10]
+                            [--tool detect_face] [--mode stdio|inprocess]
+
+--mode stdio (the default) launches mcp_server.py as a subprocess and sends
+the calls over one MCP session, the way real clients do. --mode inprocess
+calls the call_tool handler directly, which isolates the server-side cost.
+Repeated calls on one image hit the landmark cache; run with
+LANDMARK_CACHE_SIZE=0 to measure full inference on every request.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+
+def _arguments(tool, image_path, client, request):
+    arguments = {"image_path": image_path}
+    if tool == "apply_loomis":
+        root, ext = os.path.splitext(image_path)
+        arguments["output_path"] = f"{root}_load_{client}_{request}{ext}"
+    return arguments
+
+
+async def _client_loop(call, tool, image_path, client, requests, latencies, errors):
+    for request in range(requests):
+        start = time.perf_counter()
+        try:
+            await call(tool, _arguments(tool, image_path, client, request))
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+
+
+async def _run_clients(call, tool, image_path, clients, requests):
+    latencies, errors = [], []
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _client_loop(call, tool, image_path, client, requests, latencies, errors)
+        for client in range(clients)
+    ])
+    elapsed = time.perf_counter() - start
+
+    return latencies, errors, elapsed
+
+
+async def run_inprocess(tool, image_path, clients, requests):
+    from mcp_server import call_tool
+
+    async def call(name, arguments):
+        return await call_tool(name, arguments)
+
+    return await _run_clients(call, tool, image_path, clients, requests)
+
+
+async def run_stdio(tool, image_path, clients, requests):
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    server_script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mcp_server.py")
+    params = StdioServerParameters(command=sys.executable, args=[server_script], env=dict(os.environ))
+
+    async with stdio_client(params) as (read_stream, write_stream):
+        async with ClientSession(read_stream, write_stream) as session:
+            await session.initialize()
+
+            async def call(name, arguments):
+                result = await session.call_tool(name, arguments)
+                if result.isError:
+                    raise RuntimeError(result.content[0].text if result.content else "tool error")
+                return result
+
+            # Warm up the server's models so the first wave isn't all cold starts
+            await call(tool, _arguments(tool, image_path, "warmup", 0))
+
+            return await _run_clients(call, tool, image_path, clients, requests)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Loomis MCP server.")
+    parser.add_argument("image_path")
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    parser.add_argument("--tool", default="detect_face",
+                        choices=["detect_face", "analyze_proportions", "apply_loomis", "loomis_guidelines",
+                                 "explain_loomis_guidelines"])
+    parser.add_argument("--mode", default="stdio", choices=["stdio", "inprocess"])
+    args = parser.parse_args(argv)
+
+    runner = run_stdio if args.mode == "stdio" else run_inprocess
+    latencies, errors, elapsed = asyncio.run(
+        runner(args.tool, args.image_path, args.clients, args.requests)
+    )
+
+    latencies.sort()
+    total = len(latencies) + len(errors)
+
+    print(f"{args.tool} via {args.mode}: {args.clients} clients × {args.requests} requests")
+    print(f"Completed: {len(latencies)}/{total}  Errors: {len(errors)}")
+    if latencies:
+        print(f"Latency p50: {percentile(latencies, 0.50):.1f}ms  "
+              f"p99: {percentile(latencies, 0.99):.1f}ms  "
+              f"mean: {statistics.fmean(latencies):.1f}ms")
+    print(f"Throughput: {total / elapsed:.2f} requests/sec over {elapsed:.2f}s")
+    for error in sorted(set(errors))[:5]:
+        print(f"  ✗ {error}")
+
+
+if __name__ == "__main__":
+    main()
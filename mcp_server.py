@@ -1,20 +1,50 @@
 import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
-import cv2
+from mcp.types import ImageContent, Tool, TextContent
 import os
-from pose_detection import detect_pose_and_face
-from geometry_utils import calculate_head_dimensions, compute_face_turn_angle
-from render_steps import *
+import threading
+from landmark_cache import landmark_cache
+from image_io import IMAGE_MIME_TYPES
+from loomis_pipeline import PipelineCancelled, landmarks_json, run_tool_result
+from response_cache import response_cache
+from tracing import PROFILE_MODES, format_metrics, span
 
 # Create server instance
 server = Server("loomis-drawing-assistant")
 
+# CV and file I/O run on a bounded thread pool so one slow image never blocks
+# the event loop. Each worker thread gets its own MediaPipe graphs.
+MAX_CONCURRENCY = int(os.getenv("LOOMIS_MCP_MAX_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("LOOMIS_MCP_TOOL_TIMEOUT", "60"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="loomis-tool")
+_slots = asyncio.Semaphore(MAX_CONCURRENCY)
+
+# Optional on every pipeline tool: profile just this call
+PROFILE_PROPERTY = {"type": "string", "enum": list(PROFILE_MODES),
+                    "description": "Profile this call (cProfile or stack sampling); the file goes to LOOMIS_PROFILE_DIR"}
+
+# Every pipeline tool also takes the image inline instead of image_path
+IMAGE_BASE64_PROPERTY = {"type": "string",
+                         "description": "Base64-encoded image bytes (or a data: URL), used instead of image_path; "
+                                        "image_path then only labels stored memories"}
+INCLUDE_LANDMARKS_PROPERTY = {"type": "boolean",
+                              "description": "Also return the detected face landmarks as JSON"}
+
+# Tools served by loomis_pipeline.run_tool
+PIPELINE_TOOLS = ("detect_face", "apply_loomis", "loomis_guidelines", "analyze_proportions", "explain_loomis_guidelines")
+
+
+class ToolCancelled(Exception):
+    pass
+
 @server.list_tools()
 async def list_tools() -> list[Tool]:
     """List available tools."""
-    return [
+    tools = [
         Tool(
             name="detect_face",
             description="Detect face landmarks and analyze head geometry from an image",
@@ -28,14 +58,27 @@ async def list_tools() -> list[Tool]:
         ),
         Tool(
             name="apply_loomis",
-            description="Apply Loomis method construction lines to an image and save the result",
+            description="Apply Loomis method construction lines to an image and save the result, or return the annotated image inline when no output_path is given",
             inputSchema={
                 "type": "object",
                 "properties": {
                     "image_path": {"type": "string", "description": "Path to the input image"},
-                    "output_path": {"type": "string", "description": "Path where output should be saved"}
+                    "output_path": {"type": "string", "description": "Path where output should be saved (.svg or .json saves vector guidelines)"},
+                    "image_format": {"type": "string", "enum": ["png", "jpeg", "webp"], "description": "Return the annotated image inline in this format (default png when output_path is omitted)"}
+                },
+                "required": ["image_path"]
+            }
+        ),
+        Tool(
+            name="loomis_guidelines",
+            description="Return the Loomis construction lines for an image as vector data (JSON display list or SVG) to overlay client-side",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "image_path": {"type": "string", "description": "Path to the image file"},
+                    "format": {"type": "string", "enum": ["json", "svg"], "description": "Vector format (default: json)"}
                 },
-                "required": ["image_path", "output_path"]
+                "required": ["image_path"]
             }
         ),
         Tool(
@@ -48,86 +91,155 @@ async def list_tools() -> list[Tool]:
                 },
                 "required": ["image_path"]
             }
+        ),
+        Tool(
+            name="explain_loomis_guidelines",
+            description="Generate a step-by-step Loomis drawing tutorial based on detected guidelines. Send a progressToken to receive the tutorial chunk by chunk as progress notifications",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "image_path": {"type": "string", "description": "Path to the image file"}
+                },
+                "required": ["image_path"]
+            }
+        ),
+        Tool(
+            name="metrics",
+            description="Report per-stage latency histograms for the request path",
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "format": {"type": "string", "enum": ["text", "json", "prometheus"], "description": "Output format (default: text)"}
+                }
+            }
+        ),
+        Tool(
+            name="cache_stats",
+            description="Report landmark and instructor response cache hit/miss counters",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
         )
     ]
+    for t in tools:
+        if t.name in PIPELINE_TOOLS:
+            t.inputSchema["properties"]["profile"] = PROFILE_PROPERTY
+            t.inputSchema["properties"]["image_base64"] = IMAGE_BASE64_PROPERTY
+            t.inputSchema["properties"]["include_landmarks"] = INCLUDE_LANDMARKS_PROPERTY
+            # image_path or image_base64
+            t.inputSchema.pop("required", None)
+            t.inputSchema["anyOf"] = [{"required": ["image_path"]}, {"required": ["image_base64"]}]
+    return tools
 
 @server.call_tool()
-async def call_tool(name: str, arguments: dict) -> list[TextContent]:
-    """Handle tool calls."""
-    
-    if name == "detect_face":
-        image_path = arguments["image_path"]
-        
-        if not os.path.exists(image_path):
-            return [TextContent(type="text", text=f"Error: Image not found at {image_path}")]
-        
-        data = detect_pose_and_face(image_path, display=False)
-        if not data['face']:
-            return [TextContent(type="text", text="No face detected in image")]
-        
-        radius, center, _ = calculate_head_dimensions(data['face'])
-        direction = compute_face_turn_angle(data['face'])
-        
-        result = f"Face detected!\nCenter: {center}\nRadius: {radius}px\nDirection: {direction}"
-        return [TextContent(type="text", text=result)]
-    
-    elif name == "apply_loomis":
-        image_path = arguments["image_path"]
-        output_path = arguments["output_path"]
-        
-        if not os.path.exists(image_path):
-            return [TextContent(type="text", text=f"Error: Image not found at {image_path}")]
-        
-        data = detect_pose_and_face(image_path, display=False)
-        if not data['face']:
-            return [TextContent(type="text", text="No face detected in image")]
-        
-        radius, center, _ = calculate_head_dimensions(data['face'])
-        direction = compute_face_turn_angle(data['face'])
-        
-        img = cv2.imread(image_path)
-        img = construct_loomis_sphere(img, center, radius, direction, data["face"])
-        img = construct_vertical_line(img, data["face"])
-        img = construct_brow_line(img, data["face"])
-        img = construct_nose_line(img, data["face"])
-        img = construct_chin_line(img, data["face"])
-        img = construct_ellipse_vertical_line(img, center, radius, direction, data["face"])
-        img = construct_jaw_line(img, data["face"])
-        img = construct_outer_face_line(img, data["face"], direction)
-        
-        cv2.imwrite(output_path, img)
-        result = f"Loomis construction saved to {output_path}"
+async def call_tool(name: str, arguments: dict) -> list[TextContent | ImageContent]:
+    """
+    Handle tool calls.
+
+    At most MAX_CONCURRENCY calls run at once; the rest wait for a slot. A call
+    that exceeds TOOL_TIMEOUT seconds, or whose request is cancelled, is told
+    to stop at its next stage boundary and never writes its output. Its slot
+    is only freed once its worker has stopped, so TOOL_TIMEOUT always counts
+    from the moment a call's work starts.
+
+    When the request carries a progressToken, tutorial text is streamed as
+    progress notifications (each one's message is the next chunk) before the
+    full result is returned.
+    """
+    cancel_event = threading.Event()
+
+    try:
+        ctx = server.request_context
+    except LookupError:
+        # Called directly (mcp_load_test.py --mode inprocess), not over a session
+        session, progress_token = None, None
+    else:
+        session = ctx.session
+        progress_token = ctx.meta.progressToken if ctx.meta else None
+
+    with span(f"mcp.{name}"):
+        return await _call_tool(name, arguments, cancel_event, session, progress_token)
+
+
+def _progress_streamer(session, progress_token, loop):
+    """on_token callback (run on a worker thread) that sends each chunk as a progress notification."""
+    sent = 0
+
+    def on_token(text):
+        nonlocal sent
+        sent += len(text)
+        asyncio.run_coroutine_threadsafe(
+            session.send_progress_notification(progress_token, sent, message=text), loop
+        )
+
+    return on_token
+
+
+def _release_slot(loop):
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(_slots.release)
+
+
+async def _call_tool(name, arguments, cancel_event, session=None, progress_token=None):
+    await _slots.acquire()
+    loop = asyncio.get_running_loop()
+    on_token = None
+    if progress_token is not None:
+        on_token = _progress_streamer(session, progress_token, loop)
+    try:
+        future = _executor.submit(_run_tool, name, arguments, cancel_event, on_token)
+    except BaseException:
+        _slots.release()
+        raise
+    # The slot is freed when the worker finishes, not when this call stops
+    # waiting: a timed-out tool still occupies its thread until its next stage
+    # boundary, and a new call given its slot would queue behind it and spend
+    # its own timeout there
+    future.add_done_callback(lambda _: _release_slot(loop))
+
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=TOOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        cancel_event.set()
+        return [TextContent(type="text", text=f"Error: {name} timed out after {TOOL_TIMEOUT:.0f}s")]
+    except asyncio.CancelledError:
+        cancel_event.set()
+        raise
+    except ToolCancelled:
+        return [TextContent(type="text", text=f"Error: {name} was cancelled")]
+
+
+def _run_tool(name: str, arguments: dict, cancel_event: threading.Event, on_token=None) -> list[TextContent | ImageContent]:
+
+    if name == "cache_stats":
+        lines = ["landmarks:"] + [f"  {k}: {v}" for k, v in landmark_cache.stats().items()]
+        lines += ["instructor:"] + [f"  {k}: {v}" for k, v in response_cache.stats().items()]
+        result = "\n".join(lines)
         return [TextContent(type="text", text=result)]
-    
-    elif name == "analyze_proportions":
-        image_path = arguments["image_path"]
-        
-        if not os.path.exists(image_path):
-            return [TextContent(type="text", text=f"Error: Image not found at {image_path}")]
-        
-        data = detect_pose_and_face(image_path, display=False)
-        if not data['face']:
-            return [TextContent(type="text", text="No face detected in image")]
-        
-        radius, center, _ = calculate_head_dimensions(data['face'])
-        direction = compute_face_turn_angle(data['face'])
-        
-        xs = [p[0] for p in data['face']]
-        ys = [p[1] for p in data['face']]
-        width = max(xs) - min(xs)
-        height = max(ys) - min(ys)
-        
-        result = f"""Facial Proportions:
-Head radius: {radius}px
-Center: {center}
-Face: {width:.0f}x{height:.0f}px
-Ratio: {width/height:.2f}
-Direction: {direction}"""
+
+    if name == "metrics":
+        result = format_metrics(arguments.get("format", "text"))
         return [TextContent(type="text", text=result)]
-    
-    else:
+
+    if name not in PIPELINE_TOOLS:
         return [TextContent(type="text", text=f"Unknown tool: {name}")]
 
+    try:
+        text, result = run_tool_result(name, arguments, profile=arguments.get("profile"),
+                                       should_cancel=cancel_event.is_set, on_token=on_token)
+    except PipelineCancelled:
+        raise ToolCancelled()
+
+    content = [TextContent(type="text", text=text)]
+    if result.annotated_image is not None:
+        image_format = result.request.image_format
+        content.append(ImageContent(type="image", mimeType=IMAGE_MIME_TYPES[image_format],
+                                    data=base64.b64encode(result.annotated_image).decode("ascii")))
+    if arguments.get("include_landmarks") and result.ok:
+        content.append(TextContent(type="text", text=landmarks_json(result)))
+    return content
+
 async def main():
     """Run the MCP server."""
     async with stdio_server() as (read_stream, write_stream):
@@ -0,0 +1,439 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+import numpy as np
+
+# Mirrors the fields of qdrant_client's ScoredPoint that callers read
+MemoryHit = namedtuple("MemoryHit", ["id", "score", "payload", "vector"])
+MemoryRecord = namedtuple("MemoryRecord", ["id", "payload", "vector"])
+MemoryQueryResponse = namedtuple("MemoryQueryResponse", ["points"])
+MemoryCountResult = namedtuple("MemoryCountResult", ["count"])
+
+# Seconds between rewrites of a persisted NumpyMemoryBackend collection
+DEFAULT_SAVE_INTERVAL = float(os.getenv("LOOMIS_MEMORY_SAVE_INTERVAL", "5.0"))
+
+
+class MemoryBackend(ABC):
+    """
+    The subset of the QdrantClient API (qdrant-client 1.10+, query_points
+    rather than the removed search) that memory_store, memory_retriever,
+    memory_prototypes and the migration scripts call. QdrantClient, server
+    or local mode, provides these methods with the same signatures;
+    in-process backends subclass this.
+    """
+
+    @abstractmethod
+    def upsert(self, collection_name, points, **kwargs):
+        ...
+
+    @abstractmethod
+    def query_points(self, collection_name, query, limit=10, with_payload=True, query_filter=None, **kwargs):
+        ...
+
+    @abstractmethod
+    def query_batch_points(self, collection_name, requests, **kwargs):
+        ...
+
+    @abstractmethod
+    def create_payload_index(self, collection_name, field_name, field_schema=None, **kwargs):
+        ...
+
+    @abstractmethod
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs):
+        ...
+
+    @abstractmethod
+    def delete(self, collection_name, points_selector, **kwargs):
+        ...
+
+    @abstractmethod
+    def set_payload(self, collection_name, payload, points, **kwargs):
+        ...
+
+    @abstractmethod
+    def scroll(self, collection_name, limit=10, offset=None, with_payload=True, with_vectors=False,
+               scroll_filter=None, **kwargs):
+        ...
+
+
+class NumpyMemoryBackend(MemoryBackend):
+    """
+    Brute-force cosine search over an in-process float32 matrix.
+
+    With a path, the index persists to <path>/vectors.npy (memory-mapped on
+    load) and <path>/points.json (ids and payloads). Both files are
+    rewritten whole, so writes only mark a collection dirty: it is saved by
+    the first write at least save_interval seconds after its last save (0
+    saves on every write, None only on flush()/close()) and on close().
+    Collections are kept separate, one sub-directory each.
+
+    Filters take qdrant_client Filter objects whose must/should/must_not
+    hold nested Filters, IsEmptyConditions and FieldConditions matching a
+    value (MatchValue) or one of several (MatchAny). Fields passed to create_payload_index keep a value → code
+    column, so filtering on them is a vectorized comparison instead of a
+    scan over payload dicts; the index is rebuilt from payloads on load.
+    """
+
+    def __init__(self, path=None, save_interval=DEFAULT_SAVE_INTERVAL):
+        self.path = path
+        self.save_interval = save_interval
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    def _collection(self, collection_name):
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = _NumpyCollection(
+                os.path.join(self.path, collection_name) if self.path else None
+            )
+            self._collections[collection_name] = collection
+        return collection
+
+    def _written(self, collection):
+        if self.save_interval is not None and time.monotonic() - collection.saved_at >= self.save_interval:
+            collection.save()
+
+    def upsert(self, collection_name, points, **kwargs):
+        with self._lock:
+            collection = self._collection(collection_name)
+            collection.upsert(points)
+            self._written(collection)
+
+    def query_points(self, collection_name, query, limit=10, with_payload=True, query_filter=None, **kwargs):
+        with self._lock:
+            points = self._collection(collection_name).search([query], [(query_filter, limit)], with_payload)[0]
+        return MemoryQueryResponse(points)
+
+    def query_batch_points(self, collection_name, requests, **kwargs):
+        """Answer QueryRequests with one matrix product for all of them."""
+        if not requests:
+            return []
+
+        with_payload = any(request.with_payload is not False for request in requests)
+        with self._lock:
+            results = self._collection(collection_name).search(
+                [request.query for request in requests],
+                [(request.filter, request.limit or 10) for request in requests],
+                with_payload,
+            )
+        return [MemoryQueryResponse(points) for points in results]
+
+    def create_payload_index(self, collection_name, field_name, field_schema=None, **kwargs):
+        with self._lock:
+            self._collection(collection_name).create_index(field_name)
+
+    def retrieve(self, collection_name, ids, with_payload=True, with_vectors=False, **kwargs):
+        with self._lock:
+            return self._collection(collection_name).retrieve(ids, with_payload, with_vectors)
+
+    def delete(self, collection_name, points_selector, **kwargs):
+        """Delete by a list of ids or a qdrant_client PointIdsList."""
+        ids = getattr(points_selector, "points", points_selector)
+        with self._lock:
+            collection = self._collection(collection_name)
+            collection.delete(ids)
+            self._written(collection)
+
+    def set_payload(self, collection_name, payload, points, **kwargs):
+        """Merge payload into the payloads of points (a list of ids or a PointIdsList)."""
+        ids = getattr(points, "points", points)
+        with self._lock:
+            collection = self._collection(collection_name)
+            collection.set_payload(payload, ids)
+            self._written(collection)
+
+    def scroll(self, collection_name, limit=10, offset=None, with_payload=True, with_vectors=False,
+               scroll_filter=None, **kwargs):
+        with self._lock:
+            return self._collection(collection_name).scroll(limit, offset, with_payload, with_vectors, scroll_filter)
+
+    def count(self, collection_name, **kwargs):
+        with self._lock:
+            return MemoryCountResult(len(self._collection(collection_name).ids))
+
+    def save(self):
+        """Write every dirty collection to disk."""
+        with self._lock:
+            for collection in self._collections.values():
+                collection.save()
+
+    flush = save
+
+    def close(self):
+        self.save()
+
+
+class _NumpyCollection:
+
+    def __init__(self, path):
+        self.path = path
+        self.ids = []
+        self.payloads = []
+        self._index = {}
+        self._vectors = None
+        self._size = 0
+        self._dirty = False
+        self.saved_at = time.monotonic()
+        # field → (value → code, int32 code per row); -1 where the field is absent
+        self._payload_indexes = {}
+
+        if path and os.path.exists(os.path.join(path, "points.json")):
+            self._load()
+
+    def _load(self):
+        with open(os.path.join(self.path, "points.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        self.ids = meta["ids"]
+        self.payloads = meta["payloads"]
+        self._index = {point_id: i for i, point_id in enumerate(self.ids)}
+        # Read-only map; it is copied into memory on the first write
+        self._vectors = np.load(os.path.join(self.path, "vectors.npy"), mmap_mode="r")
+        self._size = len(self.ids)
+
+    def _reserve(self, dim, extra):
+        needed = self._size + extra
+        if self._vectors is not None and self._vectors.flags.writeable and len(self._vectors) >= needed:
+            return
+
+        capacity = max(needed, 2 * len(self._vectors) if self._vectors is not None else 64)
+        vectors = np.zeros((capacity, dim), dtype=np.float32)
+        if self._vectors is not None:
+            vectors[:self._size] = self._vectors[:self._size]
+        self._vectors = vectors
+
+        for field_name, (values, codes) in self._payload_indexes.items():
+            grown = np.full(capacity, -1, dtype=np.int32)
+            grown[:self._size] = codes[:self._size]
+            self._payload_indexes[field_name] = (values, grown)
+
+    def create_index(self, field_name):
+        if field_name in self._payload_indexes:
+            return
+
+        values = {}
+        codes = np.full(len(self._vectors) if self._vectors is not None else 0, -1, dtype=np.int32)
+        self._payload_indexes[field_name] = (values, codes)
+        for row, payload in enumerate(self.payloads):
+            self._index_payload(row, payload)
+
+    def _index_payload(self, row, payload):
+        for field_name, (values, codes) in self._payload_indexes.items():
+            value = payload.get(field_name)
+            if value is None:
+                codes[row] = -1
+            else:
+                codes[row] = values.setdefault(value, len(values))
+
+    def upsert(self, points):
+        if not points:
+            return
+
+        vectors = np.asarray([_field(p, "vector") for p in points], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.where(norms == 0, 1, norms)
+
+        self._reserve(vectors.shape[1], len(points))
+
+        for point, vector in zip(points, vectors):
+            point_id = str(_field(point, "id"))
+            row = self._index.get(point_id)
+            if row is None:
+                row = self._size
+                self._index[point_id] = row
+                self.ids.append(point_id)
+                self.payloads.append(_field(point, "payload") or {})
+                self._size += 1
+            else:
+                self.payloads[row] = _field(point, "payload") or {}
+            self._vectors[row] = vector
+            self._index_payload(row, self.payloads[row])
+
+        self._dirty = True
+
+    def search(self, query_vectors, requests, with_payload):
+        """
+        Top hits per query vector; requests holds one (filter, limit) per
+        query. All queries are scored in a single matrix product.
+        """
+        if self._size == 0:
+            return [[] for _ in query_vectors]
+
+        queries = np.asarray(query_vectors, dtype=np.float32).reshape(len(query_vectors), -1)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1, norms)
+
+        vectors = self._vectors[:self._size]
+        masks = {}
+
+        if len(queries) == 1 and requests[0][0] is not None:
+            rows = masks[id(requests[0][0])] = np.flatnonzero(self._filter_mask(requests[0][0]))
+            if len(rows) * 8 < self._size:
+                # Selective filter: gathering the few matching rows beats scoring all of them
+                return [self._top(vectors[rows] @ queries[0], rows, requests[0][1], with_payload)]
+
+        scores = queries @ vectors.T
+
+        results = []
+        for row_scores, (query_filter, limit) in zip(scores, requests):
+            rows = None
+            if query_filter is not None:
+                key = id(query_filter)
+                if key not in masks:
+                    masks[key] = np.flatnonzero(self._filter_mask(query_filter))
+                rows = masks[key]
+                row_scores = row_scores[rows]
+            results.append(self._top(row_scores, rows, limit, with_payload))
+        return results
+
+    def _top(self, scores, rows, limit, with_payload):
+        limit = min(limit, len(scores))
+        if limit <= 0:
+            return []
+
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+
+        return [
+            MemoryHit(
+                id=self.ids[i],
+                score=float(score),
+                payload=self.payloads[i] if with_payload else None,
+                vector=None,
+            )
+            for i, score in zip((rows[top] if rows is not None else top).tolist(), scores[top].tolist())
+        ]
+
+    def _filter_mask(self, query_filter):
+        if getattr(query_filter, "min_should", None):
+            raise NotImplementedError("NumpyMemoryBackend filters do not support min_should")
+
+        mask = np.ones(self._size, dtype=bool)
+        for condition in query_filter.must or ():
+            mask &= self._condition_mask(condition)
+        for condition in query_filter.must_not or ():
+            mask &= ~self._condition_mask(condition)
+        if query_filter.should:
+            # At least one should-condition has to hold
+            any_mask = np.zeros(self._size, dtype=bool)
+            for condition in query_filter.should:
+                any_mask |= self._condition_mask(condition)
+            mask &= any_mask
+        return mask
+
+    def _condition_mask(self, condition):
+        if hasattr(condition, "must"):
+            return self._filter_mask(condition)
+
+        is_empty = getattr(condition, "is_empty", None)
+        if is_empty is not None:
+            index = self._payload_indexes.get(is_empty.key)
+            if index is not None:
+                return index[1][:self._size] == -1
+            return np.fromiter((payload.get(is_empty.key) is None for payload in self.payloads),
+                               dtype=bool, count=self._size)
+
+        match = getattr(condition, "match", None)
+        if match is None:
+            raise NotImplementedError(f"Unsupported filter condition: {condition!r}")
+        wanted = [match.value] if hasattr(match, "value") else list(match.any)
+
+        index = self._payload_indexes.get(condition.key)
+        if index is not None:
+            values, codes = index
+            wanted_codes = [values[v] for v in wanted if v in values]
+            return np.isin(codes[:self._size], wanted_codes)
+
+        wanted = set(wanted)
+        return np.fromiter(
+            (payload.get(condition.key) in wanted for payload in self.payloads),
+            dtype=bool, count=self._size,
+        )
+
+    def _record(self, row, with_payload, with_vectors):
+        return MemoryRecord(
+            id=self.ids[row],
+            payload=self.payloads[row] if with_payload else None,
+            vector=self._vectors[row].tolist() if with_vectors else None,
+        )
+
+    def retrieve(self, ids, with_payload, with_vectors):
+        rows = [self._index.get(str(point_id)) for point_id in ids]
+        return [self._record(row, with_payload, with_vectors) for row in rows if row is not None]
+
+    def delete(self, ids):
+        rows = [self._index[point_id] for point_id in map(str, ids) if point_id in self._index]
+        if not rows:
+            return
+
+        keep = np.ones(self._size, dtype=bool)
+        keep[rows] = False
+        kept = np.flatnonzero(keep)
+
+        self.ids = [self.ids[i] for i in kept]
+        self.payloads = [self.payloads[i] for i in kept]
+        self._index = {point_id: i for i, point_id in enumerate(self.ids)}
+        # Fancy indexing copies, which also turns a memory-mapped index writable
+        self._vectors = self._vectors[kept]
+        self._size = len(self.ids)
+        self._payload_indexes = {
+            field_name: (values, codes[kept]) for field_name, (values, codes) in self._payload_indexes.items()
+        }
+        self._dirty = True
+
+    def set_payload(self, payload, ids):
+        for point_id in map(str, ids):
+            row = self._index.get(point_id)
+            if row is not None:
+                self.payloads[row] = {**self.payloads[row], **payload}
+                self._index_payload(row, self.payloads[row])
+        self._dirty = True
+
+    def scroll(self, limit, offset, with_payload, with_vectors, scroll_filter=None):
+        # Offsets are row numbers, so a filtered scroll resumes after the last row returned
+        start = offset or 0
+        if scroll_filter is None:
+            rows = range(start, min(start + limit, self._size))
+        else:
+            matching = np.flatnonzero(self._filter_mask(scroll_filter)[start:]) + start
+            rows = matching[:limit].tolist()
+        if not rows:
+            return [], None
+
+        records = [self._record(i, with_payload, with_vectors) for i in rows]
+        end = rows[-1] + 1
+        return records, (end if end < self._size else None)
+
+    def save(self):
+        if not self.path or not self._dirty:
+            return
+
+        os.makedirs(self.path, exist_ok=True)
+
+        vectors_path = os.path.join(self.path, "vectors.npy")
+        points_path = os.path.join(self.path, "points.json")
+
+        if isinstance(self._vectors, np.memmap):
+            # Still mapping vectors.npy (loaded, then only payloads changed):
+            # copy and drop the map, as Windows cannot replace a mapped file
+            self._vectors = np.array(self._vectors)
+
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self._vectors[:self._size]))
+        with open(points_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "payloads": self.payloads}, f)
+
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(points_path + ".tmp", points_path)
+        self._dirty = False
+        self.saved_at = time.monotonic()
+
+
+def _field(point, name):
+    if isinstance(point, dict):
+        return point.get(name)
+    return getattr(point, name, None)
@@ -0,0 +1,363 @@
+"""
+Pose prototypes and retention for visual memory.
+
+Stored head geometries cluster tightly around a few poses, so a few dozen
+cluster centres summarise thousands of embeddings. build_prototypes() runs
+spherical mini-batch k-means per memory type over vectors scrolled from the
+collection, writes the centres to the prototype collection with their
+member counts and a representative image_path, and tags every member with
+a "prototype" payload. retrieve_similar(..., probes=n) then searches only
+the members of the n nearest prototypes, plus points stored since the last
+build.
+
+apply_retention() deletes points older than a TTL and the oldest points of
+a type beyond a cap. CompactionJob runs both periodically in a background
+thread; start_compaction_job() starts the shared one when
+LOOMIS_MEMORY_COMPACT_INTERVAL is set.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from memory_store import make_point
+from qdrant_setup import COLLECTION_NAME, ensure_collection, prototype_collection_name
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Seconds a memory is kept after it was first stored; 0 keeps it forever
+DEFAULT_TTL = float(os.getenv("LOOMIS_MEMORY_TTL", "0"))
+# Newest points kept per type; 0 means no cap
+DEFAULT_MAX_PER_TYPE = int(os.getenv("LOOMIS_MEMORY_MAX_PER_TYPE", "0"))
+DEFAULT_PROTOTYPES = int(os.getenv("LOOMIS_PROTOTYPES_PER_TYPE", "64"))
+DEFAULT_EPOCHS = 3
+DEFAULT_BATCH_SIZE = 1024
+# Seconds between background compactions; 0 disables the job
+COMPACT_INTERVAL = float(os.getenv("LOOMIS_MEMORY_COMPACT_INTERVAL", "0"))
+
+PROTOTYPE_ID_NAMESPACE = uuid.UUID("0b8e7d52-3f1a-5c6e-8a94-7e2c1d9f4b60")
+
+
+def prototype_id(point_type, index):
+    return str(uuid.uuid5(PROTOTYPE_ID_NAMESPACE, f"{point_type}:{index}"))
+
+
+def _unit_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class MiniBatchKMeans:
+    """
+    Spherical mini-batch k-means (Sculley, 2010) on cosine similarity.
+
+    partial_fit() takes one batch at a time, so a collection can be
+    clustered while it is scrolled. Centres start from k-means++ on the
+    first k points seen and move towards each batch's members with a
+    per-centre learning rate of 1 / (points assigned so far).
+    """
+
+    def __init__(self, k, seed=0):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.centers = None
+        self.counts = None
+        self._pending = []
+
+    def partial_fit(self, vectors):
+        vectors = _unit_rows(vectors)
+        if self.centers is None:
+            self._pending.append(vectors)
+            if sum(len(v) for v in self._pending) < self.k:
+                return
+            vectors = np.concatenate(self._pending)
+            self._pending = []
+            self._init(vectors)
+
+        labels, _ = self.predict(vectors)
+        n = np.bincount(labels, minlength=len(self.centers))
+        sums = np.zeros_like(self.centers)
+        np.add.at(sums, labels, vectors)
+
+        self.counts += n
+        hit = n > 0
+        self.centers[hit] += (sums[hit] - n[hit, None] * self.centers[hit]) / self.counts[hit, None]
+        self.centers = _unit_rows(self.centers)
+
+    def finish(self):
+        """Turn a model that saw fewer than k points into one centre per point."""
+        if self.centers is None and self._pending:
+            vectors = np.concatenate(self._pending)
+            self._pending = []
+            self.centers = vectors.copy()
+            self.counts = np.ones(len(vectors))
+
+    def predict(self, vectors):
+        """(nearest centre, cosine similarity to it) per row of unit vectors."""
+        sims = vectors @ self.centers.T
+        labels = np.argmax(sims, axis=1)
+        return labels, sims[np.arange(len(vectors)), labels]
+
+    def _init(self, vectors):
+        # k-means++ with cosine distance
+        chosen = [int(self.rng.integers(len(vectors)))]
+        distance = 1 - vectors @ vectors[chosen[0]]
+        for _ in range(1, self.k):
+            weights = np.maximum(distance, 0)
+            total = weights.sum()
+            index = int(self.rng.choice(len(vectors), p=weights / total)) if total > 0 \
+                else int(self.rng.integers(len(vectors)))
+            chosen.append(index)
+            distance = np.minimum(distance, 1 - vectors @ vectors[index])
+
+        self.centers = vectors[chosen].copy()
+        self.counts = np.zeros(self.k)
+
+
+def _scroll(client, collection, batch_size=DEFAULT_BATCH_SIZE, with_vectors=False):
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+        )
+        if records:
+            yield records
+        if offset is None:
+            return
+
+
+def _by_type(records):
+    groups = {}
+    for record in records:
+        payload = record.payload or {}
+        ids, vectors, paths = groups.setdefault(payload.get("type"), ([], [], []))
+        ids.append(str(record.id))
+        vectors.append(record.vector)
+        paths.append(payload.get("image_path"))
+    return groups
+
+
+def _delete(client, collection, ids, batch_size):
+    from qdrant_client.models import PointIdsList
+
+    for i in range(0, len(ids), batch_size):
+        client.delete(collection_name=collection, points_selector=PointIdsList(points=ids[i:i + batch_size]))
+
+
+def build_prototypes(client, collection=COLLECTION_NAME, prototypes=DEFAULT_PROTOTYPES,
+                     epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZE, seed=0):
+    """
+    Cluster every memory type of collection into at most prototypes centres
+    and rewrite the prototype collection. Returns a summary dict.
+    """
+    target = prototype_collection_name(collection)
+    if hasattr(client, "get_collections"):
+        ensure_collection(client, target)
+
+    models = {}
+    with span("memory.prototypes.fit"):
+        for _ in range(epochs):
+            for records in _scroll(client, collection, batch_size, with_vectors=True):
+                for point_type, (_, vectors, _) in _by_type(records).items():
+                    models.setdefault(point_type, MiniBatchKMeans(prototypes, seed)).partial_fit(vectors)
+        for model in models.values():
+            model.finish()
+
+    members = {t: [[] for _ in model.centers] for t, model in models.items()}
+    best = {t: np.full(len(model.centers), -np.inf) for t, model in models.items()}
+    representatives = {t: [None] * len(model.centers) for t, model in models.items()}
+
+    with span("memory.prototypes.assign"):
+        for records in _scroll(client, collection, batch_size, with_vectors=True):
+            for point_type, (ids, vectors, paths) in _by_type(records).items():
+                if point_type not in models:
+                    # Stored during the fit; found as unassigned until the next build
+                    continue
+                labels, sims = models[point_type].predict(_unit_rows(vectors))
+                for point_id, path, label, sim in zip(ids, paths, labels.tolist(), sims.tolist()):
+                    members[point_type][label].append(point_id)
+                    if sim > best[point_type][label]:
+                        best[point_type][label] = sim
+                        representatives[point_type][label] = (point_id, path)
+
+    now = time.time()
+    points = []
+    assignments = []
+    for point_type, model in models.items():
+        for j, center in enumerate(model.centers):
+            if not members[point_type][j]:
+                continue
+            representative_id, image_path = representatives[point_type][j]
+            point = make_point(prototype_id(point_type, j), center.tolist(), {
+                "type": point_type,
+                "member_count": len(members[point_type][j]),
+                "image_path": image_path,
+                "representative_id": representative_id,
+                "created_at": now,
+            })
+            points.append(point)
+            assignments.append((point.id, members[point_type][j]))
+
+    with span("memory.prototypes.write"):
+        # Prototypes first, so a member never points at a missing prototype
+        for i in range(0, len(points), batch_size):
+            client.upsert(collection_name=target, points=points[i:i + batch_size])
+        for pid, ids in assignments:
+            for i in range(0, len(ids), batch_size):
+                client.set_payload(collection_name=collection, payload={"prototype": pid}, points=ids[i:i + batch_size])
+
+        keep = {point.id for point in points}
+        stale = [str(r.id) for records in _scroll(client, target, batch_size) for r in records if str(r.id) not in keep]
+        _delete(client, target, stale, batch_size)
+
+    return {
+        "points": sum(len(ids) for _, ids in assignments),
+        "prototypes": len(points),
+        "stale_prototypes_removed": len(stale),
+        "by_type": {
+            str(t): {"points": sum(map(len, members[t])), "prototypes": sum(1 for m in members[t] if m)}
+            for t in models
+        },
+    }
+
+
+def apply_retention(client, collection=COLLECTION_NAME, ttl=DEFAULT_TTL, max_per_type=DEFAULT_MAX_PER_TYPE,
+                    batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Delete points whose created_at is more than ttl seconds old, then the
+    oldest points of any type beyond max_per_type. Points without created_at
+    (stored before it was recorded) never expire and count as the oldest.
+    """
+    if not ttl and not max_per_type:
+        return {"expired": 0, "trimmed": 0}
+
+    now = now or time.time()
+    expired = []
+    by_type = {}
+    with span("memory.retention"):
+        for records in _scroll(client, collection, batch_size):
+            for record in records:
+                payload = record.payload or {}
+                created_at = payload.get("created_at")
+                if ttl and created_at is not None and now - created_at > ttl:
+                    expired.append(str(record.id))
+                else:
+                    by_type.setdefault(payload.get("type"), []).append((created_at or 0.0, str(record.id)))
+
+        trimmed = []
+        if max_per_type:
+            for items in by_type.values():
+                if len(items) > max_per_type:
+                    items.sort()
+                    trimmed.extend(point_id for _, point_id in items[:len(items) - max_per_type])
+
+        _delete(client, collection, expired + trimmed, batch_size)
+
+    return {"expired": len(expired), "trimmed": len(trimmed)}
+
+
+def compact(client, collection=COLLECTION_NAME, ttl=DEFAULT_TTL, max_per_type=DEFAULT_MAX_PER_TYPE,
+            prototypes=DEFAULT_PROTOTYPES, epochs=DEFAULT_EPOCHS, batch_size=DEFAULT_BATCH_SIZE):
+    """apply_retention(), then build_prototypes() over what is left."""
+    retention = apply_retention(client, collection, ttl, max_per_type, batch_size)
+    built = build_prototypes(client, collection, prototypes, epochs, batch_size) if prototypes else None
+    return {"retention": retention, "prototypes": built}
+
+
+class CompactionJob:
+    """Runs compact() every interval seconds on a daemon thread."""
+
+    def __init__(self, client, interval=COMPACT_INTERVAL, **options):
+        self.client = client
+        self.interval = interval
+        self.options = options
+
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+        self.runs = 0
+        self.failures = 0
+        self.last_finished_at = None
+        self.last_seconds = None
+        self.last_summary = None
+
+        self._thread = threading.Thread(target=self._run, name="memory-compaction", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def run_once(self):
+        # One compaction at a time, whether scheduled or requested
+        with self._lock:
+            start = time.perf_counter()
+            try:
+                with span("memory.compact"):
+                    summary = compact(self.client, **self.options)
+            except Exception as e:
+                logger.error(f"✗ Memory compaction failed: {str(e)}")
+                self.failures += 1
+                return None
+            self.runs += 1
+            self.last_seconds = time.perf_counter() - start
+            self.last_finished_at = time.time()
+            self.last_summary = summary
+            return summary
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+    def stats(self):
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_finished_at": self.last_finished_at,
+            "last_seconds": self.last_seconds,
+            "last_summary": self.last_summary,
+        }
+
+
+_job = None
+_job_lock = threading.Lock()
+
+
+def start_compaction_job(client, interval=COMPACT_INTERVAL):
+    """Start the shared CompactionJob for client; a no-op when interval is 0."""
+    global _job
+    if interval <= 0:
+        return None
+    with _job_lock:
+        if _job is None:
+            _job = CompactionJob(client, interval)
+        return _job
+
+
+def run_compaction(client):
+    """compact() now, taking turns with the shared background job if one runs."""
+    if _job is not None and _job.client is client:
+        return _job.run_once()
+    return compact(client)
+
+
+def compaction_stats():
+    return _job.stats() if _job is not None else None
+
+
+@atexit.register
+def stop_compaction_job():
+    if _job is not None:
+        _job._stop.set()
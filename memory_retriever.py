@@ -1,7 +1,105 @@
-def retrieve_similar(client, query_vector, limit=5):
-    return client.search(
-        collection_name="loomis_memory",
-        query_vector=query_vector,
+import os
+
+from qdrant_setup import COLLECTION_NAME, is_local_client, prototype_collection_name, search_params
+from tracing import span, traced
+
+# Nearest prototypes whose members are searched (see memory_prototypes.py);
+# 0 searches every point
+PROTOTYPE_PROBES = int(os.getenv("LOOMIS_PROTOTYPE_PROBES", "0"))
+
+
+def memory_filter(memory_type=None, image_path=None):
+    """
+    Filter on the "type" and "image_path" payload fields (both indexed, see
+    qdrant_setup.PAYLOAD_INDEXES), or None when neither is given.
+    """
+    conditions = [(key, value) for key, value in (("type", memory_type), ("image_path", image_path))
+                  if value is not None]
+    if not conditions:
+        return None
+
+    from qdrant_client.models import FieldCondition, Filter, MatchValue
+
+    return Filter(must=[FieldCondition(key=key, match=MatchValue(value=value)) for key, value in conditions])
+
+
+def _prototype_filter(client, query, probes, memory_type, query_filter, collection_name):
+    """
+    query_filter narrowed to members of the probes nearest prototypes, or to
+    points stored since the prototypes were built. Unchanged when there are
+    no prototypes yet.
+    """
+    with span("memory.prototype_search"):
+        prototypes = client.query_points(
+            collection_name=prototype_collection_name(collection_name),
+            query=query,
+            query_filter=memory_filter(memory_type),
+            limit=probes,
+            with_payload=False,
+        ).points
+    if not prototypes:
+        return query_filter
+
+    from qdrant_client.models import FieldCondition, Filter, IsEmptyCondition, MatchAny, PayloadField
+
+    return Filter(
+        must=list(query_filter.must) if query_filter is not None else None,
+        should=[
+            FieldCondition(key="prototype", match=MatchAny(any=[str(p.id) for p in prototypes])),
+            IsEmptyCondition(is_empty=PayloadField(key="prototype")),
+        ],
+    )
+
+
+def _search_params(client):
+    # Local mode searches exactly and warns about search params on every query
+    return None if is_local_client(client) else search_params()
+
+
+def _as_list(vector):
+    return vector.tolist() if hasattr(vector, "tolist") else list(vector)
+
+
+@traced("memory.search")
+def retrieve_similar(client, query_vector, limit=5, memory_type=None, image_path=None,
+                     collection_name=COLLECTION_NAME, probes=PROTOTYPE_PROBES):
+    """
+    Most similar memories, optionally only those of memory_type and/or
+    image_path. With probes, the prototype collection is queried first and
+    only members of the nearest probes prototypes are searched.
+    """
+    query = _as_list(query_vector)
+    query_filter = memory_filter(memory_type, image_path)
+    if probes:
+        query_filter = _prototype_filter(client, query, probes, memory_type, query_filter, collection_name)
+
+    return client.query_points(
+        collection_name=collection_name,
+        query=query,
+        query_filter=query_filter,
+        search_params=_search_params(client),
         limit=limit,
         with_payload=True
+    ).points
+
+
+@traced("memory.search_batch")
+def retrieve_similar_batch(client, query_vectors, limit=5, memory_type=None, image_path=None,
+                           collection_name=COLLECTION_NAME):
+    """retrieve_similar for many query vectors in one request; one hit list per vector."""
+    if len(query_vectors) == 0:
+        return []
+
+    from qdrant_client.models import QueryRequest
+
+    query_filter = memory_filter(memory_type, image_path)
+    params = _search_params(client)
+    responses = client.query_batch_points(
+        collection_name=collection_name,
+        requests=[
+            QueryRequest(query=_as_list(vector), filter=query_filter, params=params,
+                         limit=limit, with_payload=True)
+            for vector in query_vectors
+        ],
     )
+    return [response.points for response in responses]
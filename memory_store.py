@@ -1,13 +1,322 @@
+import atexit
+import collections
+import logging
+import os
+import queue
+import threading
+import time
 import uuid
 
-def store_in_qdrant(client, vector, payload):
-    client.upsert(
-        collection_name="loomis_memory",
-        points=[
-            {
-                "id": uuid.uuid4().hex,
-                "vector": vector,
-                "payload": payload
-            }
+from qdrant_setup import COLLECTION_NAME
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND = os.getenv("LOOMIS_MEMORY_WRITE_BEHIND", "1") != "0"
+DEFAULT_BATCH_SIZE = int(os.getenv("LOOMIS_MEMORY_BATCH_SIZE", "64"))
+DEFAULT_FLUSH_INTERVAL = float(os.getenv("LOOMIS_MEMORY_FLUSH_INTERVAL", "1.0"))
+DEFAULT_MAX_PENDING = int(os.getenv("LOOMIS_MEMORY_MAX_PENDING", "10000"))
+# Pause before retrying a batch whose upsert failed
+RETRY_DELAY = float(os.getenv("LOOMIS_MEMORY_RETRY_DELAY", "0.5"))
+
+# Namespace for content-derived point ids; changing it orphans every stored id
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2a9e-4b7d-5e3a-9c08-2d51f0a7b3e4")
+
+_STOP = object()
+_FLUSH = object()
+
+
+class BufferedWriter:
+    """
+    Write-behind buffer for Qdrant upserts.
+
+    Points are queued and flushed from a background thread once batch_size
+    points are waiting or flush_interval seconds have passed since the first
+    one. The queue is bounded by max_pending: when it is full, add() blocks
+    (backpressure) rather than growing memory.
+
+    A batch whose upsert fails is retried once; if that fails too its points
+    are kept (up to max_pending of them) until retry_failed() queues them
+    again.
+
+    With skip_unchanged, each flush first looks its points up with one
+    batched retrieve and drops those already stored with the same payload
+    (see point_exists), so re-storing an image costs no request-path round
+    trip and leaves its stored point as is.
+    """
+
+    def __init__(self, client, collection_name=COLLECTION_NAME, batch_size=DEFAULT_BATCH_SIZE,
+                 flush_interval=DEFAULT_FLUSH_INTERVAL, max_pending=DEFAULT_MAX_PENDING,
+                 skip_unchanged=True):
+        self.client = client
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.skip_unchanged = skip_unchanged
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._metrics_lock = threading.Lock()
+        # Held across the closed check and the put, so nothing lands behind _STOP
+        self._lock = threading.Lock()
+        self._closed = False
+        self._failed = collections.deque(maxlen=max_pending)
+
+        self.flushes = 0
+        self.points_written = 0
+        self.points_failed = 0
+        self.points_unchanged = 0
+        self.total_flush_seconds = 0.0
+        self.max_flush_seconds = 0.0
+        self.max_batch_size = 0
+
+        self._thread = threading.Thread(target=self._run, name="qdrant-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, point, timeout=None):
+        """Queue one point; blocks while the buffer is full."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("BufferedWriter is closed")
+            self._queue.put(point, timeout=timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is _FLUSH:
+                self._queue.task_done()
+                continue
+            if item is _STOP:
+                self._queue.task_done()
+                return
+
+            batch = [item]
+            marker = None
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP or item is _FLUSH:
+                    # Write what we have right away
+                    marker = item
+                    break
+                batch.append(item)
+
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+            if marker is not None:
+                self._queue.task_done()
+                if marker is _STOP:
+                    return
+
+    def _upsert(self, batch):
+        try:
+            self.client.upsert(collection_name=self.collection_name, points=batch)
+            return None
+        except Exception as e:
+            return e
+
+    def _changed(self, batch):
+        """The points of batch that are not stored yet with the same payload."""
+        if not self.skip_unchanged or not batch:
+            return batch
+        try:
+            with span("memory.exists"):
+                records = self.client.retrieve(
+                    collection_name=self.collection_name,
+                    ids=[point.id for point in batch],
+                    with_payload=True,
+                    with_vectors=False,
+                )
+        except Exception as e:
+            # The upsert below retries and reports the failure
+            logger.warning(f"Could not check {len(batch)} points before writing: {str(e)}")
+            return batch
+
+        stored = {str(record.id): record.payload or {} for record in records}
+        return [
+            point for point in batch
+            if str(point.id) not in stored or not same_payload(stored[str(point.id)], point.payload or {})
         ]
-    )
+
+    def _write(self, batch):
+        with span("memory.flush") as s:
+            size = len(batch)
+            batch = self._changed(batch)
+            error = self._upsert(batch) if batch else None
+            if error is not None:
+                logger.warning(f"Retrying {len(batch)} points after Qdrant write failed: {str(error)}")
+                time.sleep(RETRY_DELAY)
+                error = self._upsert(batch)
+            failed = 0
+            if error is not None:
+                logger.error(f"✗ Failed to write {len(batch)} points to Qdrant: {str(error)}")
+                failed = len(batch)
+                self._failed.extend(batch)
+        elapsed = s.elapsed_ms / 1000
+
+        with self._metrics_lock:
+            self.flushes += 1
+            self.points_written += len(batch) - failed
+            self.points_failed += failed
+            self.points_unchanged += size - len(batch)
+            self.total_flush_seconds += elapsed
+            self.max_flush_seconds = max(self.max_flush_seconds, elapsed)
+            self.max_batch_size = max(self.max_batch_size, len(batch))
+
+    def retry_failed(self):
+        """Queue the points whose writes failed again; returns how many."""
+        points = []
+        while self._failed:
+            points.append(self._failed.popleft())
+        for point in points:
+            self.add(point)
+        return len(points)
+
+    def flush(self):
+        """Block until every queued point has been written (or has failed)."""
+        with self._lock:
+            if not self._closed:
+                self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(_STOP)
+        self._thread.join()
+
+    def metrics(self):
+        with self._metrics_lock:
+            return {
+                "pending": self._queue.qsize(),
+                "capacity": self._queue.maxsize,
+                "flushes": self.flushes,
+                "points_written": self.points_written,
+                "points_failed": self.points_failed,
+                "points_unchanged": self.points_unchanged,
+                "failed_pending": len(self._failed),
+                "avg_batch_size": (self.points_written + self.points_failed) / self.flushes if self.flushes else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "avg_flush_ms": 1000 * self.total_flush_seconds / self.flushes if self.flushes else 0.0,
+                "max_flush_ms": 1000 * self.max_flush_seconds,
+            }
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def get_writer(client, **kwargs):
+    """Return the shared BufferedWriter for client, starting it on first use."""
+    with _writers_lock:
+        writer = _writers.get(id(client))
+        if writer is None:
+            writer = BufferedWriter(client, **kwargs)
+            _writers[id(client)] = writer
+        return writer
+
+
+def writer_metrics():
+    with _writers_lock:
+        writers = list(_writers.values())
+    return [w.metrics() for w in writers]
+
+
+def flush_writers():
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+@atexit.register
+def close_writers():
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def make_point(point_id, vector, payload):
+    # PointStruct is accepted by every backend, including Qdrant local mode,
+    # which rejects plain dicts
+    from qdrant_client.models import PointStruct
+    return PointStruct(id=point_id, vector=list(vector), payload=payload)
+
+
+def memory_point_id(content_hash, point_type, face_index=0):
+    """
+    Deterministic id for the memory of one face in an image: the same image
+    content stored as the same type always maps to the same point.
+    """
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{content_hash}:{point_type}:{face_index}"))
+
+
+# Payload fields that change on every store without changing the memory
+VOLATILE_FIELDS = ("created_at",)
+
+
+def point_exists(client, point_id, payload=None, collection_name=COLLECTION_NAME):
+    """
+    True if point_id is stored (holding every field of payload, when given,
+    apart from VOLATILE_FIELDS). Points still waiting in a write-behind
+    buffer are not seen.
+    """
+    with span("memory.exists"):
+        records = client.retrieve(
+            collection_name=collection_name,
+            ids=[point_id],
+            with_payload=payload is not None,
+            with_vectors=False,
+        )
+    if not records:
+        return False
+    if payload is None:
+        return True
+    return same_payload(records[0].payload or {}, payload)
+
+
+def same_payload(stored, payload):
+    """True if stored holds every field of payload apart from VOLATILE_FIELDS."""
+    return all(stored.get(key) == value for key, value in payload.items() if key not in VOLATILE_FIELDS)
+
+
+def store_in_qdrant(client, vector, payload, buffered=WRITE_BEHIND, point_id=None):
+    """
+    Store one memory and return its id.
+
+    With a point_id (see memory_point_id), a point already stored under that
+    id with the same payload is left as is, keeping its created_at and
+    prototype; otherwise the write is an upsert in place, so storing the
+    same image again never adds a point. Without one, a random id is used.
+
+    Buffered, that check runs in the writer thread, batched per flush, so
+    this call never waits on Qdrant. Unbuffered, it is a retrieve first.
+    """
+    if not buffered and point_id is not None and point_exists(client, point_id, payload):
+        return point_id
+
+    point = make_point(point_id or uuid.uuid4().hex, vector, payload)
+
+    if buffered:
+        with span("memory.enqueue"):
+            get_writer(client).add(point)
+    else:
+        with span("memory.upsert"):
+            client.upsert(
+                collection_name=COLLECTION_NAME,
+                points=[point]
+            )
+
+    return point.id
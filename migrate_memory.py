@@ -0,0 +1,96 @@
+"""
+Re-embed the legacy 'loomis_memory' collection into the shape + pose
+embedding collection.
+
+Usage:
+    python migrate_memory.py [--source loomis_memory] [--target loomis_memory_v2] [--batch-size 256]
+
+The old 4-D vectors cannot be converted directly, so every point is
+re-embedded from the image at its payload's image_path. Points whose image is
+gone (or has no detectable face) are reported and left in the source.
+Migrated points are written at their content-derived id (see
+memory_store.memory_point_id), so legacy copies of one image collapse into a
+single point, and analysing that image again updates it instead of adding
+another.
+"""
+
+import argparse
+import os
+
+from embedding_utils import EMBEDDING_VERSION, landmarks_to_embedding
+from landmark_cache import get_landmarks
+from memory_store import make_point, memory_point_id
+from qdrant_setup import COLLECTION_NAME, LEGACY_COLLECTION_NAME, ensure_collection, get_qdrant_client
+
+
+def migrate(client, source=LEGACY_COLLECTION_NAME, target=COLLECTION_NAME, batch_size=256):
+    if hasattr(client, "get_collections"):
+        ensure_collection(client, target)
+
+    migrated = 0
+    skipped = []
+    batch = []
+    offset = None
+
+    while True:
+        records, offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=False,
+        )
+
+        for record in records:
+            payload = dict(record.payload or {})
+            image_path = payload.get("image_path")
+
+            if not image_path or not os.path.exists(image_path):
+                skipped.append((record.id, "image not found"))
+                continue
+
+            try:
+                data = get_landmarks(image_path)
+                if not data["face"]:
+                    skipped.append((record.id, "no face detected"))
+                    continue
+                vector = landmarks_to_embedding(data["face"], image_width=data["image_size"][1])
+            except Exception as e:
+                skipped.append((record.id, str(e)))
+                continue
+
+            payload["embedding_version"] = EMBEDDING_VERSION
+            payload["content_hash"] = data["digest"]
+            payload["face_index"] = 0
+            point_id = memory_point_id(data["digest"], payload.get("type"), 0)
+            batch.append(make_point(point_id, vector, payload))
+
+        if len(batch) >= batch_size or (offset is None and batch):
+            client.upsert(collection_name=target, points=batch)
+            migrated += len(batch)
+            batch = []
+
+        if offset is None:
+            break
+
+    return {"migrated": migrated, "skipped": skipped}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-embed Loomis visual memory into the v2 collection.")
+    parser.add_argument("--source", default=LEGACY_COLLECTION_NAME)
+    parser.add_argument("--target", default=COLLECTION_NAME)
+    parser.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args(argv)
+
+    result = migrate(get_qdrant_client(), args.source, args.target, args.batch_size)
+
+    print(f"Migrated {result['migrated']} points from '{args.source}' to '{args.target}'")
+    if result["skipped"]:
+        print(f"Skipped {len(result['skipped'])} points:")
+        for point_id, reason in result["skipped"]:
+            print(f"  ✗ {point_id}: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,50 +1,171 @@
+import os
+import threading
+
 import cv2
 import numpy as np
-from PIL import Image
-import mediapipe as mp
-import matplotlib.pyplot as plt
-
-mp_pose = mp.solutions.pose
-
-mp_face_mesh = mp.solutions.face_mesh
-face_mesh = mp_face_mesh.FaceMesh(
-    static_image_mode=True,
-    max_num_faces = 1,
-    refine_landmarks = True,
-    min_detection_confidence=0.5
-)
 
-pose_img = mp_pose.Pose(static_image_mode=True, 
-                    min_detection_confidence=0.5, model_complexity=2)
+from image_io import DEFAULT_MAX_SIDE, fit_max_side, read_for_detection
+from landmarks import FaceLandmarks, FaceLandmarksBatch
+from tracing import span
+
+# MediaPipe graphs are built on first use rather than at import time, so
+# importing this module (and everything that depends on it) stays cheap.
+# A graph must not process two images at once, so each thread that runs
+# detection (e.g. the MCP server's worker pool) gets its own instances.
+_model_lock = threading.Lock()
+_models = threading.local()
+
+# Faces FaceMesh looks for in a still image (group portraits, reference sheets)
+MAX_NUM_FACES = int(os.getenv("LOOMIS_MAX_FACES", "4"))
+
+
+def create_face_mesh(static_image_mode=True, max_num_faces=MAX_NUM_FACES):
+    """
+    Build a new FaceMesh graph.
+
+    Use static_image_mode=False for video: detection then only runs until a
+    face is found and later frames are tracked from the previous landmarks.
+    """
+    import mediapipe as mp
+    return mp.solutions.face_mesh.FaceMesh(
+        static_image_mode=static_image_mode,
+        max_num_faces = max_num_faces,
+        refine_landmarks = True,
+        min_detection_confidence=0.5
+    )
+
+
+def get_face_mesh():
+    face_mesh = getattr(_models, "face_mesh", None)
+    if face_mesh is None:
+        with _model_lock:
+            face_mesh = _models.face_mesh = create_face_mesh(static_image_mode=True)
+    return face_mesh
+
+
+def get_pose():
+    pose_img = getattr(_models, "pose_img", None)
+    if pose_img is None:
+        with _model_lock:
+            import mediapipe as mp
+            pose_img = _models.pose_img = mp.solutions.pose.Pose(static_image_mode=True, 
+                                    min_detection_confidence=0.5, model_complexity=2)
+    return pose_img
+
+# Same pairs as mediapipe.solutions.pose.POSE_CONNECTIONS, kept here so the
+# overlay can be drawn from cached landmarks without importing MediaPipe
+POSE_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 7), (0, 4), (4, 5), (5, 6), (6, 8), (9, 10),
+    (11, 12), (11, 13), (13, 15), (15, 17), (15, 19), (15, 21), (17, 19),
+    (12, 14), (14, 16), (16, 18), (16, 20), (16, 22), (18, 20), (11, 23),
+    (12, 24), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29),
+    (28, 30), (29, 31), (30, 32), (27, 31), (28, 32),
+)
 
-mp_drawing = mp.solutions.drawing_utils
 
-def draw_landmarks(input_img, results, results_face,
-        landmarks_c=(234, 63, 247), connection_c=(117, 249, 77), thickness=1, circle_r=1):
-    
-    height, width, _ = input_img.shape
+def extract_landmarks(results, results_face, image_size):
+    """
+    Convert MediaPipe results to (pose_landmarks, faces) in pixel coordinates
+    of image_size ((height, width)). Landmarks detected on a downscaled copy
+    therefore come back in full-resolution coordinates. faces is a
+    FaceLandmarksBatch holding every detected face, in FaceMesh's order.
+    """
+    height, width = image_size
 
-    face_landmarks = []
+    face_points = np.empty((0, 0, 3))
 
-    if results_face.multi_face_landmarks:
-        for lm in results_face.multi_face_landmarks[0].landmark:
-            face_landmarks.append((int(lm.x * width), int(lm.y * height), lm.z))
-            cv2.circle(input_img, (int(lm.x * width), int(lm.y * height)), 1, (0,255,0), -1)
+    if results_face is not None and results_face.multi_face_landmarks:
+        face_points = np.array([
+            [(lm.x, lm.y, lm.z) for lm in face.landmark]
+            for face in results_face.multi_face_landmarks
+        ])
+        face_points[:, :, 0] = np.trunc(face_points[:, :, 0] * width)
+        face_points[:, :, 1] = np.trunc(face_points[:, :, 1] * height)
 
     pose_landmarks = []
 
-    if results.pose_landmarks:
-        mp_drawing.draw_landmarks(
-            input_img,
-            results.pose_landmarks,
-            mp_pose.POSE_CONNECTIONS,
-            mp_drawing.DrawingSpec(color=connection_c, thickness=thickness, circle_radius=circle_r),
-            mp_drawing.DrawingSpec(color=landmarks_c, thickness=thickness, circle_radius=circle_r),
-        )
-        for landmark in results.pose_landmarks.landmark:
-            pose_landmarks.append((int(landmark.x * width), int(landmark.y * height), landmark.z * width))
+    if results is not None and results.pose_landmarks:
+        pose_landmarks = [
+            (int(landmark.x * width), int(landmark.y * height), landmark.z * width)
+            for landmark in results.pose_landmarks.landmark
+        ]
+
+    return pose_landmarks, FaceLandmarksBatch(face_points)
+
+
+def _disc_offsets(radius):
+    # Same filled-disc footprint as cv2.circle(..., radius, color, -1)
+    r = np.arange(-radius, radius + 1)
+    dx, dy = np.meshgrid(r, r)
+    inside = dx ** 2 + dy ** 2 <= radius ** 2
+    return dx[inside], dy[inside]
+
+
+def rasterize_points(image, points, color, radius=1):
+    """
+    Stamp a filled disc of radius at every (x, y) in points with a single
+    fancy-indexed write, instead of one cv2.circle call per point.
+    """
+    points = np.asarray(points)
+    if not len(points):
+        return image
+
+    height, width = image.shape[:2]
+    dx, dy = _disc_offsets(radius)
+    xs = (points[:, 0].astype(np.intp)[:, None] + dx).ravel()
+    ys = (points[:, 1].astype(np.intp)[:, None] + dy).ravel()
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    xs, ys = xs[inside], ys[inside]
+
+    if image.flags.c_contiguous:
+        # Row-major flat indexing is about twice as fast as 2-D fancy indexing
+        image.reshape(height * width, -1)[ys * width + xs] = color
+    else:
+        image[ys, xs] = color
+    return image
+
+
+def draw_landmark_overlay(image, face_landmarks=None, pose_landmarks=None, image_size=None,
+        face_c=(0,255,0), landmarks_c=(234, 63, 247), connection_c=(117, 249, 77), thickness=1, circle_r=1):
+    """
+    Draw the debug overlay (face mesh points, pose skeleton) onto image in
+    place and return it. Landmarks are in image_size coordinates (default:
+    image's own), so landmarks from the cache can be drawn on any copy of
+    the image, at any resolution, whenever an overlay is actually wanted.
+    """
+    height, width = image.shape[:2]
+    source_height, source_width = image_size or (height, width)
+    scale = np.array([width / source_width, height / source_height])
 
-    return pose_landmarks, face_landmarks
+    if face_landmarks is not None and len(face_landmarks):
+        # One face (N, 3) or a batch (F, N, 3): all points go in one write
+        face = np.asarray(face_landmarks, dtype=np.float64).reshape(-1, 3)[:, :2]
+        rasterize_points(image, np.trunc(face * scale), face_c, radius=1)
+
+    if pose_landmarks is not None and len(pose_landmarks):
+        pose = np.trunc(np.asarray(pose_landmarks, dtype=np.float64)[:, :2] * scale).astype(np.int32)
+        connections = np.array([c for c in POSE_CONNECTIONS if max(c) < len(pose)])
+        if len(connections):
+            cv2.polylines(image, list(pose[connections]), False, connection_c, thickness)
+        rasterize_points(image, pose, landmarks_c, radius=circle_r)
+
+    return image
+
+
+def draw_landmarks(input_img, results, results_face,
+        landmarks_c=(234, 63, 247), connection_c=(117, 249, 77), thickness=1, circle_r=1,
+        image_size=None):
+    """
+    extract_landmarks() plus draw_landmark_overlay() (every face) onto
+    input_img, for callers that want the annotated image. Returns the first
+    face only, as before.
+    """
+    image_size = image_size or input_img.shape[:2]
+    pose_landmarks, faces = extract_landmarks(results, results_face, image_size)
+    draw_landmark_overlay(input_img, faces, pose_landmarks, image_size,
+                          landmarks_c=landmarks_c, connection_c=connection_c,
+                          thickness=thickness, circle_r=circle_r)
+    return pose_landmarks, faces[0] if faces else FaceLandmarks([])
 
 # def displayLandmarks(original_img, output_img):
 #     plt.figure(figsize=(14, 7))
@@ -63,37 +184,81 @@ def draw_landmarks(input_img, results, results_face,
 
 #     plt.show()
 
-def detect_pose_and_face(input_file, display=True):
+LANDMARK_SETS = ("face", "pose")
+
+
+def detect_landmarks(input_file, landmark_sets=("face",), display=True, face_mesh=None,
+                     max_side=DEFAULT_MAX_SIDE, image_size=None, overlay=False):
+    """
+    Detect only the requested landmark sets ("face", "pose" or both).
+
+    Models for sets that are not requested are never run; their entry in the
+    returned dict is left empty. "faces" holds every detected face as a
+    FaceLandmarksBatch and "face" the first one as a FaceLandmarks container
+    (empty when there is none); pose landmarks come back as a list of
+    (x, y, z) tuples.
+
+    Pass face_mesh to run a caller-owned graph (e.g. a tracking-mode one for
+    video) instead of the shared static-image one.
+
+    Inference runs on a copy at most max_side pixels on its longest side
+    (0 or None for full resolution); landmarks are still returned in the
+    coordinates of the original image. When input_file is an array that was
+    already downscaled, pass the original (height, width) as image_size.
+
+    The input is never copied or drawn on. With overlay=True the result also
+    holds "image", an annotated copy at inference resolution; otherwise call
+    draw_landmark_overlay() later if an overlay turns out to be needed.
+    """
+    unknown = set(landmark_sets) - set(LANDMARK_SETS)
+    if unknown:
+        raise ValueError(f"Unknown landmark sets: {sorted(unknown)}")
+
     if isinstance(input_file, str):
-        image = cv2.imread(input_file)
+        with span("detect.decode"):
+            image, image_size = read_for_detection(input_file, max_side)
     else:
         image = input_file
 
     if image is None:
         raise ValueError("Image not found or unable to read.")
 
-    output_img = image.copy()
+    image_size = tuple(image_size or image.shape[:2])
 
-    RGB_img = cv2.cvtColor(output_img, cv2.COLOR_BGR2RGB)
+    with span("detect.resize"):
+        image = fit_max_side(image, max_side)
 
-    results = pose_img.process(RGB_img)
-    results_face = face_mesh.process(RGB_img)
+    with span("detect.color_convert"):
+        RGB_img = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
 
-    pose_landmarks, face_landmarks = draw_landmarks(input_img=output_img, results=results, results_face=results_face)
+    results = None
+    if "pose" in landmark_sets:
+        with span("detect.pose"):
+            results = get_pose().process(RGB_img)
+    results_face = None
+    if "face" in landmark_sets:
+        with span("detect.face_mesh"):
+            results_face = (face_mesh or get_face_mesh()).process(RGB_img)
 
-    
+    with span("detect.extract"):
+        pose_landmarks, faces = extract_landmarks(results, results_face, image_size)
 
-    # if display:
-    #     displayLandmarks(image, output_img)
+    data = {
+        "face": faces[0] if faces else FaceLandmarks([]),
+        "faces": faces,
+        "pose": pose_landmarks,
+        "image_size": image_size
+    }
 
-    # print("Face Lanmdarks: ", face_landmarks)
-    # print("Pose Landmarks: ", pose_landmarks)
+    if overlay:
+        with span("detect.overlay"):
+            data["image"] = draw_landmark_overlay(image.copy(), faces, pose_landmarks, image_size)
 
-    return {
-    "image": output_img,
-    "face": face_landmarks,
-    "pose": pose_landmarks
-    }
+    return data
+
+
+def detect_pose_and_face(input_file, display=True):
+    return detect_landmarks(input_file, landmark_sets=LANDMARK_SETS, display=display)
 
 
 
@@ -1,59 +1,276 @@
+import atexit
 import os
 import logging
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance
+import threading
+
+from embedding_utils import EMBEDDING_DIM
 
 logger = logging.getLogger(__name__)
 
-def init_qdrant(url: str = None, timeout: int = 5):
+MEMORY_BACKENDS = ("qdrant", "qdrant-local", "numpy")
+
+# Shape + pose embeddings (see embedding_utils.landmarks_to_embedding).
+# LEGACY_COLLECTION_NAME holds the old 4-D radius/center/direction vectors;
+# migrate_memory.py re-embeds it into COLLECTION_NAME.
+COLLECTION_NAME = "loomis_memory_v2"
+LEGACY_COLLECTION_NAME = "loomis_memory"
+
+
+def prototype_collection_name(collection_name: str = COLLECTION_NAME):
+    """Collection holding the cluster centres of collection_name (see memory_prototypes.py)."""
+    return f"{collection_name}_prototypes"
+
+
+PROTOTYPE_COLLECTION_NAME = prototype_collection_name(COLLECTION_NAME)
+
+# Payload fields that retrieval filters on; indexed as keywords
+PAYLOAD_INDEXES = ("type", "image_path", "prototype")
+
+
+def _env_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+# HNSW graph and scalar quantization for newly created collections; unset
+# values keep Qdrant's defaults. LOOMIS_QDRANT_QUANTIZATION=int8 stores an
+# int8 copy of every vector (4x smaller) that searches run against, then
+# rescore the best LOOMIS_QDRANT_OVERSAMPLING * limit candidates exactly.
+HNSW_M = _env_int("LOOMIS_HNSW_M")
+HNSW_EF_CONSTRUCT = _env_int("LOOMIS_HNSW_EF_CONSTRUCT")
+HNSW_EF = _env_int("LOOMIS_HNSW_EF")
+QUANTIZATION = os.getenv("LOOMIS_QDRANT_QUANTIZATION", "") or None
+QUANTIZATION_ALWAYS_RAM = os.getenv("LOOMIS_QDRANT_QUANTIZATION_RAM", "1") != "0"
+QUANTIZATION_OVERSAMPLING = float(os.getenv("LOOMIS_QDRANT_OVERSAMPLING", "2.0"))
+
+_client_lock = threading.Lock()
+_client = None
+
+
+def is_local_client(client):
+    """True for a QdrantClient in local (embedded) mode, which always searches exactly."""
+    options = getattr(client, "init_options", None) or {}
+    return bool(options.get("location") == ":memory:" or options.get("path"))
+
+
+def ensure_collection(client, collection_name: str = COLLECTION_NAME, size: int = EMBEDDING_DIM,
+                      hnsw_m: int = None, ef_construct: int = None, quantization: str = None):
+    """
+    Create a cosine collection on a Qdrant client if it doesn't exist, and
+    make sure the PAYLOAD_INDEXES fields are indexed.
+
+    hnsw_m, ef_construct and quantization ("int8" or None) only apply when
+    the collection is created; they default to the LOOMIS_HNSW_* and
+    LOOMIS_QDRANT_QUANTIZATION settings.
+    """
+    from qdrant_client.models import (
+        Distance, HnswConfigDiff, ScalarQuantization, ScalarQuantizationConfig, ScalarType, VectorParams,
+    )
+
+    hnsw_m = hnsw_m or HNSW_M
+    ef_construct = ef_construct or HNSW_EF_CONSTRUCT
+    quantization = quantization or QUANTIZATION
+    if quantization not in (None, "int8"):
+        raise ValueError(f"Unsupported quantization '{quantization}', expected 'int8'")
+
+    try:
+        collections = [c.name for c in client.get_collections().collections]
+
+        if collection_name not in collections:
+            logger.info(f"Creating '{collection_name}' collection...")
+            client.create_collection(
+                collection_name=collection_name,
+                vectors_config=VectorParams(
+                    size=size,
+                    distance=Distance.COSINE
+                ),
+                hnsw_config=HnswConfigDiff(m=hnsw_m, ef_construct=ef_construct)
+                if hnsw_m or ef_construct else None,
+                quantization_config=ScalarQuantization(
+                    scalar=ScalarQuantizationConfig(
+                        type=ScalarType.INT8,
+                        quantile=0.99,
+                        always_ram=QUANTIZATION_ALWAYS_RAM,
+                    )
+                ) if quantization else None,
+            )
+            logger.info(f"✓ Collection '{collection_name}' created successfully")
+        else:
+            logger.info(f"✓ Collection '{collection_name}' already exists")
+
+        ensure_payload_indexes(client, collection_name)
+
+    except Exception as e:
+        logger.error(f"✗ Failed to create/verify collection: {str(e)}")
+        raise
+
+
+def ensure_payload_indexes(client, collection_name: str = COLLECTION_NAME):
+    """Create keyword indexes for PAYLOAD_INDEXES that the collection lacks."""
+    from qdrant_client.models import PayloadSchemaType
+
+    # Local mode scans payloads on every filtered search and has no indexes
+    if is_local_client(client):
+        return
+
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field_name in PAYLOAD_INDEXES:
+        if field_name not in existing:
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=PayloadSchemaType.KEYWORD,
+            )
+            logger.info(f"✓ Indexed payload field '{field_name}' on '{collection_name}'")
+
+
+def search_params():
+    """
+    SearchParams for the configured LOOMIS_HNSW_EF and quantization, or None
+    to use the collection's defaults.
+    """
+    if not HNSW_EF and not QUANTIZATION:
+        return None
+
+    from qdrant_client.models import QuantizationSearchParams, SearchParams
+
+    return SearchParams(
+        hnsw_ef=HNSW_EF,
+        quantization=QuantizationSearchParams(
+            rescore=True,
+            oversampling=QUANTIZATION_OVERSAMPLING,
+        ) if QUANTIZATION else None,
+    )
+
+
+def init_qdrant(url: str = None, timeout: int = 5, **collection_options):
     """
     Initialize Qdrant client with error handling.
-    
+
     Args:
         url: Qdrant server URL (default: env var QDRANT_URL or http://localhost:6333)
         timeout: Connection timeout in seconds
-    
+        collection_options: hnsw_m, ef_construct and quantization overrides
+            passed to ensure_collection
+
     Returns:
         QdrantClient instance
-    
+
     Raises:
         ConnectionError: If unable to connect to Qdrant server
     """
-    
+
+    from qdrant_client import QdrantClient
+
     # Get URL from parameter, environment variable, or default
     qdrant_url = url or os.getenv("QDRANT_URL", "http://localhost:6333")
-    
+
     try:
         # Create client with timeout
-        client = QdrantClient(url="http://localhost:6333", timeout=timeout)
-        
+        client = QdrantClient(url=qdrant_url, timeout=timeout)
+
         # Verify connection by listing collections
         client.get_collections()
         logger.info(f"✓ Connected to Qdrant at {qdrant_url}")
-        
+
     except Exception as e:
         logger.error(f"✗ Failed to connect to Qdrant at {qdrant_url}: {str(e)}")
         raise ConnectionError(f"Cannot connect to Qdrant server at {qdrant_url}") from e
-    
+
     # Create collection if it doesn't exist
-    try:
-        collections = [c.name for c in client.get_collections().collections]
-        
-        if "loomis_memory" not in collections:
-            logger.info("Creating 'loomis_memory' collection...")
-            client.create_collection(
-                collection_name="loomis_memory",
-                vectors_config=VectorParams(
-                    size=4,
-                    distance=Distance.COSINE
-                )
-            )
-            logger.info("✓ Collection 'loomis_memory' created successfully")
-        else:
-            logger.info("✓ Collection 'loomis_memory' already exists")
-            
-    except Exception as e:
-        logger.error(f"✗ Failed to create/verify collection: {str(e)}")
-        raise
-    
-    return client
\ No newline at end of file
+    ensure_collection(client, **collection_options)
+    ensure_collection(client, PROTOTYPE_COLLECTION_NAME)
+
+    return client
+
+
+def init_qdrant_local(path: str = None):
+    """
+    Initialize Qdrant in local (embedded) mode, storing data under path.
+
+    Args:
+        path: Storage directory (default: env var LOOMIS_MEMORY_PATH or ./loomis_memory_qdrant),
+              or ":memory:" for a throwaway in-process store
+
+    Returns:
+        QdrantClient instance
+    """
+
+    from qdrant_client import QdrantClient
+
+    path = path or os.getenv("LOOMIS_MEMORY_PATH", "loomis_memory_qdrant")
+
+    if path == ":memory:":
+        client = QdrantClient(location=":memory:")
+    else:
+        client = QdrantClient(path=path)
+    logger.info(f"✓ Opened local Qdrant storage at {path}")
+
+    ensure_collection(client)
+    ensure_collection(client, PROTOTYPE_COLLECTION_NAME)
+
+    return client
+
+
+def init_memory_backend(backend: str = None):
+    """
+    Initialize the visual memory backend.
+
+    Args:
+        backend: "qdrant" (server), "qdrant-local" (embedded Qdrant) or "numpy"
+                 (in-process brute-force index persisted to LOOMIS_MEMORY_PATH).
+                 Defaults to env var LOOMIS_MEMORY_BACKEND or "qdrant".
+
+    Returns:
+        An object exposing the QdrantClient upsert/query_points API
+
+    Raises:
+        ValueError: If the backend name is unknown
+        ConnectionError: If the "qdrant" backend cannot reach its server
+    """
+
+    backend = backend or os.getenv("LOOMIS_MEMORY_BACKEND", "qdrant")
+
+    if backend == "qdrant":
+        return init_qdrant()
+    if backend == "qdrant-local":
+        return init_qdrant_local()
+    if backend == "numpy":
+        from memory_backends import NumpyMemoryBackend
+        path = os.getenv("LOOMIS_MEMORY_PATH", "loomis_memory_index")
+        logger.info(f"✓ Using NumPy memory index at {path}")
+        client = NumpyMemoryBackend(path=None if path == ":memory:" else path)
+        for collection_name in (COLLECTION_NAME, PROTOTYPE_COLLECTION_NAME):
+            for field_name in PAYLOAD_INDEXES:
+                client.create_payload_index(collection_name, field_name)
+        atexit.register(_close_numpy_backend, client)
+        return client
+
+    raise ValueError(f"Unknown memory backend '{backend}', expected one of {MEMORY_BACKENDS}")
+
+
+def _close_numpy_backend(client):
+    # Registered after memory_store's own hook, so it runs first: drain the
+    # write-behind buffer into the index, then save what it wrote
+    from memory_store import close_writers
+    close_writers()
+    client.close()
+
+
+def get_qdrant_client():
+    """
+    Return the shared memory backend (see init_memory_backend), connecting on
+    first use. Starts the background compaction job when
+    LOOMIS_MEMORY_COMPACT_INTERVAL is set (see memory_prototypes.py).
+
+    Raises:
+        ConnectionError: If unable to connect to Qdrant server
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = init_memory_backend()
+                from memory_prototypes import start_compaction_job
+                start_compaction_job(_client)
+    return _client
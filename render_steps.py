@@ -1,31 +1,64 @@
 import cv2
+import json
 import math
+import os
 
-def construct_loomis_sphere(image, center, radius, direction, face_landmarks):
+import numpy as np
+
+from landmarks import (
+    CHIN, LEFT_BROW, LEFT_EYE_OUTER, LEFT_JAW, LEFT_NOSTRIL, NOSE,
+    RIGHT_BROW, RIGHT_EYE_OUTER, RIGHT_JAW, RIGHT_NOSTRIL, as_face_batch, as_face_landmarks,
+)
+from head_pose import estimate_head_pose, estimate_head_pose_batch
+from tracing import span, traced
+
+# Side plane: where the flat side of the Loomis ball is cut off, a circle of
+# SIDE_PLANE_RADIUS * radius whose centre lies on the head's left-right axis
+SIDE_PLANE_RADIUS = 0.70
+SIDE_PLANE_DISTANCE = math.sqrt(1 - SIDE_PLANE_RADIUS ** 2)
+# Closer to frontal the plane is seen edge-on and is not drawn
+SIDE_PLANE_MIN_YAW = math.radians(5)
+
+
+def side_plane(radii, yaws):
+    """
+    Side plane geometry for continuous yaws (radians), vectorized over faces.
+    Returns int arrays (visible, offset, axes_w, axes_h): the plane centre
+    moves offset pixels from the sphere centre towards the turn's far side,
+    reaching the middle in profile, while the ellipse widens with |yaw|.
+    """
+    radii = np.asarray(radii, dtype=np.float64).astype(int)
+    turn = np.abs(np.asarray(yaws, dtype=np.float64))
+
+    visible = turn >= SIDE_PLANE_MIN_YAW
+    offset = (radii * SIDE_PLANE_DISTANCE * np.cos(turn)).astype(int)
+    axes_w = (radii * SIDE_PLANE_RADIUS * np.sin(turn)).astype(int)
+    axes_h = (radii * SIDE_PLANE_RADIUS).astype(int)
+    return visible, offset, axes_w, axes_h
+
+
+def _face_yaw(face_landmarks, yaw, image_width):
+    # Same fit as the pipeline's geometry stage when image_width is given
+    return estimate_head_pose(face_landmarks, image_width)[0] if yaw is None else yaw
+
+
+def construct_loomis_sphere(image, center, radius, direction, face_landmarks, yaw=None, image_width=None):
     cx, cy = int(center[0]), int(center[1])
 
     cv2.circle(image, (cx, cy), int(radius), (0,255,0), 1)
 
-    nose_x = face_landmarks[1][0]
+    visible, offset, axes_w, axes_h = (int(v[0]) for v in side_plane([radius], [_face_yaw(face_landmarks, yaw, image_width)]))
 
-    xs = [p[0] for p in face_landmarks]
-    face_center_x = sum(xs) / len(xs)
-
-    if abs(nose_x - face_center_x) < 5:
+    if not visible:
         return image
 
-    offset = int(radius * 0.40)
-
     plane_x = cx + offset if direction == "right" else cx - offset
     plane_y = cy
 
-    ellipse_w = int(radius * 0.45)
-    ellipse_h = int(radius * 0.70)
-
     cv2.ellipse(
         image,
         (plane_x, plane_y),
-        (ellipse_w, ellipse_h),
+        (axes_w, axes_h),
         0, 0, 360,
         (0,255,0), 1
     )
@@ -87,19 +120,15 @@ def construct_chin_line(image, face_landmarks):
 
     return image
 
-def construct_ellipse_vertical_line(image, center, radius, direction, face_landmarks):
-
-    nose_x = face_landmarks[1][0]
+def construct_ellipse_vertical_line(image, center, radius, direction, face_landmarks, yaw=None, image_width=None):
 
-    xs = [p[0] for p in face_landmarks]
-    face_center_x = sum(xs) / len(xs)
+    visible, offset, _, _ = (int(v[0]) for v in side_plane([radius], [_face_yaw(face_landmarks, yaw, image_width)]))
 
-    if abs(nose_x - face_center_x) < 5:
+    if not visible:
         return image
     
     cx, cy = int(center[0]), int(center[1])
 
-    offset = int(radius * 0.40)
     ex = cx + offset if direction == "right" else cx - offset
     ey = cy
 
@@ -144,3 +173,156 @@ def construct_outer_face_line(image, face_landmarks, direction):
 
     return image
 
+
+def build_display_list(center, radius, direction, face_landmarks, yaw=None, image_width=None):
+    """
+    Compute every Loomis guideline primitive once.
+
+    Returns a list of dicts ("circle", "ellipse" or "line") in the same order
+    and with the same integer geometry as the eight construct_* steps above.
+    """
+    yaws = None if yaw is None else [yaw]
+    return build_display_list_batch([radius], [center], [direction], as_face_landmarks(face_landmarks),
+                                    tag_faces=False, yaws=yaws, image_width=image_width)
+
+
+# Order matters: build_display_list_batch unpacks them in this order
+_USED_LANDMARKS = [
+    NOSE, LEFT_BROW, RIGHT_BROW, LEFT_NOSTRIL, RIGHT_NOSTRIL, CHIN,
+    LEFT_JAW, RIGHT_JAW, LEFT_EYE_OUTER, RIGHT_EYE_OUTER,
+]
+
+
+@traced("render.display_list")
+def build_display_list_batch(radii, centers, directions, faces, tag_faces=True, yaws=None, image_width=None):
+    """
+    build_display_list for several faces at once: every coordinate is computed
+    with one vectorized NumPy expression across faces, and the primitives of
+    all faces come back in a single list (face by face, each in step order)
+    ready for one rasterize_display_list pass. With tag_faces each primitive
+    carries the index of its face under "face". yaws (radians) size the side
+    planes; when not given they are estimated from the landmarks, with the
+    3D fit if image_width is known. directions should come from the same
+    yaws (head_pose.direction_from_yaw, or compute_face_turn_angle with the
+    same image_width).
+    """
+    faces = as_face_batch(faces)
+    if not faces:
+        return []
+
+    radii = np.asarray(radii, dtype=np.float64).astype(int)
+    centers = np.asarray(centers, dtype=np.float64).astype(int)
+    right = np.asarray(directions) == "right"
+    cx, cy = centers[:, 0], centers[:, 1]
+
+    # Only the landmarks the construction uses, as (F, K, 2)
+    used = faces.points[:, _USED_LANDMARKS, :2]
+    if yaws is None:
+        yaws = estimate_head_pose_batch(faces, image_width)[:, 0]
+
+    has_side_plane, offset, axes_w, axes_h = side_plane(radii, yaws)
+    plane_x = np.where(right, cx + offset, cx - offset)
+    plane_drop = (radii * 1.2).astype(int)
+
+    xy = used.astype(int).tolist()
+    eye_center = ((used[:, 1] + used[:, 2]) / 2).astype(int).tolist()
+    cx, cy, plane_x, plane_drop = cx.tolist(), cy.tolist(), plane_x.tolist(), plane_drop.tolist()
+    radii, axes_w, axes_h = radii.tolist(), axes_w.tolist(), axes_h.tolist()
+    right, has_side_plane = right.tolist(), has_side_plane.tolist()
+
+    line_len = 20
+    primitives = []
+    for i, face_xy in enumerate(xy):
+        (_, left_brow, right_brow, left_nostril, right_nostril, chin,
+         left_jaw, right_jaw, left_eye_outer, right_eye_outer) = map(tuple, face_xy)
+        c = (cx[i], cy[i])
+        face = [{"type": "circle", "step": "loomis_sphere", "center": c, "radius": radii[i]}]
+
+        if has_side_plane[i]:
+            face.append({"type": "ellipse", "step": "side_plane", "center": (plane_x[i], c[1]), "axes": (axes_w[i], axes_h[i])})
+
+        face.append({"type": "line", "step": "vertical_line", "start": tuple(eye_center[i]), "end": chin})
+        face.append({"type": "line", "step": "brow_line", "start": left_brow, "end": right_brow})
+        face.append({"type": "line", "step": "nose_line", "start": left_nostril, "end": right_nostril})
+        face.append({"type": "line", "step": "chin_line",
+                     "start": (chin[0] - line_len, chin[1]), "end": (chin[0] + line_len, chin[1])})
+
+        if has_side_plane[i]:
+            face.append({"type": "line", "step": "ellipse_vertical_line",
+                         "start": (plane_x[i], c[1]), "end": (plane_x[i], c[1] + plane_drop[i])})
+
+        outer_eye, outer_jaw = (left_eye_outer, left_jaw) if right[i] else (right_eye_outer, right_jaw)
+        face.append({"type": "line", "step": "jaw_line", "start": left_jaw, "end": chin})
+        face.append({"type": "line", "step": "jaw_line", "start": right_jaw, "end": chin})
+        face.append({"type": "line", "step": "outer_face_line", "start": outer_eye, "end": outer_jaw})
+        face.append({"type": "line", "step": "outer_face_line", "start": outer_jaw, "end": chin})
+
+        if tag_faces:
+            for p in face:
+                p["face"] = i
+        primitives.extend(face)
+
+    return primitives
+
+
+def rasterize_display_list(image, display_list, color=(0,255,0), thickness=1):
+    """Draw a display list onto image in place (single pass) and return it."""
+    # One span for the whole pass: a step draws in a few µs, about what a span
+    # costs, so per-step costs come from `benchmark.py suite` instead
+    with span("render.rasterize"):
+        for p in display_list:
+            if p["type"] == "line":
+                cv2.line(image, p["start"], p["end"], color, thickness)
+            elif p["type"] == "circle":
+                cv2.circle(image, p["center"], p["radius"], color, thickness)
+            elif p["type"] == "ellipse":
+                cv2.ellipse(image, p["center"], p["axes"], 0, 0, 360, color, thickness)
+    return image
+
+
+def display_list_to_json(display_list, width, height):
+    return json.dumps({"width": width, "height": height, "primitives": display_list})
+
+
+def display_list_to_svg(display_list, width, height, color="#00ff00", stroke_width=1):
+    elements = []
+    for p in display_list:
+        if p["type"] == "line":
+            (x1, y1), (x2, y2) = p["start"], p["end"]
+            elements.append(f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" data-step="{p["step"]}"/>')
+        elif p["type"] == "circle":
+            (cx, cy), r = p["center"], p["radius"]
+            elements.append(f'<circle cx="{cx}" cy="{cy}" r="{r}" data-step="{p["step"]}"/>')
+        elif p["type"] == "ellipse":
+            (cx, cy), (rx, ry) = p["center"], p["axes"]
+            elements.append(f'<ellipse cx="{cx}" cy="{cy}" rx="{rx}" ry="{ry}" data-step="{p["step"]}"/>')
+
+    body = "\n  ".join(elements)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}">\n'
+        f'<g fill="none" stroke="{color}" stroke-width="{stroke_width}">\n  {body}\n</g>\n</svg>\n'
+    )
+
+
+VECTOR_FORMATS = (".svg", ".json")
+
+
+def is_vector_output(output_path):
+    return output_path.lower().endswith(VECTOR_FORMATS)
+
+
+def write_display_list(output_path, display_list, width, height):
+    """Write the display list as SVG or JSON, chosen by output_path's extension."""
+    if os.path.splitext(output_path)[1].lower() == ".svg":
+        text = display_list_to_svg(display_list, width, height)
+    else:
+        text = display_list_to_json(display_list, width, height)
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def render_loomis_construction(image, center, radius, direction, face_landmarks, yaw=None, image_width=None):
+    display_list = build_display_list(center, radius, direction, face_landmarks, yaw, image_width)
+    return rasterize_display_list(image, display_list)
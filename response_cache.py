@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+
+from tiered_cache import TieredCache
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("LOOMIS_LLM_CACHE_SIZE", "256"))
+DEFAULT_MAX_DISK_ENTRIES = int(os.getenv("LOOMIS_LLM_CACHE_DISK_SIZE", "4096"))
+# Seconds a cached tutorial stays valid; 0 keeps entries until evicted
+DEFAULT_TTL = float(os.getenv("LOOMIS_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# Leave LOOMIS_LLM_CACHE_DIR unset to keep the cache purely in memory
+DEFAULT_CACHE_DIR = os.getenv("LOOMIS_LLM_CACHE_DIR") or None
+
+
+class ResponseCache(TieredCache):
+    """
+    Cache of generated LLM responses keyed by a caller-built string.
+
+    A TieredCache whose on-disk tier holds small .json files. Entries older
+    than ttl seconds are treated as misses and dropped from both tiers.
+    """
+
+    suffix = ".json"
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, cache_dir=DEFAULT_CACHE_DIR,
+                 max_disk_entries=DEFAULT_MAX_DISK_ENTRIES, ttl=DEFAULT_TTL):
+        super().__init__(max_entries, cache_dir, max_disk_entries, ttl)
+
+    def _disk_path(self, key):
+        # Keys are readable feature strings; hash them into safe file names
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def _read_file(self, path, key):
+        with open(path, encoding="utf-8") as f:
+            entry = json.load(f)
+        if entry.get("key") != key:
+            return None
+        return entry["text"], entry["created_at"]
+
+    def _write_file(self, path, key, text, created_at):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "text": text, "created_at": created_at}, f)
+
+
+response_cache = ResponseCache()
@@ -0,0 +1,143 @@
+"""
+Per-conversation state for recently touched images.
+
+"Detect face in a.jpg" followed by "apply Loomis to a.jpg and save to b.jpg"
+should not redo detection, geometry and embedding. A Session keeps, per
+path, everything the pipeline derived from that file: landmarks, the
+decoded image (once a raster output needed it), head geometry, embeddings
+and the ids of memories already stored. run_pipeline(..., session=...)
+reads and fills it.
+
+Entries are dropped when the file's mtime or size changes, and the session
+is bounded both by entry count and by bytes held (decoded images dominate),
+evicting least recently used paths first.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = int(os.getenv("LOOMIS_SESSION_SIZE", "16"))
+DEFAULT_MAX_BYTES = int(float(os.getenv("LOOMIS_SESSION_MAX_MB", "256")) * 1024 * 1024)
+
+
+class SessionEntry:
+    """What the pipeline has derived from one file version so far."""
+
+    def __init__(self, path, signature):
+        self.path = path
+        self.signature = signature
+        # get_landmarks() result without "image"
+        self.landmarks = None
+        # Full-resolution BGR image; never drawn on, callers get copies
+        self.image = None
+        # (radii, centers, directions, poses, geometries) from the geometry stage
+        self.geometry = None
+        # Embedding per face index
+        self.vectors = {}
+        # Memory type → point ids (one per face) already stored for this file
+        self.memory_ids = {}
+
+    @property
+    def nbytes(self):
+        total = 0
+        if self.image is not None:
+            total += self.image.nbytes
+        if self.landmarks is not None:
+            total += self.landmarks["faces"].points.nbytes
+        total += sum(getattr(v, "nbytes", 0) for v in self.vectors.values())
+        return total
+
+
+def file_signature(path):
+    """(mtime_ns, size) of path, or None if it cannot be stat'ed."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class Session:
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def entry(self, path):
+        """
+        The entry for path's current contents, created empty when the path is
+        new or the file changed since it was recorded. Returns None when the
+        file cannot be stat'ed.
+        """
+        key = os.path.abspath(path)
+        signature = file_signature(key)
+        if signature is None:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+            if entry is not None:
+                self.invalidations += 1
+            self.misses += 1
+            entry = self._entries[key] = SessionEntry(key, signature)
+            self._evict()
+            return entry
+
+    def update(self, entry):
+        """Re-apply the byte budget after the pipeline added data to entry."""
+        with self._lock:
+            self._evict(keep=entry.path)
+
+    def _evict(self, keep=None):
+        while len(self._entries) > self.max_entries or self._nbytes() > self.max_bytes:
+            oldest = next(iter(self._entries))
+            if oldest == keep:
+                # The entry in use may exceed the budget on its own; drop its image
+                if len(self._entries) == 1:
+                    self._entries[oldest].image = None
+                    return
+                self._entries.move_to_end(oldest)
+                continue
+            del self._entries[oldest]
+            self.evictions += 1
+
+    def _nbytes(self):
+        return sum(entry.nbytes for entry in self._entries.values())
+
+    def invalidate(self, path):
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._nbytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "paths": list(self._entries),
+            }
@@ -0,0 +1,141 @@
+"""
+Startup timing report.
+
+Breaks cold-start time down per subsystem: third-party imports, project
+module imports and (optionally) the lazily created models and clients.
+
+Usage:
+    python startup_report.py            # import times only
+    python startup_report.py --init     # also time first-use initialisation
+    python startup_report.py --json
+"""
+
+import argparse
+import importlib
+import json
+import sys
+import time
+
+SUBSYSTEMS = [
+    ("numpy", "numpy"),
+    ("opencv", "cv2"),
+    ("mediapipe", "mediapipe"),
+    ("qdrant", "qdrant_client"),
+    ("langchain", "langchain_core.tools"),
+    ("ollama", "langchain_ollama"),
+    ("langgraph", "langgraph.prebuilt"),
+    ("mcp", "mcp.server"),
+]
+
+PROJECT_MODULES = [
+    "pose_detection",
+    "landmark_cache",
+    "geometry_utils",
+    "render_steps",
+    "drawing_instructor_agent",
+    "qdrant_setup",
+    "agent",
+    "mcp_server",
+]
+
+
+def _init_face_mesh():
+    from pose_detection import get_face_mesh
+    get_face_mesh()
+
+
+def _init_pose():
+    from pose_detection import get_pose
+    get_pose()
+
+
+def _init_qdrant():
+    from qdrant_setup import get_qdrant_client
+    get_qdrant_client()
+
+
+def _init_instructor_llm():
+    from drawing_instructor_agent import get_instructor_llm
+    get_instructor_llm()
+
+
+def _init_agent():
+    from agent import get_agent
+    get_agent()
+
+
+INITIALIZERS = [
+    ("face_mesh", _init_face_mesh),
+    ("pose", _init_pose),
+    ("qdrant_client", _init_qdrant),
+    ("instructor_llm", _init_instructor_llm),
+    ("react_agent", _init_agent),
+]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    try:
+        fn()
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return (time.perf_counter() - start) * 1000, error
+
+
+def collect(include_init=False):
+    """
+    Time each stage in order within this process.
+
+    Every entry is incremental: modules already pulled in by an earlier stage
+    are free, so the numbers add up to the total cold start.
+    """
+    rows = []
+
+    for name, module in SUBSYSTEMS:
+        ms, error = _timed(lambda m=module: importlib.import_module(m))
+        rows.append({"stage": "import", "name": name, "ms": ms, "error": error})
+
+    for module in PROJECT_MODULES:
+        ms, error = _timed(lambda m=module: importlib.import_module(m))
+        rows.append({"stage": "import", "name": module, "ms": ms, "error": error})
+
+    if include_init:
+        for name, fn in INITIALIZERS:
+            ms, error = _timed(fn)
+            rows.append({"stage": "init", "name": name, "ms": ms, "error": error})
+
+    return rows
+
+
+def format_report(rows):
+    lines = [f"{'stage':<8}{'name':<28}{'ms':>10}", "-" * 46]
+    for row in rows:
+        line = f"{row['stage']:<8}{row['name']:<28}{row['ms']:>10.1f}"
+        if row["error"]:
+            line += f"  ({row['error']})"
+        lines.append(line)
+    lines.append("-" * 46)
+    lines.append(f"{'total':<36}{sum(r['ms'] for r in rows):>10.1f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Report cold-start time per subsystem.")
+    parser.add_argument("--init", action="store_true", help="also time lazy model/client creation")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    if any(m in sys.modules for m in PROJECT_MODULES):
+        print("Warning: project modules already imported, timings will be low", file=sys.stderr)
+
+    rows = collect(include_init=args.init)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_report(rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Synthetic FaceMesh-style heads with known poses, shared by the tests and
+benchmark.py.
+"""
+
+import math
+
+import numpy as np
+
+from head_pose import rotation_matrix
+
+# 3D positions (x right, y down, z away from the camera) of the landmarks the
+# construction relies on, in head half-widths, laid out from average adult
+# facial proportions. Deliberately independent of head_pose's canonical
+# model, so pose accuracy measured on these heads includes model mismatch.
+_SYNTHETIC_KEYPOINTS = {
+    1: (0.0, 0.1, -1.3),        # nose tip
+    152: (0.0, 0.95, -0.95),    # chin
+    105: (-0.33, -0.45, -1.05), # brows
+    334: (0.33, -0.45, -1.05),
+    33: (-0.62, -0.27, -0.75),  # outer eye corners
+    263: (0.62, -0.27, -0.75),
+    133: (-0.22, -0.27, -0.95), # inner eye corners
+    362: (0.22, -0.27, -0.95),
+    98: (-0.2, 0.12, -1.05),    # nostrils
+    327: (0.2, 0.12, -1.05),
+    61: (-0.35, 0.52, -0.95),   # mouth corners
+    291: (0.35, 0.52, -0.95),
+    13: (0.0, 0.45, -1.12),     # lips
+    14: (0.0, 0.55, -1.1),
+    172: (-0.62, 0.62, -0.45),  # jaw
+    397: (0.62, 0.62, -0.45),
+    10: (0.0, -1.0, -0.85),     # forehead top
+}
+
+
+def synthetic_head_model(seed=0, n=478, identity_scale=0.03):
+    """
+    A face-like (n, 3) point cloud. Every seed shares the same base layout
+    (vertex i is always the same facial location, as in FaceMesh) plus a
+    seed-specific per-vertex variation standing in for identity.
+    """
+    base = np.random.default_rng(12345)
+
+    theta = base.uniform(-math.pi / 2, math.pi / 2, n)
+    phi = base.uniform(-math.pi / 2.3, math.pi / 2.3, n)
+    model = np.stack([
+        0.75 * np.sin(theta) * np.cos(phi),
+        0.95 * np.sin(phi),
+        -0.75 * np.cos(theta) * np.cos(phi),
+    ], axis=1)
+
+    for index, point in _SYNTHETIC_KEYPOINTS.items():
+        model[index] = point
+
+    rng = np.random.default_rng(seed)
+    model += rng.normal(scale=identity_scale, size=model.shape)
+    return model
+
+
+def synthetic_face_landmarks(model, yaw=0.0, pitch=0.0, roll=0.0, scale=150.0,
+                             center=(320.0, 240.0), image_width=640):
+    """
+    Project a head model into FaceMesh-style landmarks: pixel x, pixel y and
+    a z normalised by image width.
+    """
+    rotated = model @ rotation_matrix(yaw, pitch, roll).T
+    points = np.empty_like(rotated)
+    points[:, 0] = np.trunc(center[0] + scale * rotated[:, 0])
+    points[:, 1] = np.trunc(center[1] + scale * rotated[:, 1])
+    points[:, 2] = scale * rotated[:, 2] / image_width
+    return points.astype(np.float32)
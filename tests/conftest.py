@@ -0,0 +1,66 @@
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# The project is a flat set of root modules rather than an installed package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# No model server, Qdrant or background writer in tests
+os.environ.setdefault("LOOMIS_INSTRUCTOR_LLM", "fake")
+os.environ.setdefault("LOOMIS_MEMORY_BACKEND", "numpy")
+os.environ.setdefault("LOOMIS_MEMORY_PATH", ":memory:")
+os.environ.setdefault("LOOMIS_MEMORY_WRITE_BEHIND", "0")
+
+from synthetic_faces import synthetic_face_landmarks, synthetic_head_model
+
+IMAGE_WIDTH, IMAGE_HEIGHT = 640, 480
+
+
+def synthetic_faces(*yaws):
+    """(F, 478, 3) landmarks of side-by-side synthetic heads, one per yaw."""
+    step = IMAGE_WIDTH / (len(yaws) + 1)
+    return np.stack([
+        synthetic_face_landmarks(synthetic_head_model(i), yaw, scale=min(step / 2, 150.0),
+                                 center=(step * (i + 1), IMAGE_HEIGHT / 2), image_width=IMAGE_WIDTH)
+        for i, yaw in enumerate(yaws)
+    ])
+
+
+@pytest.fixture
+def fake_detector(monkeypatch):
+    """
+    FaceMesh stand-in behind a fresh landmark cache: every image "contains"
+    detector.faces (set with detector.use_yaws), and detector.calls counts
+    inference runs.
+    """
+    import landmark_cache
+    from landmarks import FaceLandmarksBatch
+
+    class FakeDetector:
+        calls = 0
+        faces = synthetic_faces(0.4)
+
+        def use_yaws(self, *yaws):
+            self.faces = synthetic_faces(*yaws)
+
+    detector = FakeDetector()
+
+    def detect_landmarks(image, landmark_sets=("face",), image_size=None, **kwargs):
+        detector.calls += 1
+        faces = FaceLandmarksBatch(detector.faces)
+        return {"face": faces[0], "faces": faces, "pose": [],
+                "image_size": tuple(image_size or image.shape[:2])}
+
+    monkeypatch.setattr(landmark_cache, "detect_landmarks", detect_landmarks)
+    monkeypatch.setattr(landmark_cache, "landmark_cache", landmark_cache.LandmarkCache())
+    return detector
+
+
+@pytest.fixture
+def reference_image(tmp_path):
+    path = tmp_path / "ref.png"
+    cv2.imwrite(str(path), np.full((IMAGE_HEIGHT, IMAGE_WIDTH, 3), 128, dtype=np.uint8))
+    return str(path)
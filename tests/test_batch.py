@@ -0,0 +1,28 @@
+import os
+
+from batch import collect_images
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "wb").close()
+
+
+def test_recursive_glob_keeps_subdirectories(tmp_path):
+    for rel in ("a/face.jpg", "b/face.jpg", "b/c/face.jpg", "notes.txt"):
+        touch(tmp_path / "references" / rel)
+
+    pairs = collect_images(str(tmp_path / "references" / "**" / "*.jpg"))
+
+    names = sorted(name for _, name in pairs)
+    assert names == [os.path.join("a", "face.jpg"), os.path.join("b", "c", "face.jpg"), os.path.join("b", "face.jpg")]
+
+
+def test_directory_and_flat_glob(tmp_path):
+    touch(tmp_path / "refs" / "one.png")
+    touch(tmp_path / "refs" / "sub" / "two.jpg")
+
+    assert sorted(name for _, name in collect_images(str(tmp_path / "refs"))) == [
+        "one.png", os.path.join("sub", "two.jpg"),
+    ]
+    assert [name for _, name in collect_images(str(tmp_path / "refs" / "*.png"))] == ["one.png"]
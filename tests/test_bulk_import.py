@@ -0,0 +1,33 @@
+import numpy as np
+
+import loomis_pipeline
+from bulk_import import embed_image
+from loomis_pipeline import run_tool_result
+from memory_backends import NumpyMemoryBackend
+from memory_store import memory_point_id
+from qdrant_setup import COLLECTION_NAME
+
+
+def test_every_face_is_embedded_from_one_detection(fake_detector, reference_image):
+    fake_detector.use_yaws(-0.3, 0.0, 0.4)
+
+    digest, vectors = embed_image(reference_image)
+
+    assert len(vectors) == 3
+    assert fake_detector.calls == 1
+    assert len({tuple(v) for v in vectors}) == 3
+
+
+def test_points_match_the_pipeline(fake_detector, reference_image, tmp_path, monkeypatch):
+    fake_detector.use_yaws(-0.3, 0.4)
+    client = NumpyMemoryBackend(save_interval=None)
+    monkeypatch.setattr(loomis_pipeline, "get_qdrant_client", lambda: client)
+
+    digest, vectors = embed_image(reference_image)
+    _, result = run_tool_result("apply_loomis", {"image_path": reference_image,
+                                                 "output_path": str(tmp_path / "out.png")})
+
+    assert result.memory_ids == [memory_point_id(digest, "reference", i) for i in range(2)]
+    stored = client.retrieve(COLLECTION_NAME, result.memory_ids, with_vectors=True)
+    for record, vector in zip(stored, vectors):
+        assert np.allclose(record.vector, vector / np.linalg.norm(vector), atol=1e-6)
@@ -0,0 +1,50 @@
+import pytest
+
+from command_router import CommandRouter, Route
+
+
+@pytest.fixture
+def router():
+    return CommandRouter()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Detect the face in 'my photos/ref.jpg'", Route("detect_face", {"paths": ["my photos/ref.jpg"]})),
+    ("please find all the faces in a.jpg, b.jpg and c.jpg.", Route("detect_face", {"paths": ["a.jpg", "b.jpg", "c.jpg"]})),
+    ("locate the head on \"into the wild/to do.png\"", Route("detect_face", {"paths": ["into the wild/to do.png"]})),
+    ("measure proportions of ref.jpg", Route("analyze_proportions", {"paths": ["ref.jpg"]})),
+    ("Give me a tutorial for ref.jpg", Route("explain_loomis_guidelines", {"paths": ["ref.jpg"]})),
+    ("explain the loomis guidelines for ref.jpg?", Route("explain_loomis_guidelines", {"paths": ["ref.jpg"]})),
+    ("get the guidelines for ref.jpg as SVG", Route("loomis_guidelines", {"paths": ["ref.jpg"], "format": "svg"})),
+    ("apply Loomis to in.jpg and save to out.jpg",
+     Route("apply_loomis", {"paths": ["in.jpg"], "output_path": "out.jpg"})),
+    ("apply loomis to 'refs/*.jpg' and save them to annotated",
+     Route("apply_loomis_batch", {"source": "refs/*.jpg", "output_dir": "annotated"})),
+    ("compact memory", Route("compact_memory", {})),
+    ("clear the session", Route("clear_session", {})),
+    ("metrics prometheus", Route("metrics", {"format": "prometheus"})),
+    ("show cache stats", Route("cache_stats", {})),
+])
+def test_routes(router, text, expected):
+    assert router.route(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "what is the loomis method?",
+    "detect the face",
+    "apply loomis to in.jpg",
+    "",
+])
+def test_unmatched_falls_back_to_llm(router, text):
+    assert router.route(text) is None
+
+
+def test_stats_count_fallbacks(router):
+    router.route("compact memory")
+    router.route("detect face in a.jpg")
+    router.route("hello there")
+
+    stats = router.stats()
+    assert stats["requests"] == 3
+    assert stats["llm_fallbacks"] == 1
+    assert stats["by_intent"] == {"compact_memory": 1, "detect_face": 1}
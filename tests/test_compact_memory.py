@@ -0,0 +1,58 @@
+import uuid
+
+from compact_memory import compact
+from memory_backends import NumpyMemoryBackend
+from memory_store import make_point, memory_point_id
+
+COLLECTION = "c"
+DIGEST = "ab" * 32
+
+
+def random_id():
+    return str(uuid.uuid4())
+
+
+def store_with_duplicates(tmp_path):
+    store = NumpyMemoryBackend(save_interval=None)
+    image = tmp_path / "a.jpg"
+    image.write_bytes(b"not really a jpeg")
+    points = [
+        # Three copies of one analysis, stored under random ids
+        *(make_point(random_id(), [1.0, 0.0, 0.0],
+                      {"type": "reference", "content_hash": DIGEST, "face_index": 0}) for _ in range(3)),
+        # Older copies without content_hash, hashed from the file
+        *(make_point(random_id(), [0.0, 1.0, 0.0], {"type": "reference", "image_path": str(image)})
+          for _ in range(2)),
+        # The image is gone: grouped by path and vector instead
+        *(make_point(random_id(), [0.0, 0.0, 1.0], {"type": "reference", "image_path": "gone.jpg"})
+          for _ in range(2)),
+        make_point(random_id(), [0.0, 0.5, 0.5], {"type": "reference", "image_path": "gone.jpg"}),
+    ]
+    store.upsert(COLLECTION, points)
+    return store
+
+
+def test_compact_keeps_one_point_per_image_at_its_content_id(tmp_path):
+    store = store_with_duplicates(tmp_path)
+    summary = compact(store, COLLECTION, batch_size=2)
+
+    assert summary == {"scanned": 8, "kept": 4, "rekeyed": 2, "deleted": 6, "unhashed": 2}
+    ids = {str(r.id) for r in store.scroll(COLLECTION, limit=100)[0]}
+    assert len(ids) == 4
+    assert memory_point_id(DIGEST, "reference", 0) in ids
+
+    # The file-hashed group now carries its content_hash
+    rekeyed = [r for r in store.retrieve(COLLECTION, list(ids)) if r.payload.get("image_path", "").endswith("a.jpg")]
+    assert len(rekeyed) == 1 and rekeyed[0].payload["content_hash"]
+
+    # A second pass finds nothing left to do
+    again = compact(store, COLLECTION)
+    assert again["deleted"] == again["rekeyed"] == 0
+
+
+def test_dry_run_changes_nothing(tmp_path):
+    store = store_with_duplicates(tmp_path)
+    before = {str(r.id) for r in store.scroll(COLLECTION, limit=100)[0]}
+
+    assert compact(store, COLLECTION, dry_run=True)["deleted"] == 6
+    assert {str(r.id) for r in store.scroll(COLLECTION, limit=100)[0]} == before
@@ -0,0 +1,56 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+
+from image_io import read_for_detection
+from pose_detection import detect_landmarks
+
+WIDTH, HEIGHT = 3000, 2000
+MARKER = (2100, 700)
+
+
+class MarkerMesh:
+    """FaceMesh stand-in that puts every landmark on the centre of the bright marker."""
+
+    def __init__(self):
+        self.shapes = []
+
+    def process(self, rgb):
+        self.shapes.append(rgb.shape[:2])
+        ys, xs = np.nonzero(rgb[:, :, 0] > 128)
+        height, width = rgb.shape[:2]
+        landmark = SimpleNamespace(x=(xs.mean() + 0.5) / width, y=(ys.mean() + 0.5) / height, z=0.0)
+        return SimpleNamespace(multi_face_landmarks=[SimpleNamespace(landmark=[landmark] * 478)])
+
+
+@pytest.fixture(params=[".jpg", ".png"])
+def large_image(request, tmp_path):
+    image = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+    x, y = MARKER
+    image[y - 40:y + 40, x - 40:x + 40] = 255
+    path = str(tmp_path / f"large{request.param}")
+    cv2.imwrite(path, image)
+    return path
+
+
+@pytest.mark.parametrize("max_side", [0, 1280, 640])
+def test_landmarks_map_back_to_full_resolution(large_image, max_side):
+    mesh = MarkerMesh()
+    data = detect_landmarks(large_image, display=False, face_mesh=mesh, max_side=max_side)
+
+    assert data["image_size"] == (HEIGHT, WIDTH)
+    assert max(mesh.shapes[0]) == (max_side or WIDTH)
+
+    x, y, _ = data["face"][0]
+    # One inference pixel is WIDTH / max_side full-resolution pixels
+    tolerance = 2 * WIDTH / (max_side or WIDTH)
+    assert abs(x - MARKER[0]) <= tolerance and abs(y - MARKER[1]) <= tolerance
+
+
+def test_read_for_detection_caps_the_longest_side(large_image):
+    image, size = read_for_detection(large_image, max_side=640)
+
+    assert size == (HEIGHT, WIDTH)
+    assert max(image.shape[:2]) == 640
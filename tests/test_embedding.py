@@ -0,0 +1,34 @@
+import numpy as np
+
+from embedding_utils import EMBEDDING_DIM, SHAPE_LANDMARKS, landmarks_to_embedding
+from head_pose import estimate_head_pose
+from landmarks import FaceLandmarks
+from synthetic_faces import synthetic_face_landmarks, synthetic_head_model
+
+
+def face(yaw=0.4, pitch=-0.1, roll=0.2, **placement):
+    return FaceLandmarks(synthetic_face_landmarks(synthetic_head_model(3), yaw, pitch, roll, **placement))
+
+
+def test_pose_part_is_the_head_pose_fit():
+    landmarks = face()
+    vector = np.array(landmarks_to_embedding(landmarks, image_width=640))
+    yaw, pitch, roll = estimate_head_pose(landmarks, 640)
+
+    assert len(vector) == EMBEDDING_DIM
+    expected = np.stack([np.sin([yaw, pitch, roll]), np.cos([yaw, pitch, roll])], axis=1).ravel()
+    assert np.allclose(vector[2 * len(SHAPE_LANDMARKS):], expected, atol=1e-6)
+
+
+def test_given_pose_is_used_as_is():
+    landmarks = face()
+    pose = estimate_head_pose(landmarks, 640)
+
+    assert landmarks_to_embedding(landmarks, pose=pose) == landmarks_to_embedding(landmarks, image_width=640)
+
+
+def test_invariant_to_scale_and_position():
+    near = np.array(landmarks_to_embedding(face(scale=300.0, center=(500.0, 400.0), image_width=1000), image_width=1000))
+    far = np.array(landmarks_to_embedding(face(scale=120.0, center=(200.0, 150.0), image_width=1000), image_width=1000))
+
+    assert np.dot(near, far) / (np.linalg.norm(near) * np.linalg.norm(far)) > 0.999
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from head_pose import (
+    _INDICES, _MODEL, direction_from_yaw, estimate_head_pose_batch, fit_rotation_batch, rotation_matrix,
+    rotation_to_angles,
+)
+from landmarks import FaceLandmarksBatch
+from synthetic_faces import synthetic_face_landmarks, synthetic_head_model
+
+POSES = [
+    (0.0, 0.0, 0.0),
+    (0.5, 0.0, 0.0),
+    (-0.7, 0.0, 0.0),
+    (0.0, 0.3, 0.0),
+    (0.0, -0.25, 0.0),
+    (0.0, 0.0, 0.4),
+    (0.4, -0.2, 0.15),
+    (-0.3, 0.25, -0.2),
+]
+
+
+def exact_faces(poses):
+    """Landmarks whose keypoints are the fitted model itself, rotated and projected."""
+    head = np.zeros((478, 3))
+    head[_INDICES] = _MODEL
+    return FaceLandmarksBatch(np.stack([
+        synthetic_face_landmarks(head, *pose) for pose in poses
+    ]))
+
+
+@pytest.mark.parametrize("image_width", [640, None])
+def test_recovers_known_rotations(image_width):
+    faces = exact_faces(POSES)
+    rotations = fit_rotation_batch(faces, image_width)
+
+    expected = np.stack([rotation_matrix(*pose) for pose in POSES])
+    # Pixel x and y are truncated, which costs a little under a degree
+    assert np.abs(rotations - expected).max() < 0.02
+    assert np.allclose(np.linalg.det(rotations), 1.0)
+    assert np.allclose(rotations @ rotations.transpose(0, 2, 1), np.eye(3), atol=1e-6)
+
+
+def test_rotation_to_angles_inverts_rotation_matrix():
+    rotations = np.stack([rotation_matrix(*pose) for pose in POSES])
+    assert np.allclose(rotation_to_angles(rotations), POSES)
+
+
+def test_positive_yaw_moves_the_nose_right():
+    nose = np.array([0.0, 0.0, -1.0])
+    assert (rotation_matrix(0.3, 0.0, 0.0) @ nose)[0] > 0
+    assert (rotation_matrix(0.0, 0.3, 0.0) @ nose)[1] > 0
+
+
+def test_angles_on_independent_synthetic_heads():
+    rng = np.random.default_rng(0)
+    poses = rng.uniform(-0.5, 0.5, size=(64, 3))
+    faces = FaceLandmarksBatch(np.stack([
+        synthetic_face_landmarks(synthetic_head_model(i), *pose) for i, pose in enumerate(poses)
+    ]))
+
+    error = np.degrees(estimate_head_pose_batch(faces, 640) - poses)
+    assert np.abs(error.mean(axis=0)).max() < 2.0
+    assert np.abs(error).mean(axis=0).max() < 4.0
+
+
+def test_empty_batch():
+    assert fit_rotation_batch(FaceLandmarksBatch(np.zeros((0, 478, 3), dtype=np.float32))).shape == (0, 3, 3)
+
+
+def test_direction_is_the_sign_of_yaw():
+    assert direction_from_yaw([-0.3, 0.0, 0.3]) == ["right", "left", "left"]
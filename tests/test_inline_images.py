@@ -0,0 +1,72 @@
+import base64
+import json
+
+import cv2
+import numpy as np
+import pytest
+
+import loomis_pipeline
+from loomis_pipeline import landmarks_json, run_tool_result
+from memory_backends import NumpyMemoryBackend
+from qdrant_setup import COLLECTION_NAME
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    client = NumpyMemoryBackend(save_interval=None)
+    monkeypatch.setattr(loomis_pipeline, "get_qdrant_client", lambda: client)
+    return client
+
+
+@pytest.fixture
+def image_base64(reference_image):
+    with open(reference_image, "rb") as f:
+        return base64.b64encode(f.read()).decode("ascii")
+
+
+@pytest.mark.parametrize("prefix", ["", "data:image/png;base64,"])
+def test_detect_from_base64_without_a_file(fake_detector, image_base64, prefix):
+    text, result = run_tool_result("detect_face", {"image_base64": prefix + image_base64})
+
+    assert result.ok, result.error
+    assert text.startswith("Face detected!")
+    assert result.image_size == (480, 640)
+
+
+@pytest.mark.parametrize("image_format, magic", [("png", b"\x89PNG"), ("jpeg", b"\xff\xd8"), ("webp", b"RIFF")])
+def test_apply_loomis_returns_the_image_inline(fake_detector, image_base64, memory, image_format, magic):
+    text, result = run_tool_result("apply_loomis", {"image_base64": image_base64, "image_format": image_format,
+                                                    "image_path": "label.png"})
+
+    assert result.output_path is None
+    data = bytes(result.annotated_image)
+    assert data.startswith(magic)
+    assert f"returned inline as {image_format} ({len(data)} bytes)" in text
+
+    annotated = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    assert annotated.shape == (480, 640, 3)
+    # The construction was drawn over the flat grey input
+    assert (annotated != 128).any()
+
+    # The path only labels the stored memory
+    stored = memory.scroll(COLLECTION_NAME, limit=10)[0]
+    assert [r.payload["image_path"] for r in stored] == ["label.png"]
+
+
+def test_default_inline_format_is_png(fake_detector, image_base64, memory):
+    _, result = run_tool_result("apply_loomis", {"image_base64": image_base64})
+    assert bytes(result.annotated_image[:4]) == b"\x89PNG"
+
+
+def test_landmarks_json(fake_detector, image_base64):
+    fake_detector.use_yaws(-0.2, 0.3)
+    _, result = run_tool_result("detect_face", {"image_base64": image_base64})
+
+    data = json.loads(landmarks_json(result))
+    assert (data["width"], data["height"]) == (640, 480)
+    assert np.allclose(data["faces"], fake_detector.faces, atol=0.01)
+
+
+def test_invalid_base64_is_rejected(fake_detector):
+    with pytest.raises(ValueError, match="Invalid base64"):
+        run_tool_result("detect_face", {"image_base64": "not base64!"})
@@ -0,0 +1,84 @@
+import pytest
+
+import drawing_instructor_agent
+from drawing_instructor_agent import (
+    FakeInstructorLLM, RADIUS_BUCKET, response_key, stream_drawing_instructions,
+)
+from response_cache import ResponseCache
+
+PROPORTIONS = {"ratio": 0.8}
+
+
+class CountingLLM(FakeInstructorLLM):
+    def __init__(self):
+        super().__init__(token_delay=0)
+        self.calls = 0
+
+    def stream(self, prompt):
+        self.calls += 1
+        yield from super().stream(prompt)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    llm = CountingLLM()
+    monkeypatch.setattr(drawing_instructor_agent, "_instructor_llm", llm)
+    return llm
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(max_entries=8, cache_dir=None, ttl=0)
+
+
+def stream(cache, radius=110.0, direction="left", center=(320, 240), notes=""):
+    return stream_drawing_instructions(direction, radius, center, PROPORTIONS, notes, cache=cache)
+
+
+def test_fake_llm_streams_in_chunks(llm, cache):
+    chunks = list(stream(cache))
+
+    assert len(chunks) > 1
+    assert "".join(chunks).startswith("Loomis tutorial (fake instructor)")
+    assert llm.calls == 1
+
+
+def test_same_bucket_is_a_cache_hit(llm, cache):
+    first = "".join(stream(cache, radius=110.0, center=(320, 240), notes="a"))
+    # Same direction and radius bucket; center and notes are not part of the key
+    second = list(stream(cache, radius=115.0, center=(10, 20), notes="b"))
+
+    assert second == [first]
+    assert llm.calls == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_other_bucket_or_direction_is_a_miss(llm, cache):
+    list(stream(cache, radius=110.0))
+    list(stream(cache, radius=110.0 + RADIUS_BUCKET))
+    list(stream(cache, radius=110.0, direction="right"))
+
+    assert llm.calls == 3
+    assert cache.stats()["hits"] == 0
+
+
+def test_interrupted_stream_is_not_cached(llm, cache):
+    chunks = stream(cache)
+    next(chunks)
+    chunks.close()
+
+    key = response_key("left", 110.0, PROPORTIONS, llm.model)
+    assert cache.get(key) is None
+
+    full = "".join(stream(cache))
+    assert llm.calls == 2
+    assert cache.get(key) == full
+
+
+def test_disk_tier_survives_a_new_cache(llm, tmp_path):
+    first = "".join(stream(ResponseCache(cache_dir=str(tmp_path), ttl=0)))
+
+    reopened = ResponseCache(cache_dir=str(tmp_path), ttl=0)
+    assert list(stream(reopened)) == [first]
+    assert reopened.stats()["disk_hits"] == 1
+    assert llm.calls == 1
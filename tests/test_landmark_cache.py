@@ -0,0 +1,81 @@
+import cv2
+import numpy as np
+import pytest
+
+import landmark_cache
+from landmark_cache import LandmarkCache, get_landmarks
+from landmarks import FaceLandmarksBatch
+
+
+@pytest.fixture
+def detections(monkeypatch):
+    """Replace FaceMesh with a stand-in that counts how often it runs."""
+    calls = []
+
+    def detect_landmarks(image, landmark_sets=("face",), image_size=None, **kwargs):
+        calls.append(image.shape)
+        faces = FaceLandmarksBatch(np.full((1, 478, 3), len(calls), dtype=np.float32))
+        return {"face": faces[0], "faces": faces, "pose": [], "image_size": image_size}
+
+    monkeypatch.setattr(landmark_cache, "detect_landmarks", detect_landmarks)
+    return calls
+
+
+def write_image(path, value=0):
+    image = np.full((120, 160, 3), value, dtype=np.uint8)
+    cv2.imwrite(str(path), image)
+    return str(path)
+
+
+def test_memory_hit_skips_detection(tmp_path, detections):
+    cache = LandmarkCache(max_entries=4)
+    path = write_image(tmp_path / "ref.png")
+
+    first = get_landmarks(path, cache=cache)
+    second = get_landmarks(path, cache=cache)
+
+    assert len(detections) == 1
+    assert np.array_equal(first["faces"].points, second["faces"].points)
+    assert second["image_size"] == (120, 160)
+    assert cache.stats()["hits"] == 1
+
+
+def test_disk_tier_is_shared_between_caches(tmp_path, detections):
+    path = write_image(tmp_path / "ref.png")
+    cache_dir = str(tmp_path / "cache")
+
+    first = get_landmarks(path, cache=LandmarkCache(cache_dir=cache_dir))
+    reopened = LandmarkCache(cache_dir=cache_dir)
+    second = get_landmarks(path, cache=reopened)
+
+    assert len(detections) == 1
+    assert reopened.stats()["disk_hits"] == 1
+    assert first["digest"] == second["digest"]
+    assert np.array_equal(first["faces"].points, second["faces"].points)
+
+
+def test_changed_bytes_change_the_digest(tmp_path, detections):
+    cache = LandmarkCache(max_entries=4)
+    path = write_image(tmp_path / "ref.png", value=0)
+    first = get_landmarks(path, cache=cache)
+
+    # Same path, new content: the key is the content hash, not the path
+    write_image(tmp_path / "ref.png", value=255)
+    second = get_landmarks(path, cache=cache)
+
+    assert len(detections) == 2
+    assert first["digest"] != second["digest"]
+    assert not np.array_equal(first["faces"].points, second["faces"].points)
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path, detections):
+    cache = LandmarkCache(max_entries=1)
+    a = write_image(tmp_path / "a.png", value=10)
+    b = write_image(tmp_path / "b.png", value=20)
+
+    get_landmarks(a, cache=cache)
+    get_landmarks(b, cache=cache)
+    get_landmarks(a, cache=cache)
+
+    assert len(detections) == 3
+    assert cache.stats()["evictions"] == 2
@@ -0,0 +1,136 @@
+import inspect
+
+import numpy as np
+import pytest
+from qdrant_client.models import (
+    FieldCondition, Filter, IsEmptyCondition, MatchAny, MatchValue, PayloadField,
+)
+
+from memory_backends import MemoryBackend, NumpyMemoryBackend
+from memory_retriever import memory_filter, retrieve_similar, retrieve_similar_batch
+from memory_store import make_point
+
+
+def vector(*values):
+    return list(values) + [0.0] * (4 - len(values))
+
+
+def test_interface_matches_query_points_api():
+    assert not hasattr(MemoryBackend, "search")
+    params = inspect.signature(MemoryBackend.query_points).parameters
+    assert list(params)[1:3] == ["collection_name", "query"]
+
+
+def test_payload_change_on_a_loaded_index_saves_without_the_map(tmp_path):
+    path = str(tmp_path / "index")
+    store = NumpyMemoryBackend(path, save_interval=None)
+    store.upsert("c", [make_point("a", vector(1.0), {"type": "reference"})])
+    store.close()
+
+    loaded = NumpyMemoryBackend(path, save_interval=None)
+    loaded.retrieve("c", ["a"])
+    assert isinstance(loaded._collections["c"]._vectors, np.memmap)
+
+    loaded.set_payload("c", {"type": "construction"}, ["a"])
+    loaded.close()
+    # The map is released before vectors.npy is replaced
+    assert not isinstance(loaded._collections["c"]._vectors, np.memmap)
+
+    reloaded = NumpyMemoryBackend(path)
+    record = reloaded.retrieve("c", ["a"], with_vectors=True)[0]
+    assert record.payload == {"type": "construction"}
+    assert np.allclose(record.vector, vector(1.0))
+
+
+TYPES = ("reference", "user_drawing", "construction")
+DIM = 8
+
+
+def populated(path=None, n=300, indexed=True, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    payloads = [{"type": TYPES[i % 3], "image_path": f"img{i % 7}.jpg"} for i in range(n)]
+    for i in range(0, n, 5):
+        payloads[i]["prototype"] = f"p{i % 4}"
+
+    store = NumpyMemoryBackend(path, save_interval=None)
+    if indexed:
+        for field_name in ("type", "image_path"):
+            store.create_payload_index("c", field_name)
+    store.upsert("c", [make_point(str(i), v, p) for i, (v, p) in enumerate(zip(vectors, payloads))])
+    return store, vectors, payloads
+
+
+def brute_force(vectors, payloads, query, keep, limit=5):
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = unit @ (query / np.linalg.norm(query))
+    rows = [i for i in np.argsort(-scores) if keep(payloads[i])]
+    return [str(i) for i in rows[:limit]]
+
+
+FILTERS = [
+    (memory_filter("reference"), lambda p: p["type"] == "reference"),
+    (memory_filter("user_drawing", "img3.jpg"), lambda p: p["type"] == "user_drawing" and p["image_path"] == "img3.jpg"),
+    (Filter(must=[FieldCondition(key="type", match=MatchAny(any=["reference", "construction"]))]),
+     lambda p: p["type"] != "user_drawing"),
+    (Filter(must_not=[FieldCondition(key="image_path", match=MatchValue(value="img0.jpg"))]),
+     lambda p: p["image_path"] != "img0.jpg"),
+    (Filter(should=[FieldCondition(key="prototype", match=MatchValue(value="p1")),
+                    IsEmptyCondition(is_empty=PayloadField(key="prototype"))]),
+     lambda p: p.get("prototype") in ("p1", None)),
+]
+
+
+@pytest.mark.parametrize("indexed", [True, False])
+@pytest.mark.parametrize("query_filter, keep", FILTERS)
+def test_filtered_search_matches_brute_force(query_filter, keep, indexed):
+    store, vectors, payloads = populated(indexed=indexed)
+    query = np.random.default_rng(1).normal(size=DIM)
+
+    hits = store.query_points("c", query.tolist(), limit=5, query_filter=query_filter).points
+
+    assert [h.id for h in hits] == brute_force(vectors, payloads, query, keep)
+    assert all(keep(h.payload) for h in hits)
+
+
+def test_batch_search_matches_single_queries():
+    store, _, _ = populated()
+    queries = np.random.default_rng(2).normal(size=(6, DIM))
+
+    batched = retrieve_similar_batch(store, queries, limit=4, memory_type="reference", collection_name="c")
+    single = [retrieve_similar(store, q, limit=4, memory_type="reference", collection_name="c", probes=0)
+              for q in queries]
+
+    assert [[h.id for h in hits] for hits in batched] == [[h.id for h in hits] for hits in single]
+    assert retrieve_similar_batch(store, [], collection_name="c") == []
+
+
+def test_save_and_load_keep_points_payloads_and_indexes(tmp_path):
+    path = str(tmp_path / "index")
+    store, vectors, payloads = populated(path)
+    store.delete("c", ["0", "1"])
+    store.close()
+
+    loaded = NumpyMemoryBackend(path)
+    loaded.create_payload_index("c", "type")
+    query = np.random.default_rng(3).normal(size=DIM)
+
+    assert loaded.count("c").count == len(vectors) - 2
+    hits = loaded.query_points("c", query.tolist(), limit=5, query_filter=memory_filter("construction")).points
+    keep = lambda p: p["type"] == "construction"
+    expected = [i for i in brute_force(vectors, payloads, query, keep, limit=10) if i not in ("0", "1")][:5]
+    assert [h.id for h in hits] == expected
+
+
+def test_writes_are_saved_on_the_interval(tmp_path):
+    path = str(tmp_path / "index")
+    store = NumpyMemoryBackend(path, save_interval=0)
+    store.upsert("c", [make_point("a", vector(1.0), {})])
+
+    assert NumpyMemoryBackend(path).count("c").count == 1
+
+    lazy = NumpyMemoryBackend(str(tmp_path / "lazy"), save_interval=None)
+    lazy.upsert("c", [make_point("a", vector(1.0), {})])
+    assert NumpyMemoryBackend(str(tmp_path / "lazy")).count("c").count == 0
+    lazy.flush()
+    assert NumpyMemoryBackend(str(tmp_path / "lazy")).count("c").count == 1
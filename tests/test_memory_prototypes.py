@@ -0,0 +1,156 @@
+import numpy as np
+
+from memory_backends import NumpyMemoryBackend
+from memory_prototypes import MiniBatchKMeans, apply_retention, build_prototypes, compact
+from memory_retriever import retrieve_similar
+from memory_store import make_point
+from qdrant_setup import prototype_collection_name
+
+COLLECTION = "c"
+DIM = 8
+
+
+def cluster_vectors(rng, centre, n, spread=0.05):
+    return centre + spread * rng.normal(size=(n, DIM))
+
+
+def clustered_store(per_cluster=30, clusters=3, types=("reference", "construction"), seed=0):
+    """A store whose points sit around clusters orthogonal directions per type."""
+    rng = np.random.default_rng(seed)
+    store = NumpyMemoryBackend(save_interval=None)
+    points = []
+    for point_type in types:
+        for c in range(clusters):
+            centre = np.eye(DIM)[c]
+            for i, v in enumerate(cluster_vectors(rng, centre, per_cluster)):
+                points.append(make_point(f"{point_type}-{c}-{i}", v.tolist(),
+                                         {"type": point_type, "image_path": f"{c}-{i}.jpg"}))
+    store.upsert(COLLECTION, points)
+    return store
+
+
+def all_records(store, collection=COLLECTION):
+    return store.scroll(collection, limit=10_000, with_vectors=True)[0]
+
+
+def test_kmeans_finds_separated_clusters():
+    rng = np.random.default_rng(1)
+    centres = np.eye(DIM)[:3]
+    vectors = np.concatenate([cluster_vectors(rng, c, 50) for c in centres])
+    rng.shuffle(vectors)
+
+    model = MiniBatchKMeans(3, seed=0)
+    for batch in np.array_split(vectors, 5):
+        model.partial_fit(batch)
+
+    # Each true centre has a fitted centre pointing the same way
+    assert np.all((centres @ model.centers.T).max(axis=1) > 0.99)
+    assert model.counts.sum() == len(vectors)
+
+
+def test_kmeans_with_fewer_points_than_k_keeps_one_centre_per_point():
+    model = MiniBatchKMeans(8)
+    model.partial_fit(np.eye(DIM)[:3])
+    assert model.centers is None
+
+    model.finish()
+    assert len(model.centers) == 3
+
+
+def test_build_prototypes_tags_every_member():
+    store = clustered_store()
+    summary = build_prototypes(store, COLLECTION, prototypes=3, batch_size=16)
+
+    assert summary["points"] == 180
+    assert summary["by_type"]["reference"] == {"points": 90, "prototypes": 3}
+
+    prototypes = {str(r.id): r.payload for r in all_records(store, prototype_collection_name(COLLECTION))}
+    assert len(prototypes) == summary["prototypes"] == 6
+
+    members = {}
+    for record in all_records(store):
+        pid = record.payload["prototype"]
+        assert prototypes[pid]["type"] == record.payload["type"]
+        members.setdefault(pid, set()).add(record.id.rsplit("-", 1)[0])
+    # Each prototype gathers exactly one cluster, with its member count
+    assert all(len(clusters) == 1 for clusters in members.values())
+    for pid, payload in prototypes.items():
+        assert payload["member_count"] == 30
+        assert payload["representative_id"].startswith(next(iter(members[pid])))
+
+
+def test_rebuild_with_fewer_prototypes_removes_stale_ones():
+    store = clustered_store(types=("reference",))
+    build_prototypes(store, COLLECTION, prototypes=3)
+    summary = build_prototypes(store, COLLECTION, prototypes=1)
+
+    assert summary["stale_prototypes_removed"] == 2
+    prototypes = all_records(store, prototype_collection_name(COLLECTION))
+    assert len(prototypes) == 1
+    assert {r.payload["prototype"] for r in all_records(store)} == {str(prototypes[0].id)}
+
+
+def test_probed_search_stays_in_the_nearest_cluster_and_finds_new_points():
+    store = clustered_store(types=("reference",))
+    build_prototypes(store, COLLECTION, prototypes=3)
+    # Stored after the build, so it has no prototype yet
+    store.upsert(COLLECTION, [make_point("new", np.eye(DIM)[2].tolist(), {"type": "reference"})])
+
+    query = np.eye(DIM)[0] + 0.5 * np.eye(DIM)[2]
+    hits = retrieve_similar(store, query, limit=100, collection_name=COLLECTION, probes=1)
+    ids = {str(hit.id) for hit in hits}
+
+    assert "new" in ids
+    assert ids - {"new"} == {f"reference-0-{i}" for i in range(30)}
+
+    everything = retrieve_similar(store, query, limit=100, collection_name=COLLECTION, probes=0)
+    assert len(everything) == 91
+
+
+def aged_store(now):
+    store = NumpyMemoryBackend(save_interval=None)
+    points = [
+        make_point(f"{point_type}-{age}", [1.0] + [0.0] * (DIM - 1),
+                   {"type": point_type, "created_at": now - age})
+        for point_type in ("reference", "construction")
+        for age in (10, 20, 30, 400)
+    ]
+    points.append(make_point("legacy", [1.0] + [0.0] * (DIM - 1), {"type": "reference"}))
+    store.upsert(COLLECTION, points)
+    return store
+
+
+def test_retention_expires_by_ttl_but_keeps_points_without_created_at():
+    now = 1_000_000.0
+    store = aged_store(now)
+
+    assert apply_retention(store, COLLECTION, ttl=100, now=now) == {"expired": 2, "trimmed": 0}
+    ids = {str(r.id) for r in all_records(store)}
+    assert "reference-400" not in ids and "construction-400" not in ids
+    assert "legacy" in ids
+
+
+def test_retention_cap_keeps_the_newest_per_type():
+    now = 1_000_000.0
+    store = aged_store(now)
+
+    assert apply_retention(store, COLLECTION, max_per_type=2, now=now) == {"expired": 0, "trimmed": 5}
+    # Points without created_at count as the oldest
+    assert {str(r.id) for r in all_records(store)} == {
+        "reference-10", "reference-20", "construction-10", "construction-20",
+    }
+
+
+def test_retention_without_a_policy_deletes_nothing():
+    store = aged_store(1_000_000.0)
+    assert apply_retention(store, COLLECTION, ttl=0, max_per_type=0) == {"expired": 0, "trimmed": 0}
+    assert store.count(COLLECTION).count == 9
+
+
+def test_compact_builds_prototypes_over_what_retention_keeps():
+    store = clustered_store(types=("reference",))
+    summary = compact(store, COLLECTION, max_per_type=45, prototypes=3)
+
+    assert summary["retention"]["trimmed"] == 45
+    assert summary["prototypes"]["points"] == 45
+    assert all("prototype" in r.payload for r in all_records(store))
@@ -0,0 +1,92 @@
+from memory_backends import NumpyMemoryBackend
+from memory_store import close_writers, get_writer, memory_point_id, store_in_qdrant
+from qdrant_setup import COLLECTION_NAME
+from embedding_utils import EMBEDDING_DIM
+
+DIGEST = "ab" * 32
+
+
+def test_point_id_is_deterministic():
+    assert memory_point_id(DIGEST, "reference", 0) == memory_point_id(DIGEST, "reference", 0)
+    assert memory_point_id(DIGEST, "reference") == memory_point_id(DIGEST, "reference", 0)
+
+
+def test_point_id_differs_by_type_face_and_content():
+    ids = {
+        memory_point_id(DIGEST, "reference", 0),
+        memory_point_id(DIGEST, "reference", 1),
+        memory_point_id(DIGEST, "construction", 0),
+        memory_point_id("cd" * 32, "reference", 0),
+    }
+    assert len(ids) == 4
+
+
+def test_storing_the_same_image_twice_keeps_one_point():
+    client = NumpyMemoryBackend(save_interval=None)
+    vector = [0.1] * EMBEDDING_DIM
+    point_id = memory_point_id(DIGEST, "reference", 0)
+
+    for created_at in (1.0, 2.0):
+        payload = {"type": "reference", "content_hash": DIGEST, "face_index": 0, "created_at": created_at}
+        assert store_in_qdrant(client, vector, payload, buffered=False, point_id=point_id) == point_id
+
+    assert client.count(COLLECTION_NAME).count == 1
+    # The unchanged payload was not rewritten, so the first created_at stays
+    stored = client.retrieve(COLLECTION_NAME, [point_id])[0]
+    assert stored.payload["created_at"] == 1.0
+
+
+def test_changed_payload_updates_in_place():
+    client = NumpyMemoryBackend(save_interval=None)
+    point_id = memory_point_id(DIGEST, "reference", 0)
+
+    store_in_qdrant(client, [0.1] * EMBEDDING_DIM, {"type": "reference", "image_path": "a.jpg"},
+                    buffered=False, point_id=point_id)
+    store_in_qdrant(client, [0.2] * EMBEDDING_DIM, {"type": "reference", "image_path": "b.jpg"},
+                    buffered=False, point_id=point_id)
+
+    assert client.count(COLLECTION_NAME).count == 1
+    assert client.retrieve(COLLECTION_NAME, [point_id])[0].payload["image_path"] == "b.jpg"
+
+
+class CountingBackend(NumpyMemoryBackend):
+    def __init__(self):
+        super().__init__(save_interval=None)
+        self.retrieves = []
+        self.upserts = []
+
+    def retrieve(self, collection_name, ids, **kwargs):
+        self.retrieves.append(list(ids))
+        return super().retrieve(collection_name, ids, **kwargs)
+
+    def upsert(self, collection_name, points, **kwargs):
+        self.upserts.append([point.id for point in points])
+        return super().upsert(collection_name, points, **kwargs)
+
+
+def test_buffered_store_checks_existence_once_per_flush():
+    client = CountingBackend()
+    # A long interval keeps the whole run in one batch until flush()
+    writer = get_writer(client, flush_interval=60)
+    ids = [memory_point_id(DIGEST, "reference", face) for face in range(3)]
+
+    def store_all(created_at):
+        calls = (len(client.retrieves), len(client.upserts))
+        for face, point_id in enumerate(ids):
+            payload = {"type": "reference", "content_hash": DIGEST, "face_index": face, "created_at": created_at}
+            store_in_qdrant(client, [0.1] * EMBEDDING_DIM, payload, buffered=True, point_id=point_id)
+        # Nothing touches the backend on the request path
+        assert (len(client.retrieves), len(client.upserts)) == calls
+        writer.flush()
+
+    store_all(1.0)
+    assert client.retrieves == [ids]
+    assert client.upserts == [ids]
+
+    store_all(2.0)
+    assert client.retrieves == [ids, ids]
+    assert client.upserts == [ids]
+    assert client.count(COLLECTION_NAME).count == 3
+    assert client.retrieve(COLLECTION_NAME, [ids[0]])[0].payload["created_at"] == 1.0
+    assert writer.metrics()["points_unchanged"] == 3
+    close_writers()
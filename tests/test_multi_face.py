@@ -0,0 +1,54 @@
+import numpy as np
+
+from geometry_utils import calculate_head_dimensions, calculate_head_dimensions_batch, compute_face_turn_angle
+from head_pose import direction_from_yaw, estimate_head_pose, estimate_head_pose_batch
+from landmarks import FaceLandmarksBatch
+from loomis_pipeline import run_tool_result
+from render_steps import build_display_list, build_display_list_batch
+
+WIDTH = 640
+YAWS = (-0.5, 0.02, 0.35)
+
+
+def batch(fake_detector):
+    fake_detector.use_yaws(*YAWS)
+    return FaceLandmarksBatch(fake_detector.faces)
+
+
+def test_batch_geometry_matches_each_face(fake_detector):
+    faces = batch(fake_detector)
+    radii, centers, skull_tops = calculate_head_dimensions_batch(faces)
+    poses = estimate_head_pose_batch(faces, WIDTH)
+
+    for i, face in enumerate(faces):
+        radius, center, skull_top = calculate_head_dimensions(face)
+        assert (radii[i], tuple(centers[i]), tuple(skull_tops[i])) == (radius, center, skull_top)
+        assert np.allclose(poses[i], estimate_head_pose(face, WIDTH))
+
+
+def test_batch_display_list_is_each_face_in_turn(fake_detector):
+    faces = batch(fake_detector)
+    radii, centers, _ = calculate_head_dimensions_batch(faces)
+    directions = [compute_face_turn_angle(face, WIDTH) for face in faces]
+
+    combined = build_display_list_batch(radii, centers, directions, faces, image_width=WIDTH)
+
+    expected = []
+    for i, face in enumerate(faces):
+        expected += [{**p, "face": i} for p in build_display_list(centers[i], radii[i], directions[i], face,
+                                                                  image_width=WIDTH)]
+    assert combined == expected
+    # The near-frontal middle face has no side plane; the turned ones do
+    assert [sum(p["step"] == "side_plane" for p in combined if p["face"] == i) for i in range(3)] == [1, 0, 1]
+
+
+def test_pipeline_reports_every_face(fake_detector, reference_image):
+    faces = batch(fake_detector)
+    text, result = run_tool_result("detect_face", {"image_path": reference_image})
+
+    assert text.splitlines()[0] == "3 faces detected!"
+    yaws = estimate_head_pose_batch(faces, WIDTH)[:, 0]
+    assert [g.direction for g in result.geometries] == direction_from_yaw(yaws)
+    assert [g.direction for g in result.geometries][::2] == ["right", "left"]
+    assert [g.radius for g in result.geometries] == calculate_head_dimensions_batch(faces)[0].tolist()
+    assert np.allclose([g.yaw for g in result.geometries], np.degrees(yaws))
@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+import loomis_pipeline
+from loomis_pipeline import run_tool_result
+from memory_backends import NumpyMemoryBackend
+from qdrant_setup import COLLECTION_NAME
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    client = NumpyMemoryBackend(save_interval=None)
+    monkeypatch.setattr(loomis_pipeline, "get_qdrant_client", lambda: client)
+    return client
+
+
+def test_apply_loomis_stores_memory(fake_detector, reference_image, tmp_path, memory):
+    output = str(tmp_path / "out.png")
+    text, result = run_tool_result("apply_loomis", {"image_path": reference_image, "output_path": output})
+
+    assert result.ok and os.path.exists(output)
+    assert text == f"Loomis construction saved to {output}"
+    assert memory.count(COLLECTION_NAME).count == 1
+    assert not result.warnings
+
+
+def test_unreachable_memory_is_a_warning(fake_detector, reference_image, tmp_path, monkeypatch):
+    def unreachable():
+        raise ConnectionError("Qdrant server not reachable")
+
+    monkeypatch.setattr(loomis_pipeline, "get_qdrant_client", unreachable)
+    output = str(tmp_path / "out.png")
+    text, result = run_tool_result("apply_loomis", {"image_path": reference_image, "output_path": output})
+
+    assert result.ok and os.path.exists(output)
+    assert result.memory_ids == []
+    assert text.splitlines() == [f"Loomis construction saved to {output}",
+                                 "Warning: Visual memory unavailable: Qdrant server not reachable"]
+
+
+def test_failed_store_is_a_warning(fake_detector, reference_image, tmp_path, memory, monkeypatch):
+    def refuse(*args, **kwargs):
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(memory, "upsert", refuse)
+    output = str(tmp_path / "out.png")
+    text, result = run_tool_result("apply_loomis", {"image_path": reference_image, "output_path": output})
+
+    assert result.ok and os.path.exists(output)
+    assert "Warning: Memory not stored: connection reset" in text
@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pytest
+
+from geometry_utils import calculate_head_dimensions, compute_face_turn_angle
+from landmarks import FaceLandmarks
+from render_steps import (
+    build_display_list, construct_brow_line, construct_chin_line, construct_ellipse_vertical_line,
+    construct_jaw_line, construct_loomis_sphere, construct_nose_line, construct_outer_face_line,
+    construct_vertical_line, display_list_to_json, display_list_to_svg, rasterize_display_list,
+)
+from synthetic_faces import synthetic_face_landmarks, synthetic_head_model
+
+WIDTH, HEIGHT = 640, 480
+
+
+def face(yaw):
+    return FaceLandmarks(synthetic_face_landmarks(synthetic_head_model(0), yaw=yaw, pitch=0.1, image_width=WIDTH))
+
+
+def construct_steps(image, center, radius, direction, landmarks):
+    """The eight construct_* steps, in the order the display list records them."""
+    image = construct_loomis_sphere(image, center, radius, direction, landmarks, image_width=WIDTH)
+    image = construct_vertical_line(image, landmarks)
+    image = construct_brow_line(image, landmarks)
+    image = construct_nose_line(image, landmarks)
+    image = construct_chin_line(image, landmarks)
+    image = construct_ellipse_vertical_line(image, center, radius, direction, landmarks, image_width=WIDTH)
+    image = construct_jaw_line(image, landmarks)
+    return construct_outer_face_line(image, landmarks, direction)
+
+
+@pytest.mark.parametrize("yaw", [-0.6, -0.2, 0.0, 0.3, 0.7])
+def test_display_list_draws_the_same_pixels_as_the_steps(yaw):
+    landmarks = face(yaw)
+    radius, center, _ = calculate_head_dimensions(landmarks)
+    direction = compute_face_turn_angle(landmarks, WIDTH)
+
+    expected = construct_steps(np.zeros((HEIGHT, WIDTH, 3), np.uint8), center, radius, direction, landmarks)
+    display_list = build_display_list(center, radius, direction, landmarks, image_width=WIDTH)
+    actual = rasterize_display_list(np.zeros((HEIGHT, WIDTH, 3), np.uint8), display_list)
+
+    assert expected.any()
+    assert np.array_equal(actual, expected)
+
+
+def test_frontal_face_has_no_side_plane():
+    landmarks = face(0.0)
+    radius, center, _ = calculate_head_dimensions(landmarks)
+    steps = [p["step"] for p in build_display_list(center, radius, "left", landmarks, image_width=WIDTH)]
+
+    assert "side_plane" not in steps and "ellipse_vertical_line" not in steps
+    assert steps[0] == "loomis_sphere"
+
+
+def test_vector_outputs_hold_every_primitive():
+    landmarks = face(0.5)
+    radius, center, _ = calculate_head_dimensions(landmarks)
+    display_list = build_display_list(center, radius, "left", landmarks, image_width=WIDTH)
+
+    data = json.loads(display_list_to_json(display_list, WIDTH, HEIGHT))
+    assert (data["width"], data["height"]) == (WIDTH, HEIGHT)
+    assert len(data["primitives"]) == len(display_list)
+
+    svg = display_list_to_svg(display_list, WIDTH, HEIGHT)
+    assert svg.count("<line ") == sum(p["type"] == "line" for p in display_list)
+    assert svg.count("<circle ") == 1 and svg.count("<ellipse ") == 1
+    assert f'r="{radius}"' in svg
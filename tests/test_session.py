@@ -0,0 +1,81 @@
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+import loomis_pipeline
+from loomis_pipeline import run_tool_result
+from memory_backends import NumpyMemoryBackend
+from session import Session
+
+
+@pytest.fixture
+def memory(monkeypatch):
+    client = NumpyMemoryBackend(save_interval=None)
+    monkeypatch.setattr(loomis_pipeline, "get_qdrant_client", lambda: client)
+    return client
+
+
+def bump_mtime(path):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+
+def test_chained_commands_reuse_the_analysis(fake_detector, reference_image, tmp_path, memory, monkeypatch):
+    session = Session()
+    stores = []
+    monkeypatch.setattr(memory, "upsert", lambda *a, **kw: stores.append(kw))
+
+    run_tool_result("detect_face", {"image_path": reference_image}, session=session)
+    out = str(tmp_path / "out.png")
+    _, first = run_tool_result("apply_loomis", {"image_path": reference_image, "output_path": out}, session=session)
+    _, second = run_tool_result("apply_loomis", {"image_path": reference_image, "output_path": out}, session=session)
+
+    assert fake_detector.calls == 1
+    assert len(stores) == 1
+    assert second.memory_ids == first.memory_ids
+    assert session.stats()["hits"] == 2
+
+
+def test_new_mtime_invalidates_the_entry(fake_detector, reference_image):
+    session = Session()
+    first = session.entry(reference_image)
+    first.landmarks = {"faces": None}
+
+    assert session.entry(reference_image) is first
+    bump_mtime(reference_image)
+    second = session.entry(reference_image)
+
+    assert second is not first and second.landmarks is None
+    assert session.stats()["invalidations"] == 1
+
+
+def test_edited_file_is_analysed_again(fake_detector, reference_image):
+    session = Session()
+    run_tool_result("detect_face", {"image_path": reference_image}, session=session)
+
+    cv2.imwrite(reference_image, np.zeros((480, 640, 3), dtype=np.uint8))
+    bump_mtime(reference_image)
+    run_tool_result("detect_face", {"image_path": reference_image}, session=session)
+
+    # New mtime drops the session entry; new bytes miss the landmark cache
+    assert fake_detector.calls == 2
+    assert session.stats()["invalidations"] == 1
+
+
+def test_byte_budget_evicts_least_recently_used(tmp_path):
+    paths = []
+    for name in "abc":
+        path = tmp_path / f"{name}.png"
+        path.write_bytes(b"x")
+        paths.append(str(path))
+
+    session = Session(max_entries=8, max_bytes=2500)
+    for path in paths:
+        entry = session.entry(path)
+        entry.image = np.zeros(1000, dtype=np.uint8)
+        session.update(entry)
+
+    assert session.stats()["paths"] == [os.path.abspath(p) for p in paths[1:]]
+    assert session.stats()["evictions"] == 1
@@ -0,0 +1,174 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class TieredCache:
+    """
+    Two-tier LRU cache shared by the landmark and LLM response caches.
+
+    Entries live in an in-memory LRU tier of max_entries and, when cache_dir
+    is set, in an on-disk tier of one file per entry, capped at
+    max_disk_entries and evicted least recently used first. Entries older
+    than ttl seconds are treated as misses and dropped from both tiers; a
+    ttl of 0 keeps them until evicted.
+
+    Subclasses pick the file format through suffix, _read_file and
+    _write_file.
+    """
+
+    suffix = ""
+
+    def __init__(self, max_entries, cache_dir=None, max_disk_entries=4096, ttl=0):
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+
+        # key → (entry, created_at)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def _read_file(self, path, key):
+        """(entry, created_at) stored at path for key, or None if it holds another key."""
+        raise NotImplementedError
+
+    def _write_file(self, path, key, entry, created_at):
+        raise NotImplementedError
+
+    def _is_expired(self, created_at):
+        return bool(self.ttl) and created_at is not None and time.time() - created_at > self.ttl
+
+    def get(self, key):
+        """Return the cached entry for key, or None."""
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                entry, created_at = cached
+                if self._is_expired(created_at):
+                    # The disk copy has the same created_at, so skip it too
+                    del self._entries[key]
+                    self.expired += 1
+                    self.misses += 1
+                    return None
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        cached = self._load_from_disk(key)
+
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._insert(key, cached)
+            return cached[0]
+
+    def put(self, key, entry):
+        created_at = time.time()
+
+        with self._lock:
+            self._insert(key, (entry, created_at))
+
+        self._save_to_disk(key, entry, created_at)
+        return entry
+
+    def _insert(self, key, cached):
+        self._entries[key] = cached
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _load_from_disk(self, key):
+        if not self.cache_dir:
+            return None
+
+        path = self._disk_path(key)
+        try:
+            cached = self._read_file(path, key)
+        except (OSError, KeyError, ValueError):
+            return None
+        if cached is None:
+            return None
+
+        if self._is_expired(cached[1]):
+            with self._lock:
+                self.expired += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        # Touch the file so disk eviction follows access order
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return cached
+
+    def _save_to_disk(self, key, entry, created_at):
+        if not self.cache_dir:
+            return
+
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._write_file(tmp_path, key, entry, created_at)
+        os.replace(tmp_path, path)
+
+        self._evict_disk()
+
+    def _evict_disk(self):
+        files = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if name.endswith(self.suffix)
+        ]
+        excess = len(files) - self.max_disk_entries
+        if excess <= 0:
+            return
+
+        files.sort(key=lambda p: os.path.getmtime(p))
+        for path in files[:excess]:
+            try:
+                os.remove(path)
+                with self._lock:
+                    self.evictions += 1
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "cache_dir": self.cache_dir,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,277 @@
+"""
+Lightweight request-path tracing.
+
+    with span("detect.face_mesh"):
+        ...
+
+Every span records its duration into an in-process histogram named after it.
+export_json() and export_prometheus() snapshot all histograms. Set
+LOOMIS_TRACING=0 to turn spans into no-ops.
+
+profiled(name, mode) wraps one request in a profiler: "cprofile" writes a
+.prof file (open with snakeviz or pstats), "sample" runs a stack sampler on
+the calling thread and writes collapsed stacks for flamegraph.pl/speedscope.
+LOOMIS_PROFILE sets the default mode and LOOMIS_PROFILE_DIR the output
+directory.
+"""
+
+import bisect
+import functools
+import json
+import math
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+TRACING_ENABLED = os.getenv("LOOMIS_TRACING", "1") != "0"
+PROFILE_MODE = os.getenv("LOOMIS_PROFILE") or None
+PROFILE_DIR = os.getenv("LOOMIS_PROFILE_DIR", "profiles")
+PROFILE_MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = float(os.getenv("LOOMIS_PROFILE_INTERVAL", "0.005"))
+
+# Upper bounds in seconds, from 10µs (geometry, render steps) to 30s (LLM calls)
+BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+class Histogram:
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        # The last slot counts observations above the largest bound (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.count += 1
+            self.sum += seconds
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket."""
+        if not self.count:
+            return 0.0
+
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / n
+                return min(max(estimate, self.min), self.max)
+            seen += n
+        return self.max
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "count": self.count,
+                "sum_ms": self.sum * 1000,
+                "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+                "min_ms": self.min * 1000 if self.count else 0.0,
+                "max_ms": self.max * 1000,
+                "p50_ms": self.quantile(0.50) * 1000,
+                "p90_ms": self.quantile(0.90) * 1000,
+                "p99_ms": self.quantile(0.99) * 1000,
+            }
+
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(name):
+    h = _histograms.get(name)
+    if h is None:
+        with _histograms_lock:
+            h = _histograms.setdefault(name, Histogram())
+    return h
+
+
+def record(name, seconds):
+    """Record a duration measured outside a span (e.g. time to first token)."""
+    if TRACING_ENABLED:
+        histogram(name).observe(seconds)
+
+
+def reset_metrics():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+class Span:
+    """Times a block and records it under name. elapsed_ms is set on exit."""
+
+    __slots__ = ("name", "start", "elapsed_ms")
+
+    def __init__(self, name):
+        self.name = name
+        self.start = None
+        self.elapsed_ms = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.elapsed_ms = seconds * 1000
+        if TRACING_ENABLED:
+            histogram(self.name).observe(seconds)
+        return False
+
+
+def span(name):
+    return Span(name)
+
+
+def traced(name):
+    """Decorator form of span()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def export_json(indent=2):
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    return json.dumps({name: h.snapshot() for name, h in items}, indent=indent)
+
+
+def export_prometheus(metric="loomis_span_duration_seconds"):
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+
+    lines = [
+        f"# HELP {metric} Time spent in each traced stage of the Loomis request path.",
+        f"# TYPE {metric} histogram",
+    ]
+    for name, h in items:
+        with h._lock:
+            counts, total, count = list(h.counts), h.sum, h.count
+
+        cumulative = 0
+        for bound, n in zip(h.buckets, counts):
+            cumulative += n
+            lines.append(f'{metric}_bucket{{span="{name}",le="{bound:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{span="{name}",le="+Inf"}} {count}')
+        lines.append(f'{metric}_sum{{span="{name}"}} {total:.9f}')
+        lines.append(f'{metric}_count{{span="{name}"}} {count}')
+
+    return "\n".join(lines) + "\n"
+
+
+def format_metrics(metrics_format="text"):
+    """Render the histograms as "json", "prometheus" or a plain-text table."""
+    if metrics_format == "json":
+        return export_json()
+    if metrics_format == "prometheus":
+        return export_prometheus()
+
+    with _histograms_lock:
+        items = sorted(_histograms.items())
+    if not items:
+        return "No spans recorded yet"
+
+    lines = [f"{'span':<32}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}"]
+    for name, h in items:
+        s = h.snapshot()
+        lines.append(f"{name:<32}{s['count']:>8}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+    return "\n".join(lines)
+
+
+class _StackSampler:
+    """Samples one thread's Python stack on a timer and counts collapsed stacks."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loomis-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if names:
+                stack = ";".join(reversed(names))
+                self.stacks[stack] = self.stacks.get(stack, 0) + 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, n in sorted(self.stacks.items(), key=lambda item: -item[1]):
+                f.write(f"{stack} {n}\n")
+
+
+def _profile_path(name, extension):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    return os.path.join(PROFILE_DIR, f"{name}-{stamp}-{threading.get_ident()}.{extension}")
+
+
+@contextmanager
+def profiled(name, mode=None):
+    """
+    Profile the enclosed block when mode (or LOOMIS_PROFILE) is "cprofile"
+    or "sample". Yields a dict whose "path" is filled in with the written
+    profile once the block exits; with no mode it does nothing.
+    """
+    mode = mode or PROFILE_MODE
+    info = {"mode": mode, "path": None}
+
+    if not mode:
+        yield info
+        return
+
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode} (expected one of {PROFILE_MODES})")
+
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield info
+        finally:
+            profiler.disable()
+            info["path"] = _profile_path(name, "prof")
+            profiler.dump_stats(info["path"])
+    else:
+        sampler = _StackSampler(threading.get_ident())
+        sampler.start()
+        try:
+            yield info
+        finally:
+            sampler.stop()
+            info["path"] = _profile_path(name, "folded")
+            sampler.write(info["path"])
@@ -0,0 +1,166 @@
+"""
+Apply Loomis construction to every frame of a video file or camera stream.
+
+Usage:
+    python video_stream.py <video_path|camera_index> [--output out.mp4]
+                           [--smoothing 0.6] [--max-frames N] [--display]
+
+Runs headless by default, so it can be used to benchmark recorded clips on CPU.
+"""
+
+import argparse
+import time
+
+import cv2
+
+from geometry_utils import calculate_head_dimensions
+from head_pose import direction_from_yaw, estimate_head_pose
+from pose_detection import create_face_mesh, detect_landmarks
+from render_steps import render_loomis_construction
+
+
+def open_capture(source):
+    if isinstance(source, str) and source.isdigit():
+        source = int(source)
+
+    capture = cv2.VideoCapture(source)
+    if not capture.isOpened():
+        raise ValueError(f"Unable to open video source: {source}")
+    return capture
+
+
+class GeometrySmoother:
+    """
+    Exponential moving average over head radius, center and yaw.
+
+    alpha is the weight kept from the previous frame: 0 disables smoothing,
+    values close to 1 give steadier but laggier guidelines.
+    """
+
+    def __init__(self, alpha=0.6):
+        if not 0 <= alpha < 1:
+            raise ValueError("alpha must be in [0, 1)")
+        self.alpha = alpha
+        self.reset()
+
+    def reset(self):
+        self.radius = None
+        self.center = None
+        self.yaw = None
+
+    def update(self, radius, center, yaw=0.0):
+        if self.radius is None or self.alpha == 0:
+            self.radius = float(radius)
+            self.center = (float(center[0]), float(center[1]))
+            self.yaw = float(yaw)
+        else:
+            a = self.alpha
+            self.radius = a * self.radius + (1 - a) * radius
+            self.center = (
+                a * self.center[0] + (1 - a) * center[0],
+                a * self.center[1] + (1 - a) * center[1],
+            )
+            self.yaw = a * self.yaw + (1 - a) * yaw
+
+        return int(round(self.radius)), (int(round(self.center[0])), int(round(self.center[1])))
+
+
+def stream_loomis(source, output_path=None, smoothing=0.6, max_frames=None, display=False):
+    """
+    Read frames from source, draw the Loomis construction on each one and
+    optionally write an annotated video. Returns frame and FPS statistics.
+    """
+    capture = open_capture(source)
+    source_fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+
+    face_mesh = create_face_mesh(static_image_mode=False, max_num_faces=1)
+    smoother = GeometrySmoother(alpha=smoothing)
+    writer = None
+
+    frames = 0
+    faces = 0
+    processing_seconds = 0.0
+    start = time.perf_counter()
+
+    try:
+        while max_frames is None or frames < max_frames:
+            ok, frame = capture.read()
+            if not ok:
+                break
+
+            frame_start = time.perf_counter()
+
+            data = detect_landmarks(frame, landmark_sets=("face",), display=False, face_mesh=face_mesh)
+            if data["face"]:
+                faces += 1
+                radius, center, _ = calculate_head_dimensions(data["face"])
+                yaw, _, _ = estimate_head_pose(data["face"], image_width=frame.shape[1])
+                radius, center = smoother.update(radius, center, yaw)
+                yaw = smoother.yaw
+                frame = render_loomis_construction(frame, center, radius, direction_from_yaw([yaw])[0],
+                                                   data["face"], yaw)
+            else:
+                # Don't blend across a lost track
+                smoother.reset()
+
+            processing_seconds += time.perf_counter() - frame_start
+            frames += 1
+
+            if output_path:
+                if writer is None:
+                    height, width = frame.shape[:2]
+                    fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+                    writer = cv2.VideoWriter(output_path, fourcc, source_fps, (width, height))
+                writer.write(frame)
+
+            if display:
+                cv2.imshow("Loomis", frame)
+                if cv2.waitKey(1) & 0xFF in (ord("q"), 27):
+                    break
+    finally:
+        capture.release()
+        face_mesh.close()
+        if writer is not None:
+            writer.release()
+        if display:
+            cv2.destroyAllWindows()
+
+    elapsed = time.perf_counter() - start
+
+    return {
+        "frames": frames,
+        "frames_with_face": faces,
+        "seconds": elapsed,
+        "fps": frames / elapsed if elapsed > 0 else 0.0,
+        "processing_fps": frames / processing_seconds if processing_seconds > 0 else 0.0,
+        "source_fps": source_fps,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Loomis construction on video or webcam frames.")
+    parser.add_argument("source", help="video file path or camera index")
+    parser.add_argument("--output", help="path of the annotated video to write")
+    parser.add_argument("--smoothing", type=float, default=0.6,
+                        help="EMA weight of the previous frame's radius/center (0 disables)")
+    parser.add_argument("--max-frames", type=int, default=None)
+    parser.add_argument("--display", action="store_true", help="show frames in a window")
+    args = parser.parse_args(argv)
+
+    stats = stream_loomis(
+        args.source,
+        output_path=args.output,
+        smoothing=args.smoothing,
+        max_frames=args.max_frames,
+        display=args.display,
+    )
+
+    print(f"Frames: {stats['frames']} ({stats['frames_with_face']} with a face)")
+    print(f"Wall time: {stats['seconds']:.2f}s  →  {stats['fps']:.1f} FPS")
+    print(f"Processing only: {stats['processing_fps']:.1f} FPS (source {stats['source_fps']:.1f} FPS)")
+    if args.output:
+        print(f"Annotated video saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()